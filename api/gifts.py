@@ -1,8 +1,16 @@
 import aiohttp
 import logging
-from aiogram import Bot, types
+from typing import TYPE_CHECKING
+
 from utils.logger import log
+from api.json_backend import loads, decode_gifts_response, GiftRecord
+from api.token_pool import TokenPool, PooledToken, token_pool, ERROR_COOLDOWN
 from config import load_config
+from utils.runtime import make_client_session
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.types import Message
 
 config = load_config()
 
@@ -10,9 +18,35 @@ config = load_config()
 class GiftsApi:
     """A class to interact with Telegram Bot API for gift-related operations."""
 
-    def __init__(self):
-        """Initialize the GiftsApi with bot token from config."""
+    def __init__(self, pool: TokenPool | None = None, api_url: str | None = None):
+        """
+        Initialize the GiftsApi with bot token from config.
+
+        Args:
+            pool: Bot tokens gifts are sent from, the shared pool from config by default
+            api_url: Bot API server, TELEGRAM_API_URL by default
+        """
         self.bot_token: str = config['bot_token']
+        self.pool = pool or token_pool
+        self.api_url = api_url or config['api_url']
+        self._session: aiohttp.ClientSession | None = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the client's shared HTTP session, creating it on first use.
+
+        Reusing one session keeps Bot API connections alive between calls,
+        so a burst of sendGift calls doesn't pay for a TCP and TLS handshake each.
+        """
+        if self._session is None or self._session.closed:
+            self._session = make_client_session(timeout=aiohttp.ClientTimeout(total=60))
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     async def aio_get_available_gifts(self, session: aiohttp.ClientSession) -> list | None:
         """
@@ -28,10 +62,10 @@ class GiftsApi:
         Note:
             Uses Telegram Bot API method: /getAvailableGifts
         """
-        url = f"https://api.telegram.org/bot{self.bot_token}/getAvailableGifts"
+        url = f"{self.api_url}/bot{self.bot_token}/getAvailableGifts"
         try:
             async with session.get(url) as resp:
-                data = await resp.json()
+                data = loads(await resp.read())
                 if data.get('ok') is True:
                     return data.get('result', {}).get('gifts', [])
                 else:
@@ -41,6 +75,59 @@ class GiftsApi:
             log.error(f"Error while requesting /getAvailableGifts: {e}")
             return None
 
+    async def aio_get_gift_records(self, session: aiohttp.ClientSession) -> list[GiftRecord] | None:
+        """
+        Fetch available gifts as typed records, decoding only the fields the watcher uses.
+
+        Args:
+            session: An active aiohttp ClientSession for making HTTP requests
+
+        Returns:
+            list: GiftRecord objects if successful
+            None: If the request fails or API returns error
+
+        Note:
+            Uses Telegram Bot API method: /getAvailableGifts
+        """
+        url = f"{self.api_url}/bot{self.bot_token}/getAvailableGifts"
+        try:
+            async with session.get(url) as resp:
+                gifts, error = decode_gifts_response(await resp.read())
+                if gifts is None:
+                    log.error(f"API response error: {error}")
+                return gifts
+        except Exception as e:
+            log.error(f"Error while requesting /getAvailableGifts: {e}")
+            return None
+
+    async def aio_get_star_balance(self, session: aiohttp.ClientSession, token: str | None = None) -> int | None:
+        """
+        Fetch the bot's current Telegram Star balance.
+
+        Args:
+            session: An active aiohttp ClientSession for making HTTP requests
+            token: Bot token whose balance to fetch, the main bot by default
+
+        Returns:
+            int: Whole stars available to the bot
+            None: If the request fails or API returns error
+
+        Note:
+            Uses Telegram Bot API method: /getMyStarBalance
+        """
+        url = f"{self.api_url}/bot{token or self.bot_token}/getMyStarBalance"
+        try:
+            async with session.get(url) as resp:
+                data = await resp.json()
+                if data.get('ok') is True:
+                    return int(data.get('result', {}).get('amount', 0))
+                else:
+                    log.error(f"API response error while getting star balance: {data}")
+                    return None
+        except Exception as e:
+            log.error(f"Error while requesting /getMyStarBalance: {e}")
+            return None
+
     async def aio_get_file_path(self, file_id: str) -> str | None:
         """
         Get the file path from Telegram servers by file ID.
@@ -55,17 +142,17 @@ class GiftsApi:
         Note:
             Uses Telegram Bot API method: /getFile
         """
-        url = f"https://api.telegram.org/bot{self.bot_token}/getFile?file_id={file_id}"
+        url = f"{self.api_url}/bot{self.bot_token}/getFile?file_id={file_id}"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    data = await resp.json()
-                    if data.get('ok'):
-                        return data['result']['file_path']
-                    else:
-                        log.error(
-                            f"API response error while getting file path: {data}")
-                        return None
+            session = await self.get_session()
+            async with session.get(url) as resp:
+                data = await resp.json()
+                if data.get('ok'):
+                    return data['result']['file_path']
+                else:
+                    log.error(
+                        f"API response error while getting file path: {data}")
+                    return None
         except Exception as e:
             log.error(f"Error while requesting file path: {e}")
             return None
@@ -84,20 +171,20 @@ class GiftsApi:
         Raises:
             ValueError: If server returns non-200 status code
         """
-        download_url = f"https://api.telegram.org/file/bot{self.bot_token}/{file_path}"
+        download_url = f"{self.api_url}/file/bot{self.bot_token}/{file_path}"
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(download_url) as resp:
-                    if resp.status == 200:
-                        return await resp.read()
-                    else:
-                        raise ValueError(
-                            f"File download error: status {resp.status}")
+            session = await self.get_session()
+            async with session.get(download_url) as resp:
+                if resp.status == 200:
+                    return await resp.read()
+                else:
+                    raise ValueError(
+                        f"File download error: status {resp.status}")
         except Exception as e:
             log.error(f"File download error: {e}")
             return None
 
-    async def send_thumbnail_photo(self, bot: Bot, chat_id: int, thumb_file_id: str, caption: str) -> None:
+    async def send_thumbnail_photo(self, bot: "Bot", chat_id: int, thumb_file_id: str, caption: str) -> "Message | None":
         """
         Send thumbnail photo to specified chat with fallback to document.
 
@@ -107,46 +194,68 @@ class GiftsApi:
             thumb_file_id: Telegram file ID of the thumbnail
             caption: Message caption to include with the file
 
+        Returns:
+            Message: The sent message; its photo file_id can be reused for further sends
+            None: If nothing could be sent
+
         Behavior:
             1. First attempts to send as photo
             2. On failure, attempts to send as document
             3. On complete failure, sends error message with caption
+
+        Raises:
+            TelegramRetryAfter: If the chat is flood limited, for the caller to back off
+            TelegramForbiddenError: If the user blocked the bot
         """
+        from aiogram import types
+        from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+
         # Get file path
         file_path = await self.aio_get_file_path(thumb_file_id)
         if not file_path:
-            await bot.send_message(chat_id, f"(Failed to get thumbnail) {caption}")
-            return
+            return await bot.send_message(chat_id, f"(Failed to get thumbnail) {caption}")
 
         # Download file content
         file_content = await self.download_file(file_path)
         if not file_content:
-            await bot.send_message(chat_id, f"(Failed to download thumbnail) {caption}")
-            return
+            return await bot.send_message(chat_id, f"(Failed to download thumbnail) {caption}")
 
         # Send file as photo
         input_photo = types.BufferedInputFile(
             file_content, filename="gift_thumb.webp")
         try:
-            await bot.send_photo(chat_id, photo=input_photo, caption=caption)
+            return await bot.send_photo(chat_id, photo=input_photo, caption=caption)
+        except (TelegramRetryAfter, TelegramForbiddenError):
+            # Rate limits and blocked chats are the caller's to handle
+            raise
         except Exception as e:
             log.warning(
                 f"Failed to send as photo, trying as document. Error: {e}")
             try:
                 input_document = types.BufferedInputFile(
                     file_content, filename="gift_thumb.webp")
-                await bot.send_document(chat_id, document=input_document, caption=caption)
+                return await bot.send_document(chat_id, document=input_document, caption=caption)
+            except (TelegramRetryAfter, TelegramForbiddenError):
+                raise
             except Exception as doc_e:
                 log.error(f"Failed to send as document: {doc_e}")
+                return None
 
-    async def send_gift(self, user_id: int, gift_id: str, pay_for_upgrade: bool = False) -> bool:
+    async def send_gift(self, user_id: int, gift_id: str, pay_for_upgrade: bool = False,
+                        price: int | None = None) -> bool:
         """
-        Send a Telegram gift to specified user.
+        Send a Telegram gift to specified user from the least loaded pool token.
+
+        Tokens that are rate limited, out of stars or unreachable are skipped
+        and the next one is tried. Errors that could mean the gift was already
+        sent, such as a timeout, are not retried on another token.
 
         Args:
             user_id: Recipient's Telegram user ID
             gift_id: Identifier of the gift to send
             pay_for_upgrade: Whether bot should pay for gift upgrade (default: False)
+            price: Gift price in stars, used to pick a token that can pay and
+                to update its cached balance
 
         Returns:
             bool: True if gift was sent successfully, False otherwise
@@ -154,23 +263,76 @@ class GiftsApi:
         Note:
             Uses Telegram Bot API method: /sendGift
         """
-        url = f"https://api.telegram.org/bot{self.bot_token}/sendGift"
         payload = {
             "user_id": user_id,
             "gift_id": gift_id,
             "pay_for_upgrade": pay_for_upgrade,
         }
+        tried = set()
+        while True:
+            member = self.pool.pick(price or 0, exclude=tried)
+            if member is None:
+                if not tried:
+                    log.warning("No bot token can pay for gift {} right now.", gift_id)
+                return False
+            tried.add(member.token)
+
+            member.reserved += price or 0
+            try:
+                result = await self._send_gift_with(member, payload)
+            finally:
+                member.reserved -= price or 0
+            if result is True:
+                member.sent += 1
+                if price:
+                    member.balance.spend(price)
+                return True
+            member.failed += 1
+            if result is False:
+                return False
+            log.warning("Bot {} could not send gift {}, failing over.", member.label, gift_id)
+
+    async def _send_gift_with(self, member: PooledToken, payload: dict) -> bool | None:
+        """
+        Call sendGift with one pool token.
 
+        Returns:
+            True: The gift was sent
+            False: The request failed and must not be retried elsewhere
+            None: The token could not send, another token may be tried
+        """
+        url = f"{self.api_url}/bot{member.token}/sendGift"
+        await member.limiter.acquire()
+        member.in_flight += 1
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as resp:
-                    data = await resp.json()
-                    if data.get("ok"):
-                        return True
-                    else:
-                        log.error(
-                            f"Gift sending error: {data.get('description')}")
-                        return False
+            session = await self.get_session()
+            async with session.post(url, json=payload) as resp:
+                data = loads(await resp.read())
+        except aiohttp.ClientConnectorError as e:
+            # Nothing reached the server, safe to try another token
+            log.error("Error while requesting sendGift with bot {}: {}", member.label, e)
+            member.cool_down(ERROR_COOLDOWN)
+            return None
         except Exception as e:
-            log.error(f"Error while requesting sendGift: {e}")
+            log.error("Error while requesting sendGift with bot {}: {}", member.label, e)
             return False
+        finally:
+            member.in_flight -= 1
+
+        if data.get("ok"):
+            return True
+
+        description = data.get("description") or ""
+        log.error("Gift sending error from bot {}: {}", member.label, description)
+        error_code = data.get("error_code")
+        if error_code == 429:
+            member.cool_down((data.get("parameters") or {}).get("retry_after", ERROR_COOLDOWN))
+            return None
+        if error_code is not None and error_code >= 500:
+            member.cool_down(ERROR_COOLDOWN)
+            return None
+        if "BALANCE_TOO_LOW" in description.upper() or "NOT ENOUGH" in description.upper():
+            member.balance.amount = 0
+            member.balance.mark_exhausted()
+            return None
+        return False
@@ -0,0 +1,117 @@
+import json
+from dataclasses import dataclass
+
+# Optional backends: msgspec decodes the catalog straight into typed records and
+# skips every field nobody reads; orjson (or the standard library) decodes the
+# whole document first. Install either with `pip install msgspec` or `pip install orjson`
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    loads = orjson.loads
+    BACKEND = "orjson"
+else:
+    loads = json.loads
+    BACKEND = "json"
+
+
+@dataclass(slots=True)
+class GiftThumbnail:
+    file_id: str
+
+
+@dataclass(slots=True)
+class GiftSticker:
+    emoji: str | None = None
+    thumbnail: GiftThumbnail | None = None
+
+
+@dataclass(slots=True)
+class GiftRecord:
+    """Catalog entry reduced to what the watcher and the announcements use."""
+    id: str
+    star_count: int = 0
+    remaining_count: int | None = None
+    total_count: int | None = None
+    sticker: GiftSticker | None = None
+
+    @property
+    def emoji(self) -> str | None:
+        return self.sticker.emoji if self.sticker else None
+
+    @property
+    def thumb_file_id(self) -> str | None:
+        if self.sticker and self.sticker.thumbnail:
+            return self.sticker.thumbnail.file_id
+        return None
+
+
+def _record_from_dict(gift: dict) -> GiftRecord:
+    sticker = gift.get('sticker')
+    if sticker is not None:
+        thumbnail = sticker.get('thumbnail')
+        sticker = GiftSticker(
+            emoji=sticker.get('emoji'),
+            thumbnail=GiftThumbnail(thumbnail['file_id']) if thumbnail else None,
+        )
+    return GiftRecord(
+        id=gift['id'],
+        star_count=gift.get('star_count', 0),
+        remaining_count=gift.get('remaining_count'),
+        total_count=gift.get('total_count'),
+        sticker=sticker,
+    )
+
+
+if msgspec is not None:
+    @dataclass(slots=True)
+    class _GiftList:
+        gifts: list[GiftRecord]
+
+    @dataclass(slots=True)
+    class _GiftsResponse:
+        ok: bool
+        result: _GiftList | None = None
+        description: str | None = None
+
+    _gifts_decoder = msgspec.json.Decoder(_GiftsResponse)
+    GIFTS_BACKEND = "msgspec"
+else:
+    GIFTS_BACKEND = BACKEND
+
+
+def decode_gifts_response(raw: bytes) -> tuple[list[GiftRecord] | None, str | None]:
+    """
+    Decode a getAvailableGifts response body into gift records.
+
+    Args:
+        raw: Response body
+
+    Returns:
+        tuple: (list of GiftRecord or None if the API reported an error,
+        error description)
+
+    Raises:
+        ValueError: If the body is not a valid response
+    """
+    if msgspec is not None:
+        try:
+            response = _gifts_decoder.decode(raw)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+        if not response.ok or response.result is None:
+            return None, response.description
+        return response.result.gifts, None
+
+    data = loads(raw)
+    if data.get('ok') is not True:
+        return None, data.get('description')
+    return [_record_from_dict(gift) for gift in data.get('result', {}).get('gifts', [])], None
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import aiohttp
+
+from utils.rate_limit import TokenBucket
+from utils.star_balance import StarBalance
+from config import load_config
+
+config = load_config()
+
+# sendGift calls per second allowed for each bot token
+GIFT_SEND_RATE = 20
+# Seconds a token is skipped after a transport or server error
+ERROR_COOLDOWN = 5
+
+
+class PooledToken:
+    """One bot token of the pool with its own star balance and rate limiter."""
+    __slots__ = ("token", "balance", "limiter", "in_flight", "reserved", "cooldown_until", "sent", "failed")
+
+    def __init__(self, token: str, rate: float = GIFT_SEND_RATE):
+        self.token = token
+        self.balance = StarBalance()
+        self.limiter = TokenBucket(rate)
+        self.in_flight = 0
+        self.reserved = 0  # Stars of sends in flight, not yet deducted from the balance
+        self.cooldown_until = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def label(self) -> str:
+        """Bot id part of the token, safe to log."""
+        return self.token.split(":", 1)[0]
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def cool_down(self, seconds: float) -> None:
+        """Skip this token for the given number of seconds."""
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+    def can_afford(self, price: int) -> bool:
+        return self.available and self.balance.can_afford(price + self.reserved)
+
+    def load(self) -> float:
+        """Sends in flight plus seconds until the limiter admits another one."""
+        return self.in_flight + self.limiter.delay()
+
+
+class TokenPool:
+    """
+    Bot tokens that gifts can be sent from.
+
+    Exposes the same amount/can_afford/refresh interface as StarBalance, summed
+    over the pool, so purchase planning treats the pool as one large balance.
+    """
+
+    def __init__(self, tokens: list[str], rate: float = GIFT_SEND_RATE):
+        self.members = [PooledToken(token, rate) for token in tokens if token]
+
+    @property
+    def amount(self) -> int | None:
+        """Total stars across available tokens, None while any balance is unknown."""
+        total = 0
+        for member in self.members:
+            if not member.available:
+                continue
+            if member.balance.amount is None:
+                return None
+            total += member.balance.amount
+        return total
+
+    def can_afford(self, price: int) -> bool:
+        return any(member.can_afford(price) for member in self.members)
+
+    async def refresh(self, gifts_api, session: aiohttp.ClientSession, force: bool = False) -> int | None:
+        """Refetch stale balances of all tokens concurrently."""
+        await asyncio.gather(*(
+            member.balance.refresh(gifts_api, session, force=force, token=member.token)
+            for member in self.members
+        ))
+        return self.amount
+
+    def pick(self, price: int, exclude: set | None = None) -> PooledToken | None:
+        """
+        Choose the least loaded token that can pay for a gift.
+
+        Args:
+            price: Gift price in stars
+            exclude: Tokens already tried for this send
+
+        Returns:
+            PooledToken: Token to send from
+            None: If no token can pay right now
+        """
+        candidates = [
+            member for member in self.members
+            if member.can_afford(price) and not (exclude and member.token in exclude)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda member: (member.load(), -(member.balance.amount or 0)))
+
+    def stats(self) -> list[dict]:
+        """Per-token balance and send counters, for logs."""
+        return [
+            {
+                "bot": member.label,
+                "balance": member.balance.amount,
+                "sent": member.sent,
+                "failed": member.failed,
+                "available": member.available,
+            }
+            for member in self.members
+        ]
+
+
+token_pool = TokenPool(config['gift_tokens'])
@@ -6,6 +6,9 @@ from .buy_gift import router as buy_gift_router
 from .balance import router as balance_router
 from .payment_handler import router as payment_router
 from .auto_buy import router as auto_buy_router
+from .history import router as history_router
+from .notify import router as notify_router
+from .admin import router as admin_router
 
 
 def register_handlers(dp: Dispatcher):
@@ -15,3 +18,6 @@ def register_handlers(dp: Dispatcher):
     dp.include_router(balance_router)
     dp.include_router(payment_router)
     dp.include_router(auto_buy_router)
+    dp.include_router(history_router)
+    dp.include_router(notify_router)
+    dp.include_router(admin_router)
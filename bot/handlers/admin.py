@@ -0,0 +1,204 @@
+import time
+
+from aiogram import types, Router
+from aiogram.filters import Command, CommandObject
+
+from db.engine import pool_stats, replica_pool_stats
+from db.models import User
+from utils.gift_history import sell_through_rates
+from utils.loop_monitor import loop_monitor
+from utils.sampling_profiler import profile, MAX_PROFILE_SECONDS
+
+router = Router()
+
+# Gifts listed by /sellthrough
+SELL_THROUGH_TOP = 10
+
+
+def is_admin(db, user_id) -> bool:
+    """
+    Check whether a Telegram user has the admin status.
+
+    Pass the primary session: a replica may still show a revoked admin.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID
+
+    Returns:
+        bool: True for admins
+    """
+    user = db.query(User).filter(User.user_id == str(user_id)).first()
+    return user is not None and user.status == "admin"
+
+
+def format_loop_metrics() -> str:
+    """Render the event loop monitor metrics for an admin."""
+    metrics = loop_monitor.metrics()
+    lines = [
+        f"<b>Event loop monitor</b>: {'🟢 on' if metrics['enabled'] else '🔴 off'}",
+        f"Probes: {metrics['probes']}, lag avg {metrics['lag_avg_ms']:.1f} ms, max {metrics['lag_max_ms']:.0f} ms",
+        f"Slow callbacks (>{loop_monitor.threshold * 1000:.0f} ms): {metrics['slow_callbacks']}",
+    ]
+    if metrics["top_handlers"]:
+        lines.append("\n<b>By handler/stage:</b>")
+        lines.extend(f"{count} × <code>{handler}</code>" for handler, count in metrics["top_handlers"])
+    if metrics["top_sites"]:
+        lines.append("\n<b>By site:</b>")
+        lines.extend(f"{count} × <code>{site}</code>" for site, count in metrics["top_sites"])
+    return "\n".join(lines)
+
+
+def format_pool_metrics() -> str:
+    """Render the database pool checkout metrics for an admin."""
+    sections = []
+    for title, stats in (("Database pool", pool_stats), ("Replica pool", replica_pool_stats)):
+        if stats.pool is None and stats is replica_pool_stats:
+            continue
+        metrics = stats.metrics()
+        sections.append("\n".join([
+            f"<b>{title}</b>",
+            f"Connections: {metrics['checked_out']} in use, pool size {metrics['size']}, overflow {metrics['overflow']}",
+            f"Checkouts: {metrics['checkouts']}, wait avg {metrics['wait_avg_ms']:.2f} ms, max {metrics['wait_max_ms']:.0f} ms",
+            f"Slow checkouts: {metrics['slow_checkouts']}, timeouts: {metrics['timeouts']}",
+        ]))
+    return "\n\n".join(sections)
+
+
+def format_sell_through(rates: list, hours: int) -> str:
+    """Render the fastest-selling gifts of the last hours for an admin."""
+    if not rates:
+        return f"No limited gift sold in the last {hours}h."
+    lines = [f"<b>Sell-through, last {hours}h</b>"]
+    for rate in rates[:SELL_THROUGH_TOP]:
+        line = f"<code>{rate['gift_id']}</code>: {rate['sold']} sold, {rate['per_minute']:.1f}/min"
+        if rate["sold_out_at"] is not None:
+            line += f", sold out at {time.strftime('%Y-%m-%d %H:%M', time.gmtime(rate['sold_out_at']))} UTC"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@router.message(Command("loopmon"))
+async def loop_monitor_command(message: types.Message, command: CommandObject, db_session) -> None:
+    """
+    Show or toggle the event loop monitor: /loopmon [on|off|reset].
+
+    Args:
+        message: Incoming message object
+        command: Parsed command object with arguments
+        db_session: Database session
+    """
+    with db_session as db:
+        if not is_admin(db, message.from_user.id):
+            await message.reply("You don't have permission to execute this command.")
+            return
+
+    action = (command.args or "").strip().lower()
+    if action == "on":
+        loop_monitor.start()
+    elif action == "off":
+        loop_monitor.stop()
+    elif action == "reset":
+        loop_monitor.reset()
+    elif action:
+        await message.reply("Usage: /loopmon [on|off|reset]")
+        return
+
+    await message.answer(format_loop_metrics(), parse_mode="HTML")
+
+
+@router.message(Command("profile"))
+async def profile_command(message: types.Message, command: CommandObject, db_session) -> None:
+    """
+    Sample the running process and send back a collapsed stack file: /profile N [tasks].
+
+    Args:
+        message: Incoming message object
+        command: Parsed command object with the duration and optional "tasks" flag
+        db_session: Database session
+    """
+    with db_session as db:
+        if not is_admin(db, message.from_user.id):
+            await message.reply("You don't have permission to execute this command.")
+            return
+
+    args = (command.args or "").split()
+    try:
+        seconds = int(args[0]) if args else 10
+        if seconds <= 0:
+            raise ValueError("Duration must be positive.")
+    except ValueError:
+        await message.reply(f"Usage: /profile N [tasks], N up to {MAX_PROFILE_SECONDS} seconds")
+        return
+    per_task = "tasks" in args[1:]
+
+    await message.answer(f"Profiling for {min(seconds, MAX_PROFILE_SECONDS)}s...")
+    try:
+        data, summary = await profile(seconds, per_task=per_task)
+    except RuntimeError as e:
+        await message.reply(str(e))
+        return
+
+    top = "\n".join(f"{count} × {leaf}" for leaf, count in summary["top_leaves"])
+    await message.answer_document(
+        types.BufferedInputFile(data, filename=f"profile-{int(time.time())}.collapsed"),
+        caption=(
+            f"{summary['samples']} samples over {summary['seconds']:.0f}s, {summary['stacks']} stacks.\n"
+            f"Top frames:\n{top}"
+        )[:1024],
+    )
+
+
+@router.message(Command("dbpool"))
+async def db_pool_command(message: types.Message, command: CommandObject, db_session) -> None:
+    """
+    Show database pool checkout wait times: /dbpool [reset].
+
+    Args:
+        message: Incoming message object
+        command: Parsed command object with arguments
+        db_session: Database session
+    """
+    with db_session as db:
+        if not is_admin(db, message.from_user.id):
+            await message.reply("You don't have permission to execute this command.")
+            return
+
+    action = (command.args or "").strip().lower()
+    if action == "reset":
+        pool_stats.reset()
+        replica_pool_stats.reset()
+    elif action:
+        await message.reply("Usage: /dbpool [reset]")
+        return
+
+    await message.answer(format_pool_metrics(), parse_mode="HTML")
+
+
+@router.message(Command("sellthrough"))
+async def sell_through_command(message: types.Message, command: CommandObject, db_session, read_session) -> None:
+    """
+    Show the fastest-selling gifts from the catalog history: /sellthrough [hours].
+
+    Args:
+        message: Incoming message object
+        command: Parsed command object with the optional window in hours
+        db_session: Database session, for the permission check
+        read_session: Read-only database session, for the report
+    """
+    with db_session as db:
+        if not is_admin(db, message.from_user.id):
+            await message.reply("You don't have permission to execute this command.")
+            return
+
+    try:
+        hours = int(command.args) if command.args else 24
+        if hours <= 0:
+            raise ValueError("Window must be positive.")
+    except ValueError:
+        await message.reply("Usage: /sellthrough [hours]")
+        return
+
+    with read_session as db:
+        rates = [rate for rate in sell_through_rates(db, hours * 3600) if rate["sold"] > 0]
+    await message.answer(format_sell_through(rates, hours), parse_mode="HTML")
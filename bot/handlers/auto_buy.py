@@ -1,15 +1,64 @@
+import html
+import re
+
 from aiogram import types, Router
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 
-from api.gifts import GiftsApi
 from bot.states.auto_buy_state import AutoBuyStates
 from bot.keyboards.default import main_menu, auto_buy_keyboard, go_back_menu
 from utils.logger import log
-from db.models import AutoBuySettings, User
+from db.models import AutoBuySettings
+from db.user_cache import get_user_snapshot, get_settings_snapshot, get_watchlist_snapshot
+from db.watchlist import get_watchlist, add_watch, remove_watch, MAX_WATCHLIST_SIZE
 
 router = Router()
-gifts_api = GiftsApi()
+
+_TIME = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)$")
+
+
+def parse_time_of_day(text: str) -> int:
+    """
+    Parse HH:MM into minutes since midnight.
+
+    Raises:
+        ValueError: If the text is not a valid time
+    """
+    match = _TIME.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid time: {text}")
+    return int(match.group(1)) * 60 + int(match.group(2))
+
+
+def format_rules(settings, watchlist) -> str:
+    """
+    Render the active hours, per-gift cap, watchlist and spend limit lines of the settings screen.
+
+    Args:
+        settings: Auto-buy settings object or snapshot
+        watchlist: Rows (target, max_count) from get_watchlist
+    """
+    if settings.active_from is None or settings.active_to is None or settings.active_from == settings.active_to:
+        hours = "always"
+    else:
+        hours = " – ".join(
+            f"{minute // 60:02d}:{minute % 60:02d}" for minute in (settings.active_from, settings.active_to)
+        ) + " UTC"
+    watched = ", ".join(
+        html.escape(entry.target) + (f" ×{entry.max_count}" if entry.max_count else "")
+        for entry in watchlist
+    )
+    limits = ", ".join(
+        f"{label} {value} ⭐️" for label, value in (
+            ("daily", settings.daily_budget), ("per drop", settings.drop_budget), ("per gift", settings.gift_budget)
+        ) if value
+    )
+    return (
+        f"<b>Active Hours:</b> {hours}\n"
+        f"<b>Max per Gift:</b> {settings.max_per_gift or 'not set'}\n"
+        f"<b>Watchlist:</b> {watched or 'all gifts'}\n"
+        f"<b>Spend Limits:</b> {limits or 'not set'}\n"
+    )
 
 
 def get_or_create_auto_buy_settings(db, user_id) -> AutoBuySettings:
@@ -40,31 +89,36 @@ def get_or_create_auto_buy_settings(db, user_id) -> AutoBuySettings:
 
 
 @router.message(Command(commands=["auto_buy"]))
-async def auto_buy_command(message: types.Message, state: FSMContext, db_session):
+async def auto_buy_command(message: types.Message, state: FSMContext, db_session, read_session):
     """
     Command handler for auto-purchase configuration.
     """
-    with db_session as db:
-        settings = get_or_create_auto_buy_settings(db, str(message.from_user.id))
-        user = db.query(User).filter(
-            User.user_id == str(message.from_user.id)).first()
-
-        username = user.username if user else "Unknown User"
-        balance = user.balance if user else 0
-
-        await message.answer(
-            text=(
-                f"{username}! Your balance: {balance} ⭐️\n\n"
-                f"⚙️ <b>Auto-Purchase Settings</b>\n"
-                f"Status: {'🟢 Enabled' if settings.status == 'enabled' else '🔴 Disabled'}\n\n"
-                f"<b>Price Limit:</b>\n"
-                f"From {settings.price_limit_from} to {settings.price_limit_to} ⭐️\n\n"
-                f"<b>Supply Limit:</b> {settings.supply_limit or 'not set'} ⭐️\n"
-                f"<b>Purchase Cycles:</b> {settings.cycles}\n"
-            ),
-            reply_markup=auto_buy_keyboard(),
-            parse_mode="HTML"
-        )
+    with read_session as db:
+        # Snapshots from the user cache; settings are only created on first use
+        settings = get_settings_snapshot(db, message.from_user.id)
+        user = get_user_snapshot(db, message.from_user.id)
+        watchlist = get_watchlist_snapshot(db, message.from_user.id)
+    if settings is None:
+        with db_session as db:
+            settings = get_or_create_auto_buy_settings(db, str(message.from_user.id))
+
+    username = user.username if user else "Unknown User"
+    balance = user.balance if user else 0
+
+    await message.answer(
+        text=(
+            f"{username}! Your balance: {balance} ⭐️\n\n"
+            f"⚙️ <b>Auto-Purchase Settings</b>\n"
+            f"Status: {'🟢 Enabled' if settings.status == 'enabled' else '🔴 Disabled'}\n\n"
+            f"<b>Price Limit:</b>\n"
+            f"From {settings.price_limit_from} to {settings.price_limit_to} ⭐️\n\n"
+            f"<b>Supply Limit:</b> {settings.supply_limit or 'not set'} ⭐️\n"
+            f"<b>Purchase Cycles:</b> {settings.cycles}\n"
+            f"{format_rules(settings, watchlist)}"
+        ),
+        reply_markup=auto_buy_keyboard(),
+        parse_mode="HTML"
+    )
     await state.set_state(AutoBuyStates.menu)
 
 
@@ -74,13 +128,13 @@ async def display_updated_settings(message: types.Message, db_session, settings:
     """
     # Исправление DetachedInstanceError - получаем свежие данные пользователя в новой сессии
     with db_session as db:
-        user = db.query(User).filter(
-            User.user_id == str(message.from_user.id)).first()
+        user = get_user_snapshot(db, message.from_user.id)
         username = user.username if user else "Unknown User"
         balance = user.balance if user else 0
 
         # Используем переданные settings, но для безопасности можно обновить их
         db.refresh(settings)
+        watchlist = get_watchlist(db, message.from_user.id)
 
         await message.answer(
             text=(
@@ -90,7 +144,8 @@ async def display_updated_settings(message: types.Message, db_session, settings:
                 f"<b>Price Limit:</b>\n"
                 f"From {settings.price_limit_from} to {settings.price_limit_to} ⭐️\n\n"
                 f"<b>Supply Limit:</b> {settings.supply_limit or 'not set'} ⭐️\n"
-                f"<b>Purchase Cycles:</b> {settings.cycles}"
+                f"<b>Purchase Cycles:</b> {settings.cycles}\n"
+                f"{format_rules(settings, watchlist)}"
             ),
             reply_markup=auto_buy_keyboard(),
             parse_mode="HTML"
@@ -140,6 +195,53 @@ async def auto_buy_menu_handler(message: types.Message, state: FSMContext, db_se
             )
             await state.set_state(AutoBuyStates.set_cycles)
 
+        elif message.text == "👁 Watchlist":
+            await message.answer(
+                text=(
+                    "<b>Send a gift ID or sticker emoji to buy only matching gifts</b>, "
+                    "optionally followed by how many copies to buy per drop (e.g., <code>🧸 2</code>).\n"
+                    "Send <code>-ID</code> or <code>-EMOJI</code> to remove an entry, <code>clear</code> to watch all gifts again.\n"
+                    "Press '🔙 Back to Main Menu' to cancel."
+                ),
+                reply_markup=go_back_menu(),
+                parse_mode="HTML"
+            )
+            await state.set_state(AutoBuyStates.set_watchlist)
+
+        elif message.text == "🕒 Active Hours":
+            await message.answer(
+                text=(
+                    "Enter the daily window in UTC as `FROM TO` (e.g., 09:00 23:30), "
+                    "or `off` to buy at any time.\nPress '🔙 Back to Main Menu' to cancel."
+                ),
+                reply_markup=go_back_menu(),
+                parse_mode="HTML"
+            )
+            await state.set_state(AutoBuyStates.set_window)
+
+        elif message.text == "✏️ Max per Gift":
+            await message.answer(
+                text=(
+                    "Enter how many copies of one gift to buy per drop (e.g., 1), "
+                    "or `off` to let the number of cycles decide.\nPress '🔙 Back to Main Menu' to cancel."
+                ),
+                reply_markup=go_back_menu(),
+                parse_mode="HTML"
+            )
+            await state.set_state(AutoBuyStates.set_gift_cap)
+
+        elif message.text == "💰 Spend Limits":
+            await message.answer(
+                text=(
+                    "Enter spend limits in stars as `DAILY DROP GIFT` (e.g., 500 200 50), "
+                    "using 0 for no limit, or `off` to remove all limits.\n"
+                    "Daily limits reset at 00:00 UTC.\nPress '🔙 Back to Main Menu' to cancel."
+                ),
+                reply_markup=go_back_menu(),
+                parse_mode="HTML"
+            )
+            await state.set_state(AutoBuyStates.set_budgets)
+
         elif message.text == "🔙 Back to Main Menu":
             await message.answer(
                 text="Returned to main menu!",
@@ -256,3 +358,180 @@ async def auto_buy_set_cycles_handler(message: types.Message, state: FSMContext,
                 text="Input error! Enter a positive number for cycles.",
                 reply_markup=go_back_menu()
             )
+
+
+@router.message(StateFilter(AutoBuyStates.set_watchlist))
+async def auto_buy_set_watchlist_handler(message: types.Message, state: FSMContext, db_session):
+    """
+    Handle watchlist changes: add or update an entry, remove one, or clear the list.
+    """
+    with db_session as db:
+        settings = get_or_create_auto_buy_settings(db, str(message.from_user.id))
+
+        if message.text == "🔙 Back to Main Menu":
+            await message.answer(
+                text="Returned to main menu!",
+                reply_markup=main_menu()
+            )
+            await state.clear()
+            return
+
+        try:
+            text = (message.text or "").strip()
+            if text.lower() == "clear":
+                remove_watch(db, message.from_user.id)
+                reply = "✅ Watchlist cleared, all gifts are considered again."
+            elif text.startswith("-") and len(text) > 1:
+                if not remove_watch(db, message.from_user.id, text[1:].strip()):
+                    raise ValueError("Not on the watchlist.")
+                reply = f"✅ Removed {html.escape(text[1:].strip())} from the watchlist."
+            else:
+                parts = text.split()
+                if not 1 <= len(parts) <= 2 or len(parts[0]) > 64:
+                    raise ValueError("Input format must be: `ID_OR_EMOJI [COPIES]`.")
+                target = parts[0]
+                if not target.isdigit() and any(char.isalnum() for char in target):
+                    raise ValueError("Target must be a gift ID or an emoji.")
+                max_count = int(parts[1]) if len(parts) == 2 else None
+                if max_count is not None and max_count <= 0:
+                    raise ValueError("Number of copies must be positive.")
+                if not add_watch(db, message.from_user.id, target, max_count):
+                    await message.answer(
+                        text=f"The watchlist holds up to {MAX_WATCHLIST_SIZE} entries, remove one first.",
+                        reply_markup=go_back_menu()
+                    )
+                    return
+                reply = f"✅ Watching {html.escape(target)}" + (f", up to {max_count} per drop." if max_count else ".")
+            db.commit()
+
+            await message.answer(text=reply)
+            await display_updated_settings(message, db_session, settings)
+            await state.set_state(AutoBuyStates.menu)
+        except ValueError:
+            db.rollback()
+            await message.answer(
+                text="Input error! Send a gift ID or emoji with optional copies (e.g., 🧸 2), `-ID` to remove or `clear`.",
+                reply_markup=go_back_menu()
+            )
+
+
+@router.message(StateFilter(AutoBuyStates.set_window))
+async def auto_buy_set_window_handler(message: types.Message, state: FSMContext, db_session):
+    """
+    Handle active hours configuration.
+    """
+    with db_session as db:
+        settings = get_or_create_auto_buy_settings(db, str(message.from_user.id))
+
+        if message.text == "🔙 Back to Main Menu":
+            await message.answer(
+                text="Returned to main menu!",
+                reply_markup=main_menu()
+            )
+            await state.clear()
+            return
+
+        try:
+            text = (message.text or "").strip()
+            if text.lower() == "off":
+                settings.active_from = settings.active_to = None
+                reply = "✅ Auto-purchase is active at any time."
+            else:
+                bounds = text.split()
+                if len(bounds) != 2:
+                    raise ValueError("Input format must be: `FROM TO`.")
+                settings.active_from, settings.active_to = map(parse_time_of_day, bounds)
+                reply = f"✅ Active hours set: {bounds[0]} – {bounds[1]} UTC."
+            db.commit()
+            db.refresh(settings)
+
+            await message.answer(text=reply)
+            await display_updated_settings(message, db_session, settings)
+            await state.set_state(AutoBuyStates.menu)
+        except ValueError:
+            await message.answer(
+                text="Input error! Enter active hours in format: `FROM TO` (e.g., 09:00 23:30) or `off`.",
+                reply_markup=go_back_menu()
+            )
+
+
+@router.message(StateFilter(AutoBuyStates.set_gift_cap))
+async def auto_buy_set_gift_cap_handler(message: types.Message, state: FSMContext, db_session):
+    """
+    Handle the per-gift quantity cap configuration.
+    """
+    with db_session as db:
+        settings = get_or_create_auto_buy_settings(db, str(message.from_user.id))
+
+        if message.text == "🔙 Back to Main Menu":
+            await message.answer(
+                text="Returned to main menu!",
+                reply_markup=main_menu()
+            )
+            await state.clear()
+            return
+
+        try:
+            text = (message.text or "").strip()
+            if text.lower() == "off":
+                settings.max_per_gift = None
+            else:
+                max_per_gift = int(text)
+                if max_per_gift <= 0:
+                    raise ValueError("Cap must be a positive number.")
+                settings.max_per_gift = max_per_gift
+            db.commit()
+            db.refresh(settings)
+
+            await message.answer(
+                text=f"✅ Max copies per gift set: {settings.max_per_gift or 'not set'}."
+            )
+            await display_updated_settings(message, db_session, settings)
+            await state.set_state(AutoBuyStates.menu)
+        except ValueError:
+            await message.answer(
+                text="Input error! Enter a positive number of copies or `off`.",
+                reply_markup=go_back_menu()
+            )
+
+
+@router.message(StateFilter(AutoBuyStates.set_budgets))
+async def auto_buy_set_budgets_handler(message: types.Message, state: FSMContext, db_session):
+    """
+    Handle daily, per-drop and per-gift spend limit configuration.
+    """
+    with db_session as db:
+        settings = get_or_create_auto_buy_settings(db, str(message.from_user.id))
+
+        if message.text == "🔙 Back to Main Menu":
+            await message.answer(
+                text="Returned to main menu!",
+                reply_markup=main_menu()
+            )
+            await state.clear()
+            return
+
+        try:
+            text = (message.text or "").strip()
+            if text.lower() == "off":
+                limits = [0, 0, 0]
+            else:
+                limits = list(map(int, text.split()))
+                if len(limits) != 3:
+                    raise ValueError("Input format must be: `DAILY DROP GIFT`.")
+                if any(limit < 0 for limit in limits):
+                    raise ValueError("Limits must not be negative.")
+            settings.daily_budget, settings.drop_budget, settings.gift_budget = (limit or None for limit in limits)
+            db.commit()
+            db.refresh(settings)
+
+            await message.answer(
+                text="✅ Spend limits updated." if any(limits) else "✅ Spend limits removed."
+            )
+            await display_updated_settings(message, db_session, settings)
+            await state.set_state(AutoBuyStates.menu)
+        except ValueError:
+            await message.answer(
+                text="Input error! Enter spend limits in format: `DAILY DROP GIFT` (e.g., 500 200 50) or `off`.",
+                reply_markup=go_back_menu()
+            )
@@ -1,18 +1,19 @@
-import aiohttp
-from datetime import datetime
 from aiogram import types, Router, Bot
 from aiogram.filters import Command, StateFilter, CommandObject
 from aiogram.fsm.context import FSMContext
 
-from api.gifts import GiftsApi
 from utils.logger import log
 from bot.states.deposit_state import DepositStates
 from bot.keyboards.default import balance_menu, main_menu, go_back_menu
 from bot.keyboards.inline import payment_keyboard
 from db.models import User, Transaction
+from db.ledger import record_transaction, transaction_kind, DEPOSIT, REFUND
+from db.payments import claim_payment, mark_payment_applied
+from db.orders import create_order, get_pending_order, mark_order_paid
+from db.user_cache import get_user_snapshot
+from utils.invoice_payload import encode_payload, decode_payload, KIND_DEPOSIT
 
 router = Router()
-gifts_api = GiftsApi()
 
 
 # Utility Functions
@@ -34,20 +35,20 @@ async def get_user_by_username(db_session, username: str) -> User | None:
 
 
 @log.catch
-async def get_user_by_id(db_session, user_id: int) -> User | None:
+async def get_user_by_id(db_session, user_id: int):
     """
-    Retrieve a user by their Telegram ID from the database.
+    Retrieve a read-only snapshot of a user by their Telegram ID, through the user cache.
 
     Args:
         db_session: Database session
         user_id: Telegram user ID to search for
 
     Returns:
-        User: User object if found
+        Row: User snapshot if found
         None: If user doesn't exist
     """
     with db_session as db:
-        return db.query(User).filter(User.user_id == user_id).first()
+        return get_user_snapshot(db, user_id)
 
 
 @log.catch
@@ -69,20 +70,20 @@ async def return_to_main_menu(message: types.Message, state: FSMContext) -> None
 # Handlers
 @log.catch
 @router.message(Command(commands=["balance"]))
-async def get_balance_command(message: types.Message, db_session) -> None:
+async def get_balance_command(message: types.Message, read_session) -> None:
     """
     Display the user's current balance.
 
     Args:
         message: Incoming message object
-        db_session: Database session
+        read_session: Read-only database session
 
     Behavior:
         - Retrieves user from database
         - Displays balance with formatted message
         - Shows balance menu keyboard
     """
-    user = await get_user_by_username(db_session, message.from_user.username)
+    user = await get_user_by_id(read_session, message.from_user.id)
     if not user:
         await message.reply("User not found. Please try again.")
         return
@@ -108,14 +109,14 @@ async def go_back_in_menu(message: types.Message, state: FSMContext) -> None:
 
 @log.catch
 @router.message(Command(commands=["deposit"]))
-async def deposit_command(message: types.Message, state: FSMContext, db_session) -> None:
+async def deposit_command(message: types.Message, state: FSMContext, read_session) -> None:
     """
     Initiate the deposit process.
 
     Args:
         message: Incoming message object
         state: Current FSM state
-        db_session: Database session
+        read_session: Read-only database session
 
     Transitions:
         Sets state to DepositStates.waiting_for_amount_deposit
@@ -125,7 +126,7 @@ async def deposit_command(message: types.Message, state: FSMContext, db_session)
         - Shows current balance
         - Requests deposit amount input
     """
-    user = await get_user_by_username(db_session, message.from_user.username)
+    user = await get_user_by_id(read_session, message.from_user.id)
     if not user:
         await message.reply("User not found. Please try again.")
         return
@@ -139,20 +140,22 @@ async def deposit_command(message: types.Message, state: FSMContext, db_session)
 
 @log.catch
 @router.message(StateFilter(DepositStates.waiting_for_amount_deposit))
-async def process_deposit_input(message: types.Message, state: FSMContext) -> None:
+async def process_deposit_input(message: types.Message, state: FSMContext, db_session) -> None:
     """
     Process deposit amount input and generate payment invoice.
 
     Args:
         message: Incoming message with amount
         state: Current FSM state
+        db_session: Database session
 
     Validates:
         - Positive integer input
         - Non-zero amount
 
     On Success:
-        - Generates payment invoice
+        - Creates a pending order
+        - Generates payment invoice referencing it
         - Clears state
 
     On Failure:
@@ -171,7 +174,11 @@ async def process_deposit_input(message: types.Message, state: FSMContext) -> No
         await message.reply("Please enter a positive number. Example: 15")
         return
 
-    payload = f"deposit_{amount}_to_{message.from_user.id}"
+    with db_session as db:
+        order = create_order(db, message.from_user.id, "deposit", amount)
+        db.commit()
+        # Read the id while the session is open; the commit expired the order
+        payload = encode_payload(KIND_DEPOSIT, order.id, message.from_user.id, amount)
 
     log.info(
         f"Creating deposit for amount {amount} from user {message.from_user.id}")
@@ -191,22 +198,44 @@ async def process_deposit_input(message: types.Message, state: FSMContext) -> No
 
 @log.catch
 @router.pre_checkout_query()
-async def pre_checkout_handler(pre_checkout_query: types.PreCheckoutQuery) -> None:
+async def pre_checkout_handler(pre_checkout_query: types.PreCheckoutQuery, db_session) -> None:
     """
     Handle pre-checkout query for payment validation.
 
     Args:
         pre_checkout_query: Telegram pre-checkout query object
+        db_session: Database session
 
     Behavior:
-        - Always approves payment (ok=True)
-        - Actual validation happens in process_deposit_payment
+        - Rejects signed payloads whose order is unknown, already paid,
+          or doesn't match the payer and amount
+        - Approves legacy payloads (ok=True), validated on payment
     """
+    invoice = decode_payload(pre_checkout_query.invoice_payload)
+    if invoice is not None:
+        with db_session as db:
+            order = get_pending_order(db, invoice.order_id)
+        if (
+            order is None or
+            invoice.user_id != pre_checkout_query.from_user.id or
+            invoice.amount != pre_checkout_query.total_amount
+        ):
+            await pre_checkout_query.answer(
+                ok=False, error_message="This invoice is no longer valid. Please create a new one.")
+            return
+
     await pre_checkout_query.answer(ok=True)
 
 
 @log.catch
-async def process_deposit_payment(message: types.Message, db_session, payment_info: types.SuccessfulPayment) -> None:
+async def process_deposit_payment(
+    message: types.Message,
+    db_session,
+    payment_info: types.SuccessfulPayment,
+    order=None,
+    amount: int | None = None,
+    user_id: int | None = None
+) -> None:
     """
     Process successful deposit payment and update user balance.
 
@@ -214,9 +243,13 @@ async def process_deposit_payment(message: types.Message, db_session, payment_in
         message: Message object with payment info
         db_session: Database session
         payment_info: SuccessfulPayment object from Telegram
+        order: PendingOrder referenced by a signed payload, None for legacy payloads
+        amount: Stars to credit without an order, e.g. a charge whose order is gone
+        user_id: Telegram ID to credit together with amount
 
     Behavior:
-        - Parses payment payload
+        - Takes amount and user from the order or the arguments, or parses a legacy payload
+        - Claims the charge id, ignoring already applied payments
         - Updates user balance
         - Creates transaction record
         - Sends confirmation message
@@ -226,27 +259,40 @@ async def process_deposit_payment(message: types.Message, db_session, payment_in
         - Sends user-friendly error message
     """
     payload = payment_info.invoice_payload
-    parts = payload.split("_")
-    amount = int(parts[1])
-    user_id = int(parts[3])
+    if order is not None:
+        amount = order.amount
+        user_id = order.user_id
+    elif amount is None:
+        parts = payload.split("_")
+        amount = int(parts[1])
+        user_id = int(parts[3])
+
+    charge_id = payment_info.telegram_payment_charge_id
 
     try:
         with db_session as db:
+            # The claim commits together with the credit below
+            if not claim_payment(db, charge_id, payload):
+                log.warning(f"Duplicate deposit payment {charge_id} ignored.")
+                return
+
             user = db.query(User).filter(User.user_id == user_id).first()
             if not user:
                 raise ValueError("User not found.")
 
             user.balance += amount
 
-            transaction = Transaction(
+            record_transaction(
+                db,
                 user_id=user_id,
                 amount=amount,
-                telegram_payment_charge_id=payment_info.telegram_payment_charge_id,
-                status="completed",
-                time=datetime.now().isoformat(),
+                kind=DEPOSIT,
+                telegram_payment_charge_id=charge_id,
                 payload=payload  # Saving payload in transaction
             )
-            db.add(transaction)
+            mark_payment_applied(db, charge_id)
+            if order is not None:
+                mark_order_paid(db, order.id)
             db.commit()
 
         await message.reply(
@@ -341,8 +387,20 @@ async def command_refund_handler(message: types.Message, bot: Bot, command: Comm
                 await message.reply("Failed to find user for balance update. Please contact support.")
                 return
 
+            # Stamp the kind so the ledger counts the REFUND row below, not the status
+            transaction.kind = transaction_kind(
+                transaction.kind, transaction.amount, transaction.payload,
+                transaction.telegram_payment_charge_id)
             transaction.status = "refunded"
             user.balance -= refund_amount
+            record_transaction(
+                db,
+                user_id=user.user_id,
+                amount=-refund_amount,
+                kind=REFUND,
+                telegram_payment_charge_id=f"refund_{transaction_id}",
+                payload=transaction.payload,
+            )
             db.commit()
 
         await message.reply(
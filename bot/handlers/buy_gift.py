@@ -1,6 +1,3 @@
-from datetime import datetime
-
-import aiohttp
 from aiogram import types, Router
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
@@ -10,7 +7,11 @@ from utils.logger import log
 from bot.states.gift_state import GiftStates
 from bot.keyboards.inline import payment_keyboard
 from bot.keyboards.default import go_back_menu, main_menu
-from db.models import User, Transaction
+from db.models import User
+from db.ledger import record_transaction, PURCHASE, DELIVERY
+from db.payments import claim_payment, mark_payment_applied
+from db.orders import create_order, mark_order_paid
+from utils.invoice_payload import encode_payload, KIND_GIFT
 
 router = Router()
 gifts_api = GiftsApi()
@@ -50,8 +51,8 @@ async def fetch_gifts_list() -> list | None:
         Exception: Logs any API errors but doesn't propagate them
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            return await gifts_api.aio_get_available_gifts(session=session)
+        session = await gifts_api.get_session()
+        return await gifts_api.aio_get_available_gifts(session=session)
     except Exception as e:
         log.error(f"Error fetching gifts list: {e}")
         return None
@@ -62,7 +63,8 @@ async def process_gift_payment(
     message: types.Message,
     db_session,
     payment_info: types.SuccessfulPayment = None,
-    from_balance: bool = False
+    from_balance: bool = False,
+    order=None
 ) -> None:
     """
     Process gift payment and send gifts to recipient.
@@ -72,50 +74,72 @@ async def process_gift_payment(
         db_session: Database session
         payment_info: SuccessfulPayment object (for external payments)
         from_balance: Flag indicating balance payment
+        order: PendingOrder referenced by a signed payload, None for legacy payloads
 
     Workflow:
-        1. Parse payment details from payload/message
-        2. Validate gift ID and price
-        3. Send gifts via API
-        4. Record transaction
-        5. Confirm completion
+        1. Take payment details from the order, or parse payload/message
+        2. Validate gift ID and price (catalog lookup for legacy payloads only)
+        3. Claim the charge id, ignoring already processed payments
+        4. Send gifts via API
+        5. Record transaction
+        6. Confirm completion
 
     Raises:
         ValueError: If gift ID is invalid or price unavailable
     """
-    if not from_balance:
-        payload = payment_info.invoice_payload
-        parts = payload.split("_")
-        gift_id = parts[1]
-        user_id = parts[3]
-        gifts_count = int(parts[5])
+    if order is not None:
+        # Price and quantity were locked when the order was created
+        gift_id = order.gift_id
+        user_id = order.recipient_id
+        gifts_count = order.quantity
+        amount = order.amount
+        gift_price = order.unit_price or amount // gifts_count
+        if payment_info is not None:
+            payload = payment_info.invoice_payload
+        else:
+            payload = f"gift_{gift_id}_to_{user_id}_count_{gifts_count}"
     else:
-        parts = message.text.split()
-        gift_id = parts[0]
-        user_id = parts[1]
-        gifts_count = int(parts[2])
-        payload = f"gift_{gift_id}_to_{user_id}_count_{gifts_count}"
-
-    gifts_list = await fetch_gifts_list()
-    for gift in gifts_list:
-        if str(gift_id) == str(gift.get('id')):
-            gift_price = gift.get('star_count')
+        if not from_balance:
+            payload = payment_info.invoice_payload
+            parts = payload.split("_")
+            gift_id = parts[1]
+            user_id = parts[3]
+            gifts_count = int(parts[5])
+        else:
+            parts = message.text.split()
+            gift_id = parts[0]
+            user_id = parts[1]
+            gifts_count = int(parts[2])
+            payload = f"gift_{gift_id}_to_{user_id}_count_{gifts_count}"
+
+        gifts_list = await fetch_gifts_list() or []
+        gift_price = next(
+            (gift.get('star_count') for gift in gifts_list if str(gift_id) == str(gift.get('id'))), None)
 
-    if gift_price is None:
-        raise ValueError("Invalid gift ID or price retrieval error.")
+        if gift_price is None:
+            raise ValueError("Invalid gift ID or price retrieval error.")
 
-    amount = int(gift_price) * gifts_count
+        amount = int(gift_price) * gifts_count
     telegram_payment_charge_id = 'buy_gift_transaction' if from_balance else payment_info.telegram_payment_charge_id
 
     try:
         with db_session as db:
+            if not from_balance:
+                # Commit the claim before sending so a redelivery can never send twice
+                if not claim_payment(db, telegram_payment_charge_id, payload):
+                    log.warning(f"Duplicate gift payment {telegram_payment_charge_id} ignored.")
+                    return
+                if order is not None:
+                    mark_order_paid(db, order.id)
+                db.commit()
+
             user = db.query(User).filter(
                 User.user_id == message.from_user.id).first()
             if not user:
                 raise ValueError("User not found in database.")
 
             for _ in range(gifts_count):
-                result = await gifts_api.send_gift(user_id=user_id, gift_id=gift_id)
+                result = await gifts_api.send_gift(user_id=user_id, gift_id=gift_id, price=int(gift_price))
                 if result:
                     log.info(
                         f"Gift {gift_id} successfully sent to user {user_id}.")
@@ -124,15 +148,16 @@ async def process_gift_payment(
                         f"Error sending gift {gift_id} to user {user_id}.")
                     await message.reply(f"Error sending gift to user {user_id}. Stars were preserved.")
 
-            transaction = Transaction(
+            record_transaction(
+                db,
                 user_id=message.from_user.id,
                 amount=amount,
+                kind=DELIVERY,
                 telegram_payment_charge_id=telegram_payment_charge_id,
-                status="completed",
-                time=datetime.now().isoformat(),
                 payload=payload  # Store payload in transaction
             )
-            db.add(transaction)
+            if not from_balance:
+                mark_payment_applied(db, telegram_payment_charge_id)
             db.commit()
 
         await message.reply(f"Gift with ID {gift_id} successfully sent to user {user_id}.")
@@ -201,9 +226,10 @@ async def process_gift_id_input(
 
     Workflow:
         1. Validate input format
-        2. Check gift availability
-        3. Process payment (balance or invoice)
-        4. Handle success/error cases
+        2. Check gift availability and quote its price
+        3. Record an order locking the quoted price
+        4. Process payment (balance or invoice)
+        5. Handle success/error cases
     """
     if message.text == "/go_back":
         await return_to_main_menu(message, state)
@@ -241,28 +267,37 @@ async def process_gift_id_input(
 
             if user.balance >= amount:
                 user.balance -= amount
+                order = create_order(
+                    db, message.from_user.id, "gift", amount, gift_id=gift_id,
+                    recipient_id=user_id, quantity=gifts_count, unit_price=gift_price,
+                    status="paid")
 
-                transaction = Transaction(
+                record_transaction(
+                    db,
                     user_id=user.user_id,
                     amount=amount,
+                    kind=PURCHASE,
                     telegram_payment_charge_id="local_transaction",
-                    status="completed",
-                    time=datetime.now().isoformat(),
                     payload=payload  # Store payload
                 )
-                db.add(transaction)
                 db.commit()
 
                 await message.reply(f"Purchase successful! Remaining balance: {user.balance}⭐️.")
-                await process_gift_payment(message=message, db_session=db_session, from_balance=True)
+                await process_gift_payment(
+                    message=message, db_session=db_session, from_balance=True, order=order)
             else:
                 required_amount = amount - user.balance
+                order = create_order(
+                    db, message.from_user.id, "gift", amount, gift_id=gift_id,
+                    recipient_id=user_id, quantity=gifts_count, unit_price=gift_price)
+                db.commit()
                 prices = [types.LabeledPrice(
                     label="Additional deposit", amount=required_amount)]
                 await message.answer_invoice(
                     title="Additional deposit",
                     description=f"Purchase requires {amount}⭐️, you have {user.balance}⭐️.",
-                    payload=payload,  # Pass payload
+                    payload=encode_payload(
+                        KIND_GIFT, order.id, message.from_user.id, required_amount),
                     currency="XTR",
                     prices=prices,
                     provider_token="",
@@ -0,0 +1,106 @@
+from aiogram import types, Router, F
+from aiogram.filters import Command
+
+from utils.logger import log
+from bot.keyboards.inline import history_keyboard
+from db.models import Transaction
+from db.ledger import read_ledger_summary
+
+router = Router()
+
+HISTORY_PAGE_SIZE = 10
+
+
+def fetch_history_page(db, user_id: str, before_id: int | None = None,
+                       limit: int = HISTORY_PAGE_SIZE) -> tuple[list, int | None]:
+    """
+    Fetch one page of a user's transactions, newest first, using keyset pagination.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID
+        before_id: Only return transactions with a smaller id (cursor from the previous page)
+        limit: Page size
+
+    Returns:
+        tuple: (list of Transaction, cursor for the next page or None on the last page)
+    """
+    query = db.query(Transaction).filter(Transaction.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(Transaction.id < before_id)
+    rows = query.order_by(Transaction.id.desc()).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def format_history_page(summary, transactions: list) -> str:
+    """
+    Render the ledger summary and a page of transactions.
+
+    Args:
+        summary: UserLedgerSummary of the user
+        transactions: Transactions of the current page
+
+    Returns:
+        str: HTML formatted message text
+    """
+    lines = [
+        "<b>Transaction history</b>",
+        f"Deposited: {summary.deposits}⭐️ | Spent: {summary.spent}⭐️ | Refunded: {summary.refunds}⭐️",
+        "",
+    ]
+    for transaction in transactions:
+        time = (transaction.time or "")[:16].replace("T", " ")
+        lines.append(
+            f"{time} | {transaction.kind or '-'} | {transaction.amount}⭐️ | {transaction.status}"
+        )
+    if not transactions:
+        lines.append("No transactions yet.")
+    return "\n".join(lines)
+
+
+@log.catch
+@router.message(Command(commands=["history"]))
+async def history_command(message: types.Message, read_session) -> None:
+    """
+    Display the first page of the user's transaction history.
+
+    Args:
+        message: Incoming message object
+        read_session: Read-only database session
+    """
+    user_id = str(message.from_user.id)
+    with read_session as db:
+        summary = read_ledger_summary(db, user_id)
+        transactions, next_cursor = fetch_history_page(db, user_id)
+        text = format_history_page(summary, transactions)
+
+    await message.answer(text, reply_markup=history_keyboard(next_cursor), parse_mode="HTML")
+
+
+@log.catch
+@router.callback_query(F.data.startswith("history:"))
+async def history_page_callback(callback: types.CallbackQuery, read_session) -> None:
+    """
+    Show an older page of the transaction history in place.
+
+    Args:
+        callback: Callback query carrying the keyset cursor
+        read_session: Read-only database session
+    """
+    try:
+        before_id = int(callback.data.split(":", 1)[1])
+    except ValueError:
+        await callback.answer("Invalid page.")
+        return
+
+    user_id = str(callback.from_user.id)
+    with read_session as db:
+        summary = read_ledger_summary(db, user_id)
+        transactions, next_cursor = fetch_history_page(db, user_id, before_id)
+        text = format_history_page(summary, transactions)
+
+    await callback.message.edit_text(text, reply_markup=history_keyboard(next_cursor), parse_mode="HTML")
+    await callback.answer()
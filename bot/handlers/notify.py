@@ -0,0 +1,35 @@
+from aiogram import types, Router
+from aiogram.filters import Command
+
+from utils.logger import log
+from db.models import User
+from db.broadcasts import set_notify
+
+router = Router()
+
+
+@log.catch
+@router.message(Command(commands=["notify"]))
+async def notify_command(message: types.Message, db_session):
+    """
+    Toggle announcements of newly released gifts for the user.
+
+    Args:
+        message: Incoming message object
+        db_session: Database session
+    """
+    with db_session as db:
+        user = db.query(User).filter(
+            User.user_id == str(message.from_user.id)).first()
+        if not user:
+            await message.answer("Use /start to register first.")
+            return
+
+        enabled = not user.notify_new_gifts
+        set_notify(db, user.user_id, enabled)
+        db.commit()
+
+    if enabled:
+        await message.answer("🔔 You will be notified when new gifts are released. Send /notify again to stop.")
+    else:
+        await message.answer("🔕 New gift notifications are off.")
@@ -3,6 +3,8 @@ from aiogram import types, Router, F
 from utils.logger import log
 from bot.handlers.balance import process_deposit_payment
 from bot.handlers.buy_gift import process_gift_payment
+from db.orders import get_order
+from utils.invoice_payload import decode_payload, KIND_DEPOSIT, KIND_GIFT
 
 
 router = Router()
@@ -14,7 +16,11 @@ async def handle_successful_payment(message: types.Message, db_session):
     """
     Universal handler for successful payments.
 
-    Processes different payment types based on payload prefix:
+    Signed payloads are resolved to their order with a single primary-key
+    lookup and routed by order kind. The user has already been charged, so
+    an order that expired since pre-checkout is still honoured, and a
+    payment whose order is gone or doesn't match is credited to the
+    balance rather than dropped. Legacy payloads are routed by prefix:
     - 'deposit_' prefix: handles deposit payments
     - 'gift_' prefix: handles gift payments
 
@@ -35,6 +41,30 @@ async def handle_successful_payment(message: types.Message, db_session):
 
     payload = payment_info.invoice_payload
 
+    invoice = decode_payload(payload)
+    if invoice is not None:
+        with db_session as db:
+            # Redeliveries of a paid order are dropped by the charge id claim downstream
+            order = get_order(db, invoice.order_id)
+        if order is None or invoice.amount != payment_info.total_amount:
+            log.warning(
+                f"Payment {payment_info.telegram_payment_charge_id} does not match order "
+                f"{invoice.order_id}, crediting {payment_info.total_amount} stars to the balance.")
+            await message.reply("This invoice is no longer valid, the payment is credited to your balance instead.")
+            await process_deposit_payment(
+                message, db_session, payment_info,
+                amount=payment_info.total_amount, user_id=invoice.user_id)
+            return
+
+        if invoice.kind == KIND_DEPOSIT:
+            await process_deposit_payment(message, db_session, payment_info, order=order)
+        elif invoice.kind == KIND_GIFT:
+            await process_gift_payment(message, db_session, payment_info, order=order)
+        else:
+            log.error(f"Unknown order kind in payload: {invoice}")
+            await message.reply("Error: Unknown payment type. Please contact support.")
+        return
+
     # Determine payment type by payload prefix
     if payload.startswith("deposit_"):
         await process_deposit_payment(message, db_session, payment_info)
@@ -2,6 +2,7 @@ from aiogram import Router, types
 from aiogram.filters import CommandStart
 
 from db.models import User
+from db.user_cache import get_user_snapshot
 from bot.keyboards.default import main_menu
 
 # Create router for /start command
@@ -27,9 +28,8 @@ async def start_handler(message: types.Message, db_session):
     """
     # Open database session via context manager
     with db_session as db:
-        # Search for user by username
-        user = db.query(User).filter(User.username ==
-                                     message.from_user.username).first()
+        # Search for user by Telegram id, served from the user cache when possible
+        user = get_user_snapshot(db, message.from_user.id)
 
         if user:
             # Existing user greeting with current balance
@@ -40,8 +40,10 @@ async def start_handler(message: types.Message, db_session):
                 f"/start - Launch bot\n"
                 f"/balance - Check balance\n"
                 f"/deposit - Add funds\n"
+                f"/history - Transaction history\n"
                 f"/buy_gift - Buy gifts\n"
                 f"/auto_buy - Auto gift purchase\n"
+                f"/notify - New gift notifications\n"
                 f"/help - Developer contacts",
                 reply_markup=main_menu()
             )
@@ -12,6 +12,7 @@ def main_menu():
         - Deposit funds
         - Start command
         - Auto-buy setup
+        - Transaction history
     """
     markup = ReplyKeyboardMarkup(
         keyboard=[
@@ -22,7 +23,8 @@ def main_menu():
             ],
             [
                 KeyboardButton(text="/start"),
-                KeyboardButton(text='/auto_buy')
+                KeyboardButton(text='/auto_buy'),
+                KeyboardButton(text='/history')
             ]
         ],
         resize_keyboard=True
@@ -79,6 +81,8 @@ def auto_buy_keyboard():
         - Price limit setup
         - Supply limit setup
         - Cycles configuration
+        - Watchlist, active hours and per-gift cap setup
+        - Spend limits setup
         - Main menu return
     """
     markup = ReplyKeyboardMarkup(
@@ -91,6 +95,14 @@ def auto_buy_keyboard():
                 KeyboardButton(text="✏️ Supply Limit"),
                 KeyboardButton(text="✏️ Number of Cycles"),
             ],
+            [
+                KeyboardButton(text="👁 Watchlist"),
+                KeyboardButton(text="🕒 Active Hours"),
+                KeyboardButton(text="✏️ Max per Gift"),
+            ],
+            [
+                KeyboardButton(text="💰 Spend Limits")
+            ],
             [
                 KeyboardButton(text="🔙 Back to Main Menu")
             ]
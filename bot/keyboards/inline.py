@@ -5,3 +5,20 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 def payment_keyboard(price):
     builder = InlineKeyboardBuilder()
     builder.button(text=f'Оплатить {price}⭐️')
+
+
+def history_keyboard(before_id: int | None):
+    """
+    Creates pagination keyboard for transaction history.
+
+    Args:
+        before_id: Keyset cursor of the next (older) page, None on the last page
+
+    Returns:
+        InlineKeyboardMarkup | None: Keyboard with an "Older" button, if there are older entries
+    """
+    if before_id is None:
+        return None
+    builder = InlineKeyboardBuilder()
+    builder.button(text="⬅️ Older", callback_data=f"history:{before_id}")
+    return builder.as_markup()
@@ -1,10 +1,15 @@
-from db.session import get_db_session
+from db.session import get_db_session, get_read_session
 
 
 class DBSessionMiddleware:
-    """Middleware to pass the database session to the handlers"""
+    """Middleware to pass the database sessions to the handlers"""
 
     async def __call__(self, handler, event, data):
-        with get_db_session() as db:
+        user = data.get("event_from_user")
+        user_id = user.id if user is not None else None
+        # read_session is for read-only handlers; it may point at the replica
+        with get_db_session() as db, get_read_session(user_id) as read_db:
+            db.info["user_id"] = user_id
             data['db_session'] = db
+            data['read_session'] = read_db
             return await handler(event, data)
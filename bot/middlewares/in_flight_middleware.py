@@ -0,0 +1,16 @@
+import asyncio
+
+# Tasks currently running an update handler, drained on shutdown
+in_flight_updates: set[asyncio.Task] = set()
+
+
+class InFlightMiddleware:
+    """Middleware that tracks running update handlers so shutdown can wait for them"""
+
+    async def __call__(self, handler, event, data):
+        task = asyncio.current_task()
+        in_flight_updates.add(task)
+        try:
+            return await handler(event, data)
+        finally:
+            in_flight_updates.discard(task)
@@ -0,0 +1,129 @@
+import time
+from collections import Counter, OrderedDict
+
+from utils.logger import log
+from utils.rate_limit import TokenBucket
+
+
+# Sustained tokens per second and burst size of each user's bucket
+THROTTLE_RATE = 1.0
+THROTTLE_BURST = 5
+# Cost of commands that fetch the catalog, create invoices or commit settings
+EXPENSIVE_COMMANDS = {"/buy_gift": 3, "/auto_buy": 2, "/deposit": 2, "/history": 2, "/start": 2}
+# Identical updates from the same user within this many seconds are merged into the first
+MERGE_WINDOW = 2.0
+# Users tracked at once; the least recently seen are evicted first
+MAX_TRACKED_USERS = 10000
+# Seconds between throttling summaries in the log
+STATS_INTERVAL = 300
+
+# passed / dropped / merged / evicted, since the last summary
+throttle_stats = Counter()
+
+
+class _UserState:
+    __slots__ = ("bucket", "last_key", "last_seen", "warned")
+
+    def __init__(self):
+        self.bucket = TokenBucket(THROTTLE_RATE, THROTTLE_BURST)
+        self.last_key = None
+        self.last_seen = 0.0
+        self.warned = False
+
+
+def _update_key(update) -> tuple[int, str, str] | None:
+    """
+    Identify the user and content of a throttled update.
+
+    Payments and pre-checkout queries are never throttled, so they return None.
+
+    Returns:
+        tuple: (user id, kind, content) or None if the update is not throttled
+    """
+    message = update.message
+    if message is not None and message.from_user and not message.successful_payment:
+        return message.from_user.id, "message", message.text or ""
+    callback = update.callback_query
+    if callback is not None:
+        return callback.from_user.id, "callback", callback.data or ""
+    return None
+
+
+def _cost(kind: str, content: str) -> int:
+    if kind == "message" and content.startswith("/"):
+        command = content.split(maxsplit=1)[0].split("@", 1)[0]
+        return EXPENSIVE_COMMANDS.get(command, 1)
+    return 1
+
+
+class ThrottlingMiddleware:
+    """
+    Per-user flood control, run before the database session is opened.
+
+    Each user has a token bucket; commands that cause external calls or
+    commits cost more tokens. Repeats of an accepted update within a short
+    window are merged into the first instead of being handled again, except
+    for messages answering an FSM prompt, where a repeat is a real input.
+    Registered after aiogram's FSM middleware, so raw_state is known here.
+    """
+
+    def __init__(self):
+        self._users: OrderedDict[int, _UserState] = OrderedDict()
+        self._last_report = time.monotonic()
+
+    def _get_state(self, user_id: int) -> _UserState:
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState()
+            if len(self._users) > MAX_TRACKED_USERS:
+                self._users.popitem(last=False)
+                throttle_stats["evicted"] += 1
+        else:
+            self._users.move_to_end(user_id)
+        return state
+
+    def _report(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report < STATS_INTERVAL:
+            return
+        if throttle_stats["dropped"] or throttle_stats["merged"]:
+            log.info(
+                "Throttling: {} passed, {} dropped, {} merged, {} evicted, {} users tracked.",
+                throttle_stats["passed"], throttle_stats["dropped"], throttle_stats["merged"],
+                throttle_stats["evicted"], len(self._users)
+            )
+        throttle_stats.clear()
+        self._last_report = now
+
+    async def __call__(self, handler, event, data):
+        key = _update_key(event)
+        if key is None:
+            return await handler(event, data)
+
+        user_id, kind, content = key
+        state = self._get_state(user_id)
+        now = time.monotonic()
+        self._report()
+
+        mergeable = kind == "callback" or data.get("raw_state") is None
+        if mergeable and state.last_key == (kind, content) and now - state.last_seen < MERGE_WINDOW:
+            throttle_stats["merged"] += 1
+            if kind == "callback":
+                await event.callback_query.answer()
+            return None
+
+        if not state.bucket.try_acquire(_cost(kind, content)):
+            throttle_stats["dropped"] += 1
+            if kind == "callback":
+                await event.callback_query.answer("Too many requests, please wait a moment.")
+            elif not state.warned:
+                await event.message.answer("Too many requests, please wait a moment.")
+            state.warned = True
+            return None
+
+        # Only accepted updates start a merge window, so a retry after a drop is handled
+        state.last_key = (kind, content) if mergeable else None
+        state.last_seen = now
+        state.warned = False
+        throttle_stats["passed"] += 1
+        return await handler(event, data)
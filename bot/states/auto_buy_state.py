@@ -6,3 +6,7 @@ class AutoBuyStates(StatesGroup):
     set_price = State()
     set_supply = State()
     set_cycles = State()
+    set_watchlist = State()
+    set_window = State()
+    set_gift_cap = State()
+    set_budgets = State()
@@ -5,11 +5,122 @@ load_dotenv()  # Загружает переменные из .env
 
 bot_token = os.environ.get('BOT_TOKEN')
 database_url = os.environ.get('DATABASE_URL')
+# Read replica for read-only handlers and reports; reads use the primary when unset
+database_replica_url = os.environ.get('DATABASE_REPLICA_URL')
+# Run the gift watcher inside the bot process; disable when running watcher.py separately
+run_watcher = os.environ.get('RUN_WATCHER', '1').lower() not in ('0', 'false', 'no')
+# Key for signing invoice payloads, derived from the bot token when unset
+payload_secret = os.environ.get('PAYLOAD_SECRET')
+# Extra bot tokens that send gifts alongside the main bot, comma separated
+gift_tokens = [bot_token] + [
+    token.strip() for token in os.environ.get('BOT_TOKENS', '').split(',')
+    if token.strip() and token.strip() != bot_token
+]
+# Bot API server, overridable to point at a local fake API
+api_url = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
 
 
+def _flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).lower() not in ('0', 'false', 'no')
+
+
+# Database: connections kept open in the pool, and extra ones opened under load
+db_pool_size = int(os.environ.get('DB_POOL_SIZE', 10))
+db_max_overflow = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+# Seconds to wait for a free connection before giving up
+db_pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Seconds after which a connection is replaced, -1 to keep connections forever
+db_pool_recycle = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# Test connections on checkout so a restarted server doesn't fail the first query
+db_pool_pre_ping = _flag('DB_POOL_PRE_PING', '1')
+# Compiled statements cached per engine
+db_query_cache_size = int(os.environ.get('DB_QUERY_CACHE_SIZE', 1000))
+# Postgres: milliseconds a statement may run before the server cancels it, 0 disables
+db_statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+# SQLite: PRAGMA synchronous level used with the WAL journal, and lock wait in milliseconds
+db_sqlite_synchronous = os.environ.get('DB_SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+db_sqlite_busy_timeout = int(os.environ.get('DB_SQLITE_BUSY_TIMEOUT', 5000))
+# A checkout waiting longer than this many seconds is logged
+db_slow_checkout = float(os.environ.get('DB_SLOW_CHECKOUT', 0.05))
+# Seconds a user's reads stay on the primary after their own write, longer than replica lag
+replica_sticky_seconds = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Logging: "text" for human-readable lines, "json" for one serialized record per line
+log_format = os.environ.get('LOG_FORMAT', 'text').lower()
+log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Messages allowed per key and window by log_limited, and the window length in seconds
+log_rate_limit = int(os.environ.get('LOG_RATE_LIMIT', 10))
+log_rate_window = float(os.environ.get('LOG_RATE_WINDOW', 60))
+# Past the limit, still let every Nth message through (0 disables sampling)
+log_sample_every = int(os.environ.get('LOG_SAMPLE_EVERY', 100))
+
+# Runtime: "auto" uses uvloop when it is installed, "uvloop" or "asyncio" force one
+event_loop = os.environ.get('EVENT_LOOP', 'auto').lower()
+# Open connections per aiohttp session, and seconds resolved hosts are cached
+http_pool_limit = int(os.environ.get('HTTP_POOL_LIMIT', 100))
+http_dns_ttl = int(os.environ.get('HTTP_DNS_TTL', 300))
+# Seconds an idle keep-alive connection to the Bot API is kept open
+http_keepalive = float(os.environ.get('HTTP_KEEPALIVE', 30))
+# Threads for blocking work offloaded from the event loop, such as DB maintenance
+blocking_workers = int(os.environ.get('BLOCKING_WORKERS', 4))
+
+# Event loop lag monitor, started with the bot and the standalone watcher
+loop_monitor = _flag('LOOP_MONITOR', '1')
+# Seconds between lag probes, and the probe delay that counts as a slow callback
+loop_monitor_interval = float(os.environ.get('LOOP_MONITOR_INTERVAL', 0.25))
+loop_slow_threshold = float(os.environ.get('LOOP_SLOW_THRESHOLD', 0.1))
+
+# Shutdown: seconds the whole shutdown may take before leftover work is cancelled
+shutdown_grace = float(os.environ.get('SHUTDOWN_GRACE', 25))
+# Seconds a purchase pass keeps starting new sends after a stop was requested
+shutdown_purchase_grace = float(os.environ.get('SHUTDOWN_PURCHASE_GRACE', 10))
+
+# Local address of the liveness/readiness endpoint; HEALTH_PORT=0 disables it
+health_host = os.environ.get('HEALTH_HOST', '127.0.0.1')
+health_port = int(os.environ.get('HEALTH_PORT', 8090))
+# The watcher is reported dead when it made no progress for this many seconds,
+# and not ready when its last successful poll is older than this
+health_stale_seconds = float(os.environ.get('HEALTH_STALE_SECONDS', 60))
+health_ready_seconds = float(os.environ.get('HEALTH_READY_SECONDS', 20))
+
 
 def load_config():
     return {
         "bot_token": bot_token,
-        "DATABASE_URL": database_url
+        "DATABASE_URL": database_url,
+        "DATABASE_REPLICA_URL": database_replica_url,
+        "payload_secret": payload_secret,
+        "run_watcher": run_watcher,
+        "gift_tokens": gift_tokens,
+        "api_url": api_url,
+        "db_pool_size": db_pool_size,
+        "db_max_overflow": db_max_overflow,
+        "db_pool_timeout": db_pool_timeout,
+        "db_pool_recycle": db_pool_recycle,
+        "db_pool_pre_ping": db_pool_pre_ping,
+        "db_query_cache_size": db_query_cache_size,
+        "db_statement_timeout": db_statement_timeout,
+        "db_sqlite_synchronous": db_sqlite_synchronous,
+        "db_sqlite_busy_timeout": db_sqlite_busy_timeout,
+        "db_slow_checkout": db_slow_checkout,
+        "replica_sticky_seconds": replica_sticky_seconds,
+        "log_format": log_format,
+        "log_level": log_level,
+        "log_rate_limit": log_rate_limit,
+        "log_rate_window": log_rate_window,
+        "log_sample_every": log_sample_every,
+        "event_loop": event_loop,
+        "http_pool_limit": http_pool_limit,
+        "http_dns_ttl": http_dns_ttl,
+        "http_keepalive": http_keepalive,
+        "blocking_workers": blocking_workers,
+        "loop_monitor": loop_monitor,
+        "loop_monitor_interval": loop_monitor_interval,
+        "loop_slow_threshold": loop_slow_threshold,
+        "shutdown_grace": shutdown_grace,
+        "shutdown_purchase_grace": shutdown_purchase_grace,
+        "health_host": health_host,
+        "health_port": health_port,
+        "health_stale_seconds": health_stale_seconds,
+        "health_ready_seconds": health_ready_seconds,
     }
@@ -1,14 +1,81 @@
-from sqlalchemy import create_engine
+from sqlalchemy import inspect, text, select
+from sqlalchemy.orm import Session
 
-from .models import Base
+from .engine import make_engine, replica_pool_stats
+from .models import Base, Transaction, UserLedgerSummary
 from config import load_config
 
 config = load_config()
 
+_engine = None
+_replica_engine = None
 
-engine = create_engine(config['DATABASE_URL'], echo=False)
+
+def get_engine():
+    """Create the database engine on first use."""
+    global _engine
+    if _engine is None:
+        _engine = make_engine(config['DATABASE_URL'], settings=config)
+    return _engine
+
+
+def get_replica_engine():
+    """Create the read replica engine on first use; None when no replica is configured."""
+    global _replica_engine
+    if _replica_engine is None and config['DATABASE_REPLICA_URL']:
+        _replica_engine = make_engine(config['DATABASE_REPLICA_URL'], stats=replica_pool_stats, settings=config)
+    return _replica_engine
+
+
+def dispose_engines():
+    """Close all pooled connections, on shutdown."""
+    global _engine, _replica_engine
+    for engine in (_engine, _replica_engine):
+        if engine is not None:
+            engine.dispose()
+    _engine = _replica_engine = None
+
+
+def __getattr__(name):
+    # Keep `from db import engine` working without creating it at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _add_missing_columns():
+    """Add columns and indexes introduced after a table was first created."""
+    engine = get_engine()
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _backfill_ledger_summaries():
+    """Build ledger summaries once for a ledger that predates them."""
+    from .ledger import rebuild_ledger_summaries
+
+    with Session(get_engine()) as db:
+        has_summaries = db.execute(select(UserLedgerSummary.user_id).limit(1)).first()
+        has_transactions = db.execute(select(Transaction.id).limit(1)).first()
+        if has_transactions and not has_summaries:
+            rebuild_ledger_summaries(db)
 
 
 def init_db():
     """Init database"""
-    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=get_engine())
+    _add_missing_columns()
+    _backfill_ledger_summaries()
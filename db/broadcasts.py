@@ -0,0 +1,95 @@
+import time
+
+from sqlalchemy import select, update
+
+from .dialects import upsert_insert
+from .models import BroadcastJob, User
+
+
+def gift_caption(gift) -> str:
+    """
+    Build the announcement text of a catalog gift.
+
+    Args:
+        gift: GiftRecord from the catalog
+
+    Returns:
+        str: Caption for the announcement
+    """
+    lines = [f"{gift.emoji or '🎁'} New gift: {gift.star_count}⭐️"]
+    if gift.total_count is not None:
+        lines.append(f"Supply: {gift.remaining_count}/{gift.total_count}")
+    lines.append(f"ID: {gift.id}")
+    return "\n".join(lines)
+
+
+def enqueue_broadcasts(db, gifts: list) -> None:
+    """
+    Queue one announcement per new gift. The caller commits.
+
+    Jobs are keyed by gift id, so a gift that is detected again after a
+    restart is not announced twice.
+
+    Args:
+        db: Database session
+        gifts: GiftRecord objects from the catalog
+    """
+    if not gifts:
+        return
+    now = int(time.time())
+    stmt = upsert_insert(db, BroadcastJob).values([
+        {
+            "gift_id": gift.id,
+            "caption": gift_caption(gift),
+            "thumb_file_id": gift.thumb_file_id,
+            "last_user_pk": 0,
+            "sent": 0,
+            "status": "pending",
+            "created": now,
+        }
+        for gift in gifts
+    ]).on_conflict_do_nothing(index_elements=[BroadcastJob.gift_id])
+    db.execute(stmt)
+
+
+def next_broadcast_job(db) -> BroadcastJob | None:
+    """Return the oldest unfinished announcement, including one interrupted by a crash."""
+    return db.query(BroadcastJob).filter(
+        BroadcastJob.status == "pending").order_by(BroadcastJob.id).first()
+
+
+def fetch_subscribers(db, after_pk: int, limit: int) -> list:
+    """
+    Fetch the next page of subscribers in users.id order.
+
+    Args:
+        db: Database session
+        after_pk: Only return users with a larger users.id (the job cursor)
+        limit: Page size
+
+    Returns:
+        list: Rows (id, user_id)
+    """
+    return db.execute(
+        select(User.id, User.user_id)
+        .where(User.notify_new_gifts == True, User.id > after_pk)
+        .order_by(User.id)
+        .limit(limit)
+    ).all()
+
+
+def set_notify(db, user_id, enabled: bool) -> int:
+    """
+    Subscribe or unsubscribe a user from new gift announcements. The caller commits.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID
+        enabled: New subscription state
+
+    Returns:
+        int: Number of users updated
+    """
+    return db.execute(
+        update(User).where(User.user_id == str(user_id)).values(notify_new_gifts=enabled)
+    ).rowcount
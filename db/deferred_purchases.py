@@ -0,0 +1,43 @@
+import time
+
+from sqlalchemy import select
+
+from .models import DeferredPurchase, AutoBuySettings, User, Gift
+
+
+def defer_purchases(db, purchases: list) -> None:
+    """
+    Keep planned purchases that were not attempted, for the next start. The caller commits.
+
+    Args:
+        db: Database session
+        purchases: (user, settings, gift) tuples as built by plan_purchases
+    """
+    now = int(time.time())
+    db.add_all(
+        DeferredPurchase(user_id=user.user_id, gift_id=gift.gift_id, created=now)
+        for user, settings, gift in purchases
+    )
+
+
+def load_deferred_purchases(db) -> list:
+    """
+    Load deferred purchases with their user, settings and gift, oldest first.
+
+    Settings are None for users who turned auto-purchase off since, so the
+    caller can drop their rows.
+
+    Args:
+        db: Database session
+
+    Returns:
+        list: (DeferredPurchase, user, settings, gift) tuples
+    """
+    return db.execute(
+        select(DeferredPurchase, User, AutoBuySettings, Gift)
+        .join(Gift, Gift.gift_id == DeferredPurchase.gift_id)
+        .outerjoin(User, User.user_id == DeferredPurchase.user_id)
+        .outerjoin(AutoBuySettings, (AutoBuySettings.user_id == DeferredPurchase.user_id)
+                   & (AutoBuySettings.status == "enabled"))
+        .order_by(DeferredPurchase.id)
+    ).all()
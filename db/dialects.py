@@ -0,0 +1,29 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# Dialect-specific INSERT constructs supporting ON CONFLICT clauses
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_insert(db, table):
+    """
+    Build a dialect-specific INSERT supporting on_conflict_do_update/do_nothing.
+
+    Args:
+        db: Database session
+        table: Mapped class or Table to insert into
+
+    Returns:
+        Insert: Dialect INSERT construct for the session's bind
+
+    Raises:
+        NotImplementedError: If the database dialect has no ON CONFLICT support here
+    """
+    dialect = db.get_bind().dialect.name
+    insert = UPSERT_INSERTS.get(dialect)
+    if insert is None:
+        raise NotImplementedError(f"ON CONFLICT inserts are not supported for dialect '{dialect}'.")
+    return insert(table)
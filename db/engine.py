@@ -0,0 +1,148 @@
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from config import load_config
+from utils.logger import log_limited
+
+config = load_config()
+
+
+class PoolStats:
+    """Checkout wait times of the connection pool."""
+
+    def __init__(self, slow_checkout: float | None = None):
+        self.pool = None
+        # A checkout waiting longer than this many seconds is logged, db_slow_checkout when None
+        self._slow_checkout = slow_checkout
+        self.reset()
+
+    @property
+    def slow_checkout(self) -> float:
+        return config['db_slow_checkout'] if self._slow_checkout is None else self._slow_checkout
+
+    def reset(self) -> None:
+        """Clear collected metrics."""
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        if wait >= self.slow_checkout:
+            self.slow_checkouts += 1
+            log_limited(
+                "db.slow_checkout", "WARNING",
+                "Waited {:.0f} ms for a database connection ({})", wait * 1000, self.pool.status()
+            )
+
+    def metrics(self) -> dict:
+        """Current metrics as a flat dict."""
+        return {
+            "checkouts": self.checkouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "slow_checkouts": self.slow_checkouts,
+            "timeouts": self.timeouts,
+            "size": self.pool.size() if self.pool is not None else 0,
+            "checked_out": self.pool.checkedout() if self.pool is not None else 0,
+            "overflow": max(self.pool.overflow(), 0) if self.pool is not None else 0,
+        }
+
+    def render_metrics(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        metrics = self.metrics()
+        return "\n".join([
+            f"db_pool_checkouts_total {self.checkouts}",
+            f"db_pool_checkout_wait_seconds_sum {self.wait_total:.6f}",
+            f"db_pool_checkout_wait_seconds_max {self.wait_max:.6f}",
+            f"db_pool_slow_checkouts_total {self.slow_checkouts}",
+            f"db_pool_timeouts_total {self.timeouts}",
+            f"db_pool_size {metrics['size']}",
+            f"db_pool_checked_out {metrics['checked_out']}",
+            f"db_pool_overflow {metrics['overflow']}",
+        ]) + "\n"
+
+
+pool_stats = PoolStats()
+replica_pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+    stats = pool_stats
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def _sqlite_pragmas(synchronous: str, busy_timeout: int):
+    def set_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the purchase writes; NORMAL syncs on checkpoints only
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.close()
+    return set_pragmas
+
+
+def make_engine(database_url: str, stats: PoolStats = pool_stats, settings: dict | None = None):
+    """
+    Create an engine with the pool and driver settings from the configuration.
+
+    Args:
+        database_url: SQLAlchemy database URL
+        stats: Collector for the pool's checkout wait times
+        settings: Configuration with the db_* settings, load_config() by default
+
+    Returns:
+        Engine: Configured engine
+    """
+    settings = settings or config
+    url = make_url(database_url)
+    options = {"echo": False, "query_cache_size": settings['db_query_cache_size']}
+    in_memory = url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+    if not in_memory:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings['db_pool_size'],
+            max_overflow=settings['db_max_overflow'],
+            pool_timeout=settings['db_pool_timeout'],
+            pool_recycle=settings['db_pool_recycle'],
+            pool_pre_ping=settings['db_pool_pre_ping'],
+            # Reuse the most recent connection so idle ones age out and get recycled
+            pool_use_lifo=True,
+        )
+    if url.get_backend_name() == "postgresql":
+        connect_args = {"application_name": "gift-bot"}
+        if settings['db_statement_timeout']:
+            connect_args["options"] = f"-c statement_timeout={settings['db_statement_timeout']}"
+        options["connect_args"] = connect_args
+
+    engine = create_engine(url, **options)
+    if url.get_backend_name() == "sqlite" and not in_memory:
+        event.listen(engine, "connect", _sqlite_pragmas(
+            settings['db_sqlite_synchronous'], settings['db_sqlite_busy_timeout']))
+    if isinstance(engine.pool, TimedQueuePool):
+        engine.pool.stats = stats
+        stats.pool = engine.pool
+    return engine
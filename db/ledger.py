@@ -0,0 +1,190 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select, delete
+
+from .models import Transaction, UserLedgerSummary
+
+
+DEPOSIT = "deposit"
+PURCHASE = "purchase"  # Paid from the user's balance
+DELIVERY = "delivery"  # Record of gifts sent, no balance effect
+REFUND = "refund"
+
+
+def transaction_kind(kind: str | None, amount: int, payload: str | None, charge_id: str | None) -> str:
+    """
+    Classify a ledger row, inferring the kind for rows written before it was stored.
+
+    Args:
+        kind: Stored kind, if any
+        amount: Transaction amount
+        payload: Transaction payload
+        charge_id: telegram_payment_charge_id of the transaction
+
+    Returns:
+        str: One of DEPOSIT, PURCHASE, DELIVERY, REFUND
+    """
+    if kind:
+        return kind
+    if payload and payload.startswith("deposit_"):
+        return DEPOSIT
+    if charge_id == "local_transaction" or amount < 0:
+        return PURCHASE
+    return DELIVERY
+
+
+def balance_effect(kind: str | None, amount: int, status: str, payload: str | None = None,
+                   charge_id: str | None = None) -> int:
+    """
+    Return how much a ledger row changed the user's balance.
+
+    Refunds are written as their own REFUND rows, so a refunded deposit still
+    counts in full. Rows refunded before REFUND rows existed net out to zero.
+
+    Args:
+        kind: Stored kind, if any
+        amount: Transaction amount
+        status: Transaction status
+        payload: Transaction payload, used to infer legacy kinds
+        charge_id: telegram_payment_charge_id, used to infer legacy kinds
+
+    Returns:
+        int: Signed balance change
+    """
+    if kind is None and status == "refunded":
+        return 0
+    kind = transaction_kind(kind, amount, payload, charge_id)
+    if kind == DEPOSIT:
+        return amount
+    if kind in (PURCHASE, REFUND):
+        return -abs(amount)
+    return 0
+
+
+def get_ledger_summary(db, user_id) -> UserLedgerSummary:
+    """
+    Retrieve or create the ledger summary of a user.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID
+
+    Returns:
+        UserLedgerSummary: Summary row attached to the session
+    """
+    summary = db.get(UserLedgerSummary, str(user_id))
+    if summary is None:
+        summary = UserLedgerSummary(
+            user_id=str(user_id), deposits=0, spent=0, refunds=0, transactions_count=0)
+        db.add(summary)
+        db.flush([summary])  # Make it visible to db.get() in sessions without autoflush
+    return summary
+
+
+def read_ledger_summary(db, user_id) -> UserLedgerSummary:
+    """
+    Read the ledger summary of a user without writing, for read-only sessions.
+
+    Args:
+        db: Database session, possibly on a read replica
+        user_id: Telegram user ID
+
+    Returns:
+        UserLedgerSummary: Stored summary, or an unsaved all-zero one if the user has none
+    """
+    summary = db.get(UserLedgerSummary, str(user_id))
+    if summary is None:
+        summary = UserLedgerSummary(
+            user_id=str(user_id), deposits=0, spent=0, refunds=0, transactions_count=0)
+    return summary
+
+
+def record_transaction(db, user_id, amount: int, kind: str, telegram_payment_charge_id: str,
+                       payload: str | None = None, status: str = "completed",
+                       auto_buy: bool = False) -> Transaction:
+    """
+    Add a ledger row and update the user's ledger summary in the same session.
+
+    The caller commits, so the row and the summary change land together.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID the row belongs to
+        amount: Transaction amount
+        kind: One of DEPOSIT, PURCHASE, DELIVERY, REFUND
+        telegram_payment_charge_id: Telegram charge id or a local marker
+        payload: Invoice payload or description
+        status: Transaction status
+        auto_buy: Purchase made by the auto-buy watcher, counted against daily budgets
+
+    Returns:
+        Transaction: The added row
+    """
+    transaction = Transaction(
+        user_id=str(user_id),
+        amount=amount,
+        telegram_payment_charge_id=telegram_payment_charge_id,
+        payload=payload,
+        status=status,
+        time=datetime.now().isoformat(),
+        kind=kind,
+    )
+    db.add(transaction)
+
+    summary = get_ledger_summary(db, user_id)
+    if kind == DEPOSIT:
+        summary.deposits += amount
+    elif kind == PURCHASE:
+        summary.spent += abs(amount)
+        if auto_buy:
+            # Daily spend for auto-buy budgets, committed together with the purchase
+            today = datetime.now(timezone.utc).date().isoformat()
+            if summary.spent_day != today:
+                summary.spent_day, summary.spent_today = today, 0
+            summary.spent_today += abs(amount)
+    elif kind == REFUND:
+        summary.refunds += abs(amount)
+    summary.transactions_count += 1
+    return transaction
+
+
+def rebuild_ledger_summaries(db, chunk_size: int = 1000) -> int:
+    """
+    Recompute all ledger summaries from the transactions table.
+
+    Used to backfill summaries for ledgers written before they existed.
+
+    Args:
+        db: Database session
+        chunk_size: Rows fetched per round trip while streaming the ledger
+
+    Returns:
+        int: Number of users with a summary
+    """
+    totals = {}
+    rows = db.execute(
+        select(Transaction.user_id, Transaction.amount, Transaction.kind, Transaction.status,
+               Transaction.payload, Transaction.telegram_payment_charge_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for row in rows:
+        summary = totals.setdefault(str(row.user_id), [0, 0, 0, 0])
+        kind = transaction_kind(row.kind, row.amount, row.payload, row.telegram_payment_charge_id)
+        if kind == DEPOSIT:
+            summary[0] += row.amount
+            if row.kind is None and row.status == "refunded":
+                summary[2] += row.amount
+        elif kind == PURCHASE:
+            summary[1] += abs(row.amount)
+        elif kind == REFUND:
+            summary[2] += abs(row.amount)
+        summary[3] += 1
+
+    db.execute(delete(UserLedgerSummary))
+    db.add_all(
+        UserLedgerSummary(user_id=user_id, deposits=deposits, spent=spent,
+                          refunds=refunds, transactions_count=count)
+        for user_id, (deposits, spent, refunds, count) in totals.items()
+    )
+    db.commit()
+    return len(totals)
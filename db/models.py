@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Enum, Boolean, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 
 
@@ -13,6 +13,7 @@ class User(Base):
     username = Column(String(50), nullable=False)
     balance = Column(Integer, default=0)
     status = Column(String(20), default='user', nullable=False)
+    notify_new_gifts = Column(Boolean, default=False)  # Opted in to new gift announcements
 
     def __repr__(self):
         return f"<User(user_id={self.user_id}, username={self.username}, balance={self.balance})>"
@@ -25,16 +26,96 @@ class Transaction(Base):
     user_id = Column(String(50), nullable=False)
     amount = Column(Integer, nullable=False)
     telegram_payment_charge_id = Column(
-        String, nullable=False)
+        String, nullable=False, index=True)
     payload = Column(String)
     status = Column(Enum("completed", "refunded", name='transaction_status'),
                     default="completed", nullable=False)
     time = Column(String)
+    kind = Column(String(20), nullable=True)  # deposit / purchase / delivery / refund
+
+    __table_args__ = (
+        Index("ix_transactions_user_id_id", "user_id", "id"),
+    )
 
     def __repr__(self):
         return f"<Transaction(user_id={self.user_id}, amount={self.amount}, status={self.status})>"
 
 
+class ProcessedPayment(Base):
+    """Claim on a Telegram charge id, written before the payment is applied."""
+    __tablename__ = "processed_payments"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    telegram_payment_charge_id = Column(String, unique=True, nullable=False)
+    payload = Column(String)
+    status = Column(String(20), default="processing", nullable=False)  # processing / applied
+    time = Column(String)
+
+    def __repr__(self):
+        return f"<ProcessedPayment(telegram_payment_charge_id={self.telegram_payment_charge_id}, status={self.status})>"
+
+
+class PendingOrder(Base):
+    """Invoice issued to a user, referenced by the order id in its payload."""
+    __tablename__ = "pending_orders"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(50), nullable=False)
+    kind = Column(String(20), nullable=False)  # deposit / gift
+    amount = Column(Integer, nullable=False)  # Total price of the order in stars
+    gift_id = Column(String, nullable=True)
+    recipient_id = Column(String(50), nullable=True)
+    quantity = Column(Integer, default=1, nullable=False)
+    unit_price = Column(Integer, nullable=True)  # Gift price quoted at invoice time
+    status = Column(String(20), default="pending", nullable=False)  # pending / paid
+    created = Column(String)
+    expires_at = Column(Integer, nullable=True, index=True)  # Unix time, seconds
+
+    def __repr__(self):
+        return (f"<PendingOrder(id={self.id}, user_id={self.user_id}, kind={self.kind}, "
+                f"amount={self.amount}, status={self.status})>")
+
+
+class UserLedgerSummary(Base):
+    """Per-user ledger totals, maintained incrementally on each transaction write."""
+    __tablename__ = "user_ledger_summaries"
+
+    user_id = Column(String(50), primary_key=True)
+    deposits = Column(Integer, default=0, nullable=False)
+    spent = Column(Integer, default=0, nullable=False)
+    refunds = Column(Integer, default=0, nullable=False)
+    transactions_count = Column(Integer, default=0, nullable=False)
+    spent_day = Column(String(10), nullable=True)  # UTC date spent_today belongs to
+    spent_today = Column(Integer, default=0)  # Auto-buy purchases on spent_day, for daily budgets
+
+    def __repr__(self):
+        return (f"<UserLedgerSummary(user_id={self.user_id}, deposits={self.deposits}, "
+                f"spent={self.spent}, refunds={self.refunds})>")
+
+
+class LedgerBalance(Base):
+    """Per-user balance recomputed from the ledger by the reconciliation job."""
+    __tablename__ = "ledger_balances"
+
+    user_id = Column(String(50), primary_key=True)
+    balance = Column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<LedgerBalance(user_id={self.user_id}, balance={self.balance})>"
+
+
+class ReconcileCheckpoint(Base):
+    """Last ledger row folded into ledger_balances by a named reconciliation job."""
+    __tablename__ = "reconcile_checkpoints"
+
+    name = Column(String(50), primary_key=True)
+    last_transaction_id = Column(Integer, default=0, nullable=False)
+    updated = Column(String)
+
+    def __repr__(self):
+        return f"<ReconcileCheckpoint(name={self.name}, last_transaction_id={self.last_transaction_id})>"
+
+
 class AutoBuySettings(Base):
     __tablename__ = "auto_buy_settings"
 
@@ -49,6 +130,14 @@ class AutoBuySettings(Base):
     price_limit_to = Column(Integer, default=10**9, nullable=False)
     supply_limit = Column(Integer, default=10**9)
     cycles = Column(Integer, default=1, nullable=False)
+    # Daily active window in minutes since midnight UTC; may wrap past midnight, unset = always
+    active_from = Column(Integer, nullable=True)
+    active_to = Column(Integer, nullable=True)
+    max_per_gift = Column(Integer, nullable=True)  # Copies of one gift per drop, unset = cycles
+    # Spend caps in stars, unset = no cap beyond the balance
+    daily_budget = Column(Integer, nullable=True)  # Per UTC day
+    drop_budget = Column(Integer, nullable=True)  # Per detected drop
+    gift_budget = Column(Integer, nullable=True)  # Per gift within a drop
 
     def __repr__(self):
         return (f"<AutoBuySettings(user_id={self.user_id}, status={self.status}, "
@@ -56,6 +145,23 @@ class AutoBuySettings(Base):
                 f"supply_limit={self.supply_limit}, cycles={self.cycles})>")
 
 
+class WatchlistEntry(Base):
+    """Gift id or sticker emoji a user's auto-purchase is restricted to."""
+    __tablename__ = "auto_buy_watchlist"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(50), nullable=False)
+    target = Column(String(64), nullable=False)  # Gift id, or an emoji matching any gift with that sticker
+    max_count = Column(Integer, nullable=True)  # Copies per drop, overrides max_per_gift
+
+    __table_args__ = (
+        Index("ux_auto_buy_watchlist_user_target", "user_id", "target", unique=True),
+    )
+
+    def __repr__(self):
+        return f"<WatchlistEntry(user_id={self.user_id}, target={self.target}, max_count={self.max_count})>"
+
+
 class Gift(Base):
     __tablename__ = "gifts"
 
@@ -68,3 +174,77 @@ class Gift(Base):
 
     def __repr__(self):
         return f"<Gift(gift_id={self.gift_id}, price={self.price}, remaining_count={self.remaining_count}, is_new={self.is_new})>"
+
+
+class GiftHistory(Base):
+    """Append-only catalog history, one row per observed change of a gift."""
+    __tablename__ = "gift_history"
+    __table_args__ = (
+        Index("ix_gift_history_gift_id_ts", "gift_id", "ts"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    gift_id = Column(String, nullable=False)
+    ts = Column(Integer, nullable=False)  # Unix time, seconds
+    price = Column(Integer, nullable=False)
+    remaining_count = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<GiftHistory(gift_id={self.gift_id}, ts={self.ts}, price={self.price}, remaining_count={self.remaining_count})>"
+
+
+class WatcherSnapshot(Base):
+    """Compressed watcher state saved periodically and on shutdown for warm starts."""
+    __tablename__ = "watcher_snapshots"
+
+    name = Column(String(50), primary_key=True)
+    data = Column(LargeBinary, nullable=False)
+    saved_at = Column(Integer, nullable=False)  # Unix time, seconds
+
+    def __repr__(self):
+        return f"<WatcherSnapshot(name={self.name}, saved_at={self.saved_at}, size={len(self.data or b'')})>"
+
+
+class BroadcastJob(Base):
+    """New gift announcement, fanned out to subscribers and resumable from its cursor."""
+    __tablename__ = "broadcast_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    gift_id = Column(String, unique=True, nullable=False)
+    caption = Column(String, nullable=False)
+    thumb_file_id = Column(String, nullable=True)  # Sticker thumbnail from the catalog
+    photo_file_id = Column(String, nullable=True)  # Uploaded photo, reused after the first send
+    last_user_pk = Column(Integer, default=0, nullable=False)  # users.id of the last subscriber handled
+    sent = Column(Integer, default=0, nullable=False)
+    status = Column(String(20), default="pending", nullable=False)  # pending / done
+    created = Column(Integer, nullable=False)  # Unix time, seconds
+
+    def __repr__(self):
+        return (f"<BroadcastJob(gift_id={self.gift_id}, status={self.status}, "
+                f"last_user_pk={self.last_user_pk}, sent={self.sent})>")
+
+
+class DeferredPurchase(Base):
+    """Planned auto-buy left unsent when a shutdown cut the purchase pass short."""
+    __tablename__ = "deferred_purchases"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(50), nullable=False)
+    gift_id = Column(String, nullable=False)
+    created = Column(Integer, nullable=False)  # Unix time, seconds
+
+    def __repr__(self):
+        return f"<DeferredPurchase(user_id={self.user_id}, gift_id={self.gift_id})>"
+
+
+class WatcherStatus(Base):
+    """State the gift watcher shares with the bot process, one row per watcher."""
+    __tablename__ = "watcher_status"
+
+    name = Column(String(50), primary_key=True)
+    purchasing_until = Column(Integer, default=0, nullable=False)  # Unix time; 0 when no pass runs
+    watchlist_version = Column(Integer, default=0, nullable=False)  # Bumped by every watchlist write
+
+    def __repr__(self):
+        return (f"<WatcherStatus(name={self.name}, purchasing_until={self.purchasing_until}, "
+                f"watchlist_version={self.watchlist_version})>")
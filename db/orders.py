@@ -0,0 +1,121 @@
+import time
+from datetime import datetime
+
+from sqlalchemy import update, delete
+
+from .models import PendingOrder
+
+
+# Seconds an unpaid invoice stays payable at its quoted price
+ORDER_TTL = 24 * 3600
+
+
+def create_order(db, user_id, kind: str, amount: int, gift_id: str | None = None,
+                 recipient_id=None, quantity: int = 1, unit_price: int | None = None,
+                 status: str = "pending") -> PendingOrder:
+    """
+    Create an order, locking the quoted price until it expires.
+
+    The order is flushed so its id is available; the caller commits.
+
+    Args:
+        db: Database session
+        user_id: Telegram ID of the paying user
+        kind: "deposit" or "gift"
+        amount: Total price of the order in stars
+        gift_id: Gift to send, for gift orders
+        recipient_id: Telegram ID of the gift recipient, for gift orders
+        quantity: Number of gifts, for gift orders
+        unit_price: Quoted price of one gift, for gift orders
+        status: "pending", or "paid" for orders settled immediately from the balance
+
+    Returns:
+        PendingOrder: The flushed order with its id assigned
+    """
+    order = PendingOrder(
+        user_id=str(user_id),
+        kind=kind,
+        amount=amount,
+        gift_id=str(gift_id) if gift_id is not None else None,
+        recipient_id=str(recipient_id) if recipient_id is not None else None,
+        quantity=quantity,
+        unit_price=unit_price,
+        status=status,
+        created=datetime.now().isoformat(),
+        expires_at=int(time.time()) + ORDER_TTL,
+    )
+    db.add(order)
+    db.flush([order])
+    return order
+
+
+def get_pending_order(db, order_id: int) -> PendingOrder | None:
+    """
+    Look up an unpaid, unexpired order by primary key.
+
+    Args:
+        db: Database session
+        order_id: Order id from the invoice payload
+
+    Returns:
+        PendingOrder: The order if it exists, is still pending and has not expired
+        None: Otherwise
+    """
+    order = db.get(PendingOrder, order_id)
+    if order is None or order.status != "pending":
+        return None
+    if order.expires_at is not None and order.expires_at < time.time():
+        return None
+    return order
+
+
+def get_order(db, order_id: int) -> PendingOrder | None:
+    """
+    Look up an order by primary key whatever its status or expiry.
+
+    For payments Telegram has already charged: an order that expired after
+    pre-checkout approved it must still be honoured.
+
+    Args:
+        db: Database session
+        order_id: Order id from the invoice payload
+
+    Returns:
+        PendingOrder: The order if it exists
+        None: If it was never created or has been deleted
+    """
+    return db.get(PendingOrder, order_id)
+
+
+def mark_order_paid(db, order_id: int) -> None:
+    """
+    Mark an order as paid. The caller commits.
+
+    Args:
+        db: Database session
+        order_id: Order id from the invoice payload
+    """
+    db.execute(
+        update(PendingOrder)
+        .where(PendingOrder.id == order_id)
+        .values(status="paid")
+    )
+
+
+def delete_expired_orders(db) -> int:
+    """
+    Delete unpaid orders whose quote has expired.
+
+    Args:
+        db: Database session
+
+    Returns:
+        int: Number of deleted orders
+    """
+    result = db.execute(
+        delete(PendingOrder)
+        .where(PendingOrder.status == "pending", PendingOrder.expires_at < int(time.time()))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from sqlalchemy import update
+
+from .dialects import upsert_insert
+from .models import ProcessedPayment
+
+
+def claim_payment(db, telegram_payment_charge_id: str, payload: str | None = None) -> bool:
+    """
+    Claim a Telegram charge id before applying its payment.
+
+    A single INSERT ... ON CONFLICT DO NOTHING against the unique index on the
+    charge id, so a redelivered or concurrently delivered update loses the race
+    instead of applying the payment twice. The claim becomes visible to other
+    sessions when the caller commits, so committing it together with the
+    balance change makes the whole payment apply exactly once.
+
+    Args:
+        db: Database session
+        telegram_payment_charge_id: Charge id from SuccessfulPayment
+        payload: Invoice payload, kept for support lookups
+
+    Returns:
+        bool: True if this call claimed the charge, False if it was already claimed
+    """
+    stmt = upsert_insert(db, ProcessedPayment).values(
+        telegram_payment_charge_id=telegram_payment_charge_id,
+        payload=payload,
+        status="processing",
+        time=datetime.now().isoformat(),
+    ).on_conflict_do_nothing(
+        index_elements=[ProcessedPayment.telegram_payment_charge_id]
+    ).returning(ProcessedPayment.id)
+    return db.execute(stmt).first() is not None
+
+
+def mark_payment_applied(db, telegram_payment_charge_id: str) -> None:
+    """
+    Mark a claimed charge as fully applied. The caller commits.
+
+    Args:
+        db: Database session
+        telegram_payment_charge_id: Charge id from SuccessfulPayment
+    """
+    db.execute(
+        update(ProcessedPayment)
+        .where(ProcessedPayment.telegram_payment_charge_id == telegram_payment_charge_id)
+        .values(status="applied")
+    )
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import load_config
+
+config = load_config()
+
+# Users whose last write time is remembered
+MAX_STICKY_USERS = 10000
+
+_recent_writes: OrderedDict[str, float] = OrderedDict()
+
+
+def mark_written(user_id) -> None:
+    """Remember that a user's data just changed on the primary."""
+    key = str(user_id)
+    _recent_writes[key] = time.monotonic()
+    _recent_writes.move_to_end(key)
+    while len(_recent_writes) > MAX_STICKY_USERS:
+        _recent_writes.popitem(last=False)
+
+
+def reads_from_primary(user_id) -> bool:
+    """
+    Check whether a user's reads must stay on the primary.
+
+    Args:
+        user_id: Telegram user ID
+
+    Returns:
+        bool: True within replica_sticky_seconds of the user's last committed write
+    """
+    written = _recent_writes.get(str(user_id))
+    return written is not None and time.monotonic() - written < config['replica_sticky_seconds']
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_users(session, flush_context):
+    session.info["wrote"] = True
+    users = session.info.setdefault("written_users", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        user_id = getattr(obj, "user_id", None)
+        if user_id is not None:
+            users.add(str(user_id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed_users(session):
+    users = session.info.pop("written_users", set())
+    # The user an update's session was opened for, see DBSessionMiddleware
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        users.add(str(session.info["user_id"]))
+    for user_id in users:
+        mark_written(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("written_users", None)
+    session.info.pop("wrote", None)
@@ -1,16 +1,51 @@
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
-from . import engine
+from . import get_engine, get_replica_engine
+from . import user_cache  # noqa: F401  Registers cache invalidation on every session
+from .replica import reads_from_primary
 
 
-SessionLocal = scoped_session(sessionmaker(
-    autocommit=False, autoflush=False, bind=engine))
+# A plain factory rather than scoped_session: everything runs on one thread, so a
+# thread-local registry handed the same session to the watcher, the broadcaster and
+# the handlers, and whichever finished first closed it under the others.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 
 @contextmanager
 def get_db_session():
+    if SessionLocal.kw.get("bind") is None:
+        # Bind lazily so importing the module doesn't create the engine
+        SessionLocal.configure(bind=get_engine())
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def get_read_session(user_id=None):
+    """
+    Open a session for read-only work.
+
+    Reads go to the replica when one is configured, except for a user who
+    wrote recently, whose reads stay on the primary so they see their own
+    changes. Without a replica this is a primary session.
+
+    Args:
+        user_id: Telegram user ID the reads are for, if any
+    """
+    replica = get_replica_engine()
+    if replica is None or (user_id is not None and reads_from_primary(user_id)):
+        with get_db_session() as db:
+            yield db
+        return
+
+    if ReadSessionLocal.kw.get("bind") is None:
+        ReadSessionLocal.configure(bind=replica)
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,193 @@
+import time
+from collections import Counter, OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .models import User, AutoBuySettings, WatchlistEntry
+
+
+# Seconds a snapshot is served before it is read again. Writes made in this
+# process invalidate immediately; this only bounds staleness for writes made
+# by another process, such as a standalone watcher
+USER_CACHE_TTL = 30
+# Snapshots kept per cache; the least recently used are evicted first
+USER_CACHE_SIZE = 10000
+
+# hits / misses / invalidations across all caches
+cache_stats = Counter()
+
+_USER_COLUMNS = (User.id, User.user_id, User.username, User.balance, User.status, User.notify_new_gifts)
+_SETTINGS_COLUMNS = (
+    AutoBuySettings.id, AutoBuySettings.user_id, AutoBuySettings.status,
+    AutoBuySettings.price_limit_from, AutoBuySettings.price_limit_to,
+    AutoBuySettings.supply_limit, AutoBuySettings.cycles,
+    AutoBuySettings.active_from, AutoBuySettings.active_to, AutoBuySettings.max_per_gift,
+    AutoBuySettings.daily_budget, AutoBuySettings.drop_budget, AutoBuySettings.gift_budget,
+)
+
+
+class SnapshotCache:
+    """Bounded LRU mapping of Telegram id to a read-only row, with a TTL."""
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires at, row)
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            cache_stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        cache_stats["hits"] += 1
+        return entry[1]
+
+    def put(self, key: str, row) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, row)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        if self._entries.pop(key, None) is not None:
+            cache_stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_users = SnapshotCache()
+_settings = SnapshotCache()
+_watchlists = SnapshotCache()
+
+
+def get_user_snapshot(db, user_id):
+    """
+    Read a user through the cache.
+
+    Args:
+        db: Database session, only used on a miss
+        user_id: Telegram user ID
+
+    Returns:
+        Row: Read-only (id, user_id, username, balance, status, notify_new_gifts)
+        None: If the user doesn't exist
+    """
+    key = str(user_id)
+    row = _users.get(key)
+    if row is None:
+        row = db.execute(select(*_USER_COLUMNS).where(User.user_id == key)).first()
+        if row is not None:
+            _users.put(key, row)
+    return row
+
+
+def get_settings_snapshot(db, user_id):
+    """
+    Read a user's auto-purchase settings through the cache.
+
+    Args:
+        db: Database session, only used on a miss
+        user_id: Telegram user ID
+
+    Returns:
+        Row: Read-only settings columns
+        None: If the user has no settings yet
+    """
+    key = str(user_id)
+    row = _settings.get(key)
+    if row is None:
+        row = db.execute(select(*_SETTINGS_COLUMNS).where(AutoBuySettings.user_id == key)).first()
+        if row is not None:
+            _settings.put(key, row)
+    return row
+
+
+def get_watchlist_snapshot(db, user_id) -> tuple:
+    """
+    Read a user's auto-buy watchlist through the cache.
+
+    Args:
+        db: Database session, only used on a miss
+        user_id: Telegram user ID
+
+    Returns:
+        tuple: Rows (target, max_count), in the order they were added
+    """
+    key = str(user_id)
+    rows = _watchlists.get(key)
+    if rows is None:
+        rows = tuple(db.execute(
+            select(WatchlistEntry.target, WatchlistEntry.max_count)
+            .where(WatchlistEntry.user_id == key)
+            .order_by(WatchlistEntry.id)
+        ).all())
+        _watchlists.put(key, rows)
+    return rows
+
+
+def invalidate_user(user_id) -> None:
+    """Drop the cached user, settings and watchlist snapshots of a Telegram id."""
+    key = str(user_id)
+    _users.invalidate(key)
+    _settings.invalidate(key)
+    _watchlists.invalidate(key)
+
+
+def invalidate_on_commit(db, user_id) -> None:
+    """
+    Drop a user's snapshots now and again when the session commits.
+
+    For writes the flush hooks can't attribute to a user, such as the
+    watchlist's Core INSERT and DELETE statements.
+
+    Args:
+        db: Database session making the write
+        user_id: Telegram user ID
+    """
+    db.info.setdefault("user_cache_keys", set()).add(str(user_id))
+    invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed(session, flush_context):
+    # Invalidate at flush and again after commit, so a read between the two
+    # cannot leave the pre-commit row cached
+    keys = session.info.setdefault("user_cache_keys", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (User, AutoBuySettings)):
+            keys.add(str(obj.user_id))
+            invalidate_user(obj.user_id)
+
+
+def _clear_user_caches() -> None:
+    _users.clear()
+    _settings.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for key in session.info.pop("user_cache_keys", ()):
+        invalidate_user(key)
+    if session.info.pop("user_cache_clear", False):
+        _clear_user_caches()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    session.info.pop("user_cache_keys", None)
+    session.info.pop("user_cache_clear", None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_writes(orm_execute_state):
+    # Bulk UPDATE/DELETE statements don't say which users they touch; clear
+    # now and again after commit, like the per-row path
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (User, AutoBuySettings):
+            orm_execute_state.session.info["user_cache_clear"] = True
+            _clear_user_caches()
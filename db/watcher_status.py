@@ -0,0 +1,49 @@
+import time
+
+from sqlalchemy import select
+
+from .dialects import upsert_insert
+from .models import WatcherStatus
+
+
+WATCHER_NAME = "gift_watcher"
+# Seconds a purchase pass flag stays valid unless renewed, so a crashed watcher doesn't hold it
+PURCHASE_FLAG_TTL = 30
+
+
+def mark_purchase_pass(db, running: bool) -> None:
+    """
+    Flag a purchase pass as running, renewing it for PURCHASE_FLAG_TTL, or clear the flag.
+
+    The caller commits.
+
+    Args:
+        db: Database session
+        running: True while the watcher is purchasing
+    """
+    until = int(time.time()) + PURCHASE_FLAG_TTL if running else 0
+    stmt = upsert_insert(db, WatcherStatus).values(name=WATCHER_NAME, purchasing_until=until)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[WatcherStatus.name],
+        set_={"purchasing_until": stmt.excluded.purchasing_until},
+    ))
+
+
+def purchase_pass_running(db) -> bool:
+    """True while a watcher, in any process, has an unexpired purchase pass flag."""
+    status = db.get(WatcherStatus, WATCHER_NAME)
+    return status is not None and status.purchasing_until > time.time()
+
+
+def bump_watchlist_version(db) -> None:
+    """Record a watchlist write, so the watcher reloads its matcher. The caller commits."""
+    stmt = upsert_insert(db, WatcherStatus).values(name=WATCHER_NAME, watchlist_version=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[WatcherStatus.name],
+        set_={"watchlist_version": WatcherStatus.watchlist_version + 1},
+    ))
+
+
+def watchlist_version(db) -> int:
+    """Version of the watchlists, read with a primary key lookup."""
+    return db.scalar(select(WatcherStatus.watchlist_version).where(WatcherStatus.name == WATCHER_NAME)) or 0
@@ -0,0 +1,90 @@
+from collections import defaultdict
+
+from sqlalchemy import delete, select
+
+from .dialects import upsert_insert
+from .models import WatchlistEntry
+from .user_cache import invalidate_on_commit
+from .watcher_status import bump_watchlist_version
+
+# Entries a single user may keep
+MAX_WATCHLIST_SIZE = 20
+
+
+def get_watchlist(db, user_id) -> list:
+    """
+    Fetch a user's watchlist.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID
+
+    Returns:
+        list: Rows (target, max_count), in the order they were added
+    """
+    return db.execute(
+        select(WatchlistEntry.target, WatchlistEntry.max_count)
+        .where(WatchlistEntry.user_id == str(user_id))
+        .order_by(WatchlistEntry.id)
+    ).all()
+
+
+def add_watch(db, user_id, target: str, max_count: int | None = None) -> bool:
+    """
+    Add a gift id or emoji to a user's watchlist, or update its cap. The caller commits.
+
+    Args:
+        db: Database session
+        user_id: Telegram user ID
+        target: Gift id or sticker emoji
+        max_count: Copies of a matching gift bought per drop, None for the settings default
+
+    Returns:
+        bool: False if the watchlist is full and the target is not on it yet
+    """
+    entries = get_watchlist(db, user_id)
+    if len(entries) >= MAX_WATCHLIST_SIZE and target not in {entry.target for entry in entries}:
+        return False
+    stmt = upsert_insert(db, WatchlistEntry).values(
+        user_id=str(user_id), target=target, max_count=max_count)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[WatchlistEntry.user_id, WatchlistEntry.target],
+        set_={"max_count": stmt.excluded.max_count},
+    ))
+    bump_watchlist_version(db)
+    invalidate_on_commit(db, user_id)
+    return True
+
+
+def remove_watch(db, user_id, target: str | None = None) -> int:
+    """
+    Remove one target, or the whole watchlist when target is None. The caller commits.
+
+    Returns:
+        int: Number of entries removed
+    """
+    stmt = delete(WatchlistEntry).where(WatchlistEntry.user_id == str(user_id))
+    if target is not None:
+        stmt = stmt.where(WatchlistEntry.target == target)
+    removed = db.execute(stmt).rowcount
+    if removed:
+        bump_watchlist_version(db)
+    invalidate_on_commit(db, user_id)
+    return removed
+
+
+def load_watchlists(db) -> dict:
+    """
+    Fetch every watchlist in one query, for planning a drop.
+
+    Returns:
+        dict: user_id -> list of rows (target, max_count)
+    """
+    watchlists = defaultdict(list)
+    rows = db.execute(
+        select(WatchlistEntry.user_id, WatchlistEntry.target, WatchlistEntry.max_count)
+        .order_by(WatchlistEntry.id)
+    )
+    for row in rows:
+        watchlists[row.user_id].append(row)
+    return watchlists
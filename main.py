@@ -1,34 +1,81 @@
 import asyncio
 
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-
+from utils.startup import startup_profile
 from config import load_config
-from bot.handlers import register_handlers
-from bot.middlewares.db_session_middleware import DBSessionMiddleware
-from db import init_db
-from utils.logger import log
-from utils.gift_parser import start_gift_parsing_loop
+from utils.logger import log, flush_suppressed
+from utils.runtime import run, configure_loop
 
 # Load configuration
 config = load_config()
 
-# Initialize bot
-bot = Bot(token=config["bot_token"])
-dp = Dispatcher(storage=MemoryStorage())
+# Long-running tasks started with the bot, drained on shutdown
+background_tasks: dict[str, asyncio.Task] = {}
+# Liveness/readiness endpoint, closed on shutdown
+health_runner = None
 
 
-async def on_startup():
+async def on_startup(bot):
     """
     Actions to perform when the bot starts, including database initialization.
+
+    Args:
+        bot: Initialized aiogram Bot instance, used by the broadcaster
     """
     log.info("Initializing database...")
-    init_db()
+    with startup_profile.stage("database"):
+        from db import init_db
+        init_db()
     log.info("Database initialized successfully")
 
-    # Start parsing gifts
-    log.info("Starting gift parsing loop...")
-    asyncio.create_task(start_gift_parsing_loop())
+    global health_runner
+    from utils.supervisor import supervise
+    from utils.health import watcher_health, start_health_server
+
+    if config["run_watcher"]:
+        # Start parsing gifts, restarted with backoff if the loop dies
+        log.info("Starting gift parsing loop...")
+        with startup_profile.stage("watcher"):
+            from utils.gift_parser import start_gift_parsing_loop
+        watcher_health.enabled = True
+        background_tasks["watcher"] = asyncio.create_task(supervise(
+            "Gift watcher", start_gift_parsing_loop, on_restart=watcher_health.mark_restart))
+    else:
+        log.info("Gift parsing loop disabled, expecting a standalone watcher.py")
+
+    from utils.loop_monitor import loop_monitor
+    if config["loop_monitor"]:
+        loop_monitor.start()
+
+    # Announcements are queued in the database, so this also serves a standalone watcher
+    from utils.broadcaster import start_broadcast_loop
+    background_tasks["broadcaster"] = asyncio.create_task(
+        supervise("Broadcaster", lambda: start_broadcast_loop(bot)))
+
+    health_runner = await start_health_server()
+
+
+async def on_shutdown():
+    """
+    Drain in-flight work after polling has stopped, then release connections.
+
+    Runs from the dispatcher's shutdown hook, before aiogram closes the bot
+    session: update handlers finish first, then the watcher completes its
+    purchase pass and the broadcaster saves its cursor, all within shutdown_grace.
+    """
+    from utils.shutdown import request_stop, drain, grace_remaining
+    from bot.middlewares.in_flight_middleware import in_flight_updates
+    from bot.handlers.buy_gift import gifts_api
+    from db import dispose_engines
+
+    request_stop("polling stopped")
+    await drain(list(in_flight_updates), grace_remaining(), "update handler(s)")
+    await drain(background_tasks.values(), grace_remaining(), "background task(s)")
+    await gifts_api.close()
+    if health_runner is not None:
+        await health_runner.cleanup()
+    dispose_engines()
+    flush_suppressed(force=True)
+    log.info("Shutdown complete.")
 
 
 async def main():
@@ -37,20 +84,48 @@ async def main():
     """
     log.info("Starting bot...")
 
-    await on_startup()
+    configure_loop(asyncio.get_running_loop())
+
+    with startup_profile.stage("aiogram"):
+        from aiogram import Bot, Dispatcher
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        from aiogram.fsm.storage.memory import MemoryStorage
 
+    # Initialize bot
+    session = AiohttpSession(
+        api=TelegramAPIServer.from_base(config["api_url"]),
+        limit=config["http_pool_limit"],
+    )
+    bot = Bot(token=config["bot_token"], session=session)
+    dp = Dispatcher(storage=MemoryStorage())
+
+    await on_startup(bot)
+
+    with startup_profile.stage("handlers"):
+        from bot.handlers import register_handlers
+        from bot.middlewares.db_session_middleware import DBSessionMiddleware
+        from bot.middlewares.throttling_middleware import ThrottlingMiddleware
+        from bot.middlewares.in_flight_middleware import InFlightMiddleware
+
+    # Throttle before a database session is opened for the update
+    dp.update.outer_middleware(ThrottlingMiddleware())
+    dp.update.middleware(InFlightMiddleware())
     dp.update.middleware(DBSessionMiddleware())
+    dp.shutdown.register(on_shutdown)
 
     # Register handlers
     register_handlers(dp)
 
-    # Start polling
+    startup_profile.report()
+
+    # Start polling; SIGTERM and SIGINT stop it and run on_shutdown
     await bot.delete_webhook(drop_pending_updates=True)
     await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        run(main())
     except Exception as e:
         log.exception(f"Bot stopped due to an error: {e}")
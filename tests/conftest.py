@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Set before the db package reads its configuration: a throwaway file-backed
+# SQLite database, so several sessions can really race on it
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'test.db')}"
+os.environ["DATABASE_REPLICA_URL"] = ""
+os.environ.setdefault("BOT_TOKEN", "111:AAA")
+os.environ.setdefault("PAYLOAD_SECRET", "test-secret")
+
+
+@pytest.fixture
+def database():
+    """Fresh schema for each test."""
+    from db import init_db, get_engine
+    from db.models import Base
+    from db import user_cache
+
+    init_db()
+    yield get_engine()
+    Base.metadata.drop_all(bind=get_engine())
+    user_cache._users.clear()
+    user_cache._settings.clear()
+    user_cache._watchlists.clear()
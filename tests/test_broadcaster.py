@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramNetworkError
+
+from db.models import BroadcastJob, User
+from db.session import get_db_session
+from utils.broadcaster import run_broadcast
+
+
+class FakeBot:
+    def __init__(self, failures: dict):
+        self.failures = failures
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        if chat_id in self.failures:
+            raise self.failures[chat_id]
+        self.sent.append(chat_id)
+
+
+def _setup(db) -> BroadcastJob:
+    for user_id in ("1", "2", "3"):
+        db.add(User(user_id=user_id, username=f"u{user_id}", balance=0, notify_new_gifts=True))
+    job = BroadcastJob(gift_id="g1", caption="New gift", last_user_pk=0, sent=0, created=0)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_unreachable_chat_is_skipped(database):
+    bot = FakeBot({"2": TelegramNetworkError(method=None, message="timeout")})
+    with get_db_session() as db:
+        job = _setup(db)
+        asyncio.run(run_broadcast(db, bot, None, job))
+
+    with get_db_session() as db:
+        job = db.query(BroadcastJob).one()
+        assert (job.status, job.sent, job.last_user_pk) == ("done", 2, 3)
+    assert bot.sent == ["1", "3"]
+
+
+def test_cursor_is_committed_when_the_broadcast_fails(database):
+    bot = FakeBot({"2": RuntimeError("boom")})
+    with get_db_session() as db:
+        job = _setup(db)
+        with pytest.raises(RuntimeError):
+            asyncio.run(run_broadcast(db, bot, None, job))
+
+    with get_db_session() as db:
+        job = db.query(BroadcastJob).one()
+        # The first subscriber is not announced to again on retry
+        assert (job.status, job.sent, job.last_user_pk) == ("pending", 1, 1)
+
+
+def test_broadcast_waits_for_a_purchase_pass_in_another_process(database, monkeypatch):
+    from db.watcher_status import mark_purchase_pass
+    from utils import broadcaster
+
+    monkeypatch.setattr(broadcaster, "PURCHASE_CHECK_INTERVAL", 0.05)
+    monkeypatch.setattr(broadcaster, "_purchases_checked", 0.0)
+    bot = FakeBot({})
+    with get_db_session() as db:
+        job = _setup(db)
+        # Flagged by a watcher the bot shares no memory with
+        mark_purchase_pass(db, True)
+        db.commit()
+
+    async def scenario():
+        task = asyncio.create_task(run_broadcast(db, bot, None, job))
+        await asyncio.sleep(0.2)
+        assert bot.sent == []
+        with get_db_session() as watcher_db:
+            mark_purchase_pass(watcher_db, False)
+            watcher_db.commit()
+        await task
+
+    with get_db_session() as db:
+        job = db.query(BroadcastJob).one()
+        asyncio.run(scenario())
+    assert bot.sent == ["1", "2", "3"]
@@ -0,0 +1,22 @@
+import asyncio
+import socket
+from argparse import Namespace
+
+from utils.drill_shutdown import seed, drill
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_sigterm_during_a_drop_loses_and_duplicates_no_charges(database, monkeypatch, capsys):
+    monkeypatch.setenv("HEALTH_PORT", "0")
+    args = Namespace(users=8, gifts=10, balance=10 ** 6, latency=0.02, stop_at=0.2,
+                     purchase_grace=0.3, restart_seconds=8.0, port=free_port())
+    seed(args.users, args.balance)
+
+    assert asyncio.run(drill(args)), capsys.readouterr().out
+    # The grace ran out mid-drop, so the restart had deferred purchases to send
+    assert "After restart: 0 " not in capsys.readouterr().out
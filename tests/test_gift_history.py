@@ -0,0 +1,23 @@
+import time
+
+from bot.handlers.admin import format_sell_through
+from db.models import Gift
+from db.session import get_db_session
+from utils.gift_history import record_snapshots, sell_through_rates
+
+
+def test_sell_through_report_lists_gifts_that_sold(database):
+    now = int(time.time())
+    with get_db_session() as db:
+        db.add_all([Gift(gift_id="1", price=50, total_count=100), Gift(gift_id="2", price=25, total_count=10)])
+        record_snapshots(db, {"1": (50, 100, 100), "2": (25, 10, 10)}, ts=now - 600)
+        record_snapshots(db, {"1": (50, 40, 100)}, ts=now - 300)
+        record_snapshots(db, {"1": (50, 0, 100)}, ts=now - 60)
+        db.commit()
+
+        rates = [rate for rate in sell_through_rates(db, 3600) if rate["sold"] > 0]
+
+    assert [(rate["gift_id"], rate["sold"]) for rate in rates] == [("1", 100)]
+    assert rates[0]["sold_out_at"] == now - 60
+    report = format_sell_through(rates, 1)
+    assert "<code>1</code>: 100 sold, 11.1/min, sold out at" in report
@@ -0,0 +1,57 @@
+from api.json_backend import GiftRecord
+from db.session import get_db_session
+from utils import gift_parser
+
+
+def test_failed_poll_keeps_new_gifts_pending(database, monkeypatch):
+    monkeypatch.setattr(gift_parser, "_catalog_state", None)
+    monkeypatch.setattr(gift_parser, "_unprocessed", False)
+    gifts = [GiftRecord(id="1", star_count=50, remaining_count=10, total_count=10)]
+
+    with get_db_session() as db:
+        assert [row.gift_id for row in gift_parser.upsert_gifts(db, gifts)] == ["1"]
+        # The poll fails before mark_gifts_processed; the next one must still see the drop
+        pending = gift_parser.upsert_gifts(db, gifts)
+        assert [row.gift_id for row in pending] == ["1"]
+
+        gift_parser.mark_gifts_processed(db, pending)
+        assert gift_parser.upsert_gifts(db, gifts) == []
+
+
+def test_warm_start_snapshot_matches_the_gifts_table(database, monkeypatch):
+    monkeypatch.setattr(gift_parser, "_catalog_state", None)
+    monkeypatch.setattr(gift_parser, "_unprocessed", False)
+    monkeypatch.setattr(gift_parser, "_matcher", None)
+    gifts = [GiftRecord(id="1", star_count=50, remaining_count=10, total_count=10)]
+
+    with get_db_session() as db:
+        gift_parser.mark_gifts_processed(db, gift_parser.upsert_gifts(db, gifts))
+        gifts.append(GiftRecord(id="2", star_count=25, remaining_count=5, total_count=5))
+        gift_parser.mark_gifts_processed(db, gift_parser.upsert_gifts(db, gifts))
+
+    # Restart without a shutdown save: the snapshot written with the last upsert is current
+    monkeypatch.setattr(gift_parser, "_catalog_state", None)
+    gift_parser.poll_stats.clear()
+    with get_db_session() as db:
+        assert gift_parser.upsert_gifts(db, gifts) == []
+    assert gift_parser.poll_stats["added"] == 0
+
+
+def test_watchlists_are_reloaded_only_after_a_write(database, monkeypatch):
+    from db.watchlist import add_watch
+
+    monkeypatch.setattr(gift_parser, "_matcher", None)
+    loads = []
+    load_watchlists = gift_parser.load_watchlists
+    monkeypatch.setattr(gift_parser, "load_watchlists", lambda db: loads.append(1) or load_watchlists(db))
+
+    with get_db_session() as db:
+        assert gift_parser.current_watchlists(db) == {}
+        assert gift_parser.current_watchlists(db) == {}
+        assert len(loads) == 1
+
+        add_watch(db, 42, "🎁", 2)
+        db.commit()
+        entries = gift_parser.current_watchlists(db)["42"]
+        assert [(entry.target, entry.max_count) for entry in entries] == [("🎁", 2)]
+        assert len(loads) == 2
@@ -0,0 +1,33 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import event, func, select
+
+from bot.handlers.history import history_command
+from db.models import UserLedgerSummary
+from db.session import get_db_session
+
+
+class FakeMessage:
+    def __init__(self):
+        self.from_user = SimpleNamespace(id=42)
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def test_history_without_summary_does_not_write(database):
+    message = FakeMessage()
+    with get_db_session() as db:
+        # Behave like a hot standby, which refuses writes
+        @event.listens_for(db, "before_flush")
+        def read_only(session, flush_context, instances):
+            raise AssertionError("read session flushed")
+
+        asyncio.run(history_command(message, db))
+
+    assert len(message.answers) == 1
+    assert "Deposited: 0⭐️" in message.answers[0]
+    with get_db_session() as db:
+        assert db.scalar(select(func.count()).select_from(UserLedgerSummary)) == 0
@@ -0,0 +1,15 @@
+from db.ledger import record_transaction, read_ledger_summary, PURCHASE
+from db.session import get_db_session
+from utils.spend_budget import utc_day
+
+
+def test_only_auto_buy_purchases_count_against_daily_budget(database):
+    with get_db_session() as db:
+        # A manual /buy_gift paid from the balance
+        record_transaction(db, 42, 100, PURCHASE, "local_transaction")
+        record_transaction(db, 42, -30, PURCHASE, "buy_gift_transaction", auto_buy=True)
+        db.commit()
+
+        summary = read_ledger_summary(db, 42)
+        assert summary.spent == 130
+        assert (summary.spent_day, summary.spent_today) == (utc_day(), 30)
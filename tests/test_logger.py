@@ -0,0 +1,21 @@
+from utils.logger import RateLimiter
+
+
+def test_flush_reports_suppressed_messages_of_quiet_keys(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("utils.logger.time.monotonic", lambda: now[0])
+    limiter = RateLimiter(limit=1, window=10, sample_every=0)
+
+    assert limiter.allow("purchase.failed", "WARNING") == (True, 0)
+    assert limiter.allow("purchase.failed", "WARNING") == (False, 0)
+    assert limiter.allow("purchase.failed", "WARNING") == (False, 0)
+    # The window is still open, so only a forced flush reports it
+    assert limiter.flush() == []
+
+    now[0] += 10
+    # The key went quiet: nothing would report the drops but the flush
+    assert limiter.flush() == [("purchase.failed", "WARNING", 2)]
+    assert limiter.flush() == []
+    assert limiter.allow("purchase.failed", "WARNING") == (True, 0)
+    assert limiter.allow("purchase.failed", "WARNING") == (False, 0)
+    assert limiter.flush(force=True) == [("purchase.failed", "WARNING", 1)]
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from sqlalchemy import func, select
+
+from bot.handlers.balance import process_deposit_input, process_deposit_payment
+from bot.handlers.payment_handler import handle_successful_payment
+from db.ledger import DEPOSIT
+from db.models import User, Transaction, ProcessedPayment, PendingOrder
+from db.orders import create_order
+from db.session import get_db_session
+from utils.invoice_payload import encode_payload, decode_payload, KIND_DEPOSIT
+
+
+class FakeMessage:
+    def __init__(self, text=None, user_id=42):
+        self.text = text
+        self.from_user = SimpleNamespace(id=user_id, username="payer")
+        self.replies = []
+        self.invoices = []
+
+    async def reply(self, text, **kwargs):
+        self.replies.append(text)
+
+    async def answer_invoice(self, **kwargs):
+        self.invoices.append(kwargs)
+
+
+class FakeState:
+    def __init__(self):
+        self.cleared = False
+
+    async def clear(self):
+        self.cleared = True
+
+
+def test_deposit_input_sends_invoice_for_new_order(database):
+    message, state = FakeMessage("15"), FakeState()
+    with get_db_session() as db:
+        asyncio.run(process_deposit_input(message, state, db))
+
+    assert message.replies == []
+    assert len(message.invoices) == 1 and state.cleared
+    invoice = decode_payload(message.invoices[0]["payload"])
+    assert (invoice.kind, invoice.user_id, invoice.amount) == (KIND_DEPOSIT, 42, 15)
+    with get_db_session() as db:
+        order = db.get(PendingOrder, invoice.order_id)
+        assert (order.kind, order.amount, order.status) == ("deposit", 15, "pending")
+
+
+def test_racing_duplicate_deliveries_credit_once(database):
+    with get_db_session() as db:
+        db.add(User(user_id="42", username="payer", balance=0))
+        db.commit()
+
+    payment_info = SimpleNamespace(invoice_payload="deposit_100_stars_42", telegram_payment_charge_id="charge-1")
+    barrier = threading.Barrier(2)
+    messages = []
+
+    def deliver():
+        message = FakeMessage()
+        messages.append(message)
+        with get_db_session() as db:
+            barrier.wait()
+            asyncio.run(process_deposit_payment(message, db, payment_info))
+
+    threads = [threading.Thread(target=deliver) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with get_db_session() as db:
+        assert db.scalar(select(func.count()).select_from(ProcessedPayment)) == 1
+        assert db.scalar(
+            select(func.count()).select_from(Transaction).where(Transaction.kind == DEPOSIT)) == 1
+        assert db.scalar(select(User.balance).where(User.user_id == "42")) == 100
+    # One delivery is credited, the duplicate is dropped without an error reply
+    assert sorted(len(message.replies) for message in messages) == [0, 1]
+    assert "credited" in next(m for m in messages if m.replies).replies[0]
+
+
+def test_charged_payment_is_credited_when_order_expired_or_gone(database):
+    with get_db_session() as db:
+        db.add(User(user_id="42", username="payer", balance=0))
+        order = create_order(db, 42, "deposit", 15)
+        order.expires_at = 0  # Expired between pre-checkout and payment
+        db.commit()
+        order_id = order.id
+
+    for charge_id, order_id in (("charge-expired", order_id), ("charge-deleted", order_id + 1)):
+        message = FakeMessage()
+        message.successful_payment = SimpleNamespace(
+            invoice_payload=encode_payload(KIND_DEPOSIT, order_id, 42, 15),
+            telegram_payment_charge_id=charge_id,
+            total_amount=15,
+        )
+        with get_db_session() as db:
+            asyncio.run(handle_successful_payment(message, db))
+        assert "credited" in message.replies[-1]
+
+    with get_db_session() as db:
+        assert db.scalar(select(User.balance).where(User.user_id == "42")) == 30
+        assert db.scalar(select(func.count()).select_from(ProcessedPayment)) == 2
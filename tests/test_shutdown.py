@@ -0,0 +1,15 @@
+import time
+
+from utils import shutdown
+
+
+def test_grace_periods_follow_the_configuration(monkeypatch):
+    monkeypatch.setitem(shutdown.config, "shutdown_grace", 5)
+    monkeypatch.setitem(shutdown.config, "shutdown_purchase_grace", 2)
+    monkeypatch.setattr(shutdown, "_stop_requested_at", None)
+    assert shutdown.grace_remaining() == 5
+    assert not shutdown.purchase_grace_expired()
+
+    monkeypatch.setattr(shutdown, "_stop_requested_at", time.monotonic() - 3)
+    assert shutdown.purchase_grace_expired()
+    assert 1.9 < shutdown.grace_remaining() <= 2
@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+from db.session import get_db_session
+from utils.spend_budget import SpendBudgets
+
+SETTINGS = SimpleNamespace(daily_budget=None, drop_budget=100, gift_budget=60)
+
+
+def test_retried_drop_keeps_its_caps(database):
+    budgets = SpendBudgets()
+    with get_db_session() as db:
+        budgets.start_drop(db, {"1", "2"})
+        assert budgets.reserve(SETTINGS, "42", "1", 60)
+
+        # The poll failed and the same drop is planned again
+        budgets.start_drop(db, {"1", "2"})
+        assert not budgets.reserve(SETTINGS, "42", "1", 60)
+        assert budgets.reserve(SETTINGS, "42", "2", 40)
+        assert not budgets.reserve(SETTINGS, "42", "2", 10)
+
+        # A later drop of other gifts starts from zero
+        budgets.start_drop(db, {"3"})
+        assert budgets.reserve(SETTINGS, "42", "3", 60)
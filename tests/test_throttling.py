@@ -0,0 +1,46 @@
+import asyncio
+from types import SimpleNamespace
+
+from bot.middlewares.throttling_middleware import ThrottlingMiddleware
+
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+        self.from_user = SimpleNamespace(id=7)
+        self.successful_payment = None
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def _dispatch(middleware, text, raw_state=None):
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event.message.text)
+
+    message = FakeMessage(text)
+    update = SimpleNamespace(message=message, callback_query=None)
+    asyncio.run(middleware(handler, update, {"raw_state": raw_state}))
+    return bool(handled), message.answers
+
+
+def test_retry_after_a_drop_is_handled():
+    middleware = ThrottlingMiddleware()
+    bucket = middleware._get_state(7).bucket
+    bucket.tokens, bucket.rate = 0, 0.0
+    assert _dispatch(middleware, "/balance") == (False, ["Too many requests, please wait a moment."])
+
+    bucket.tokens = bucket.capacity
+    assert _dispatch(middleware, "/balance") == (True, [])
+    # A repeat of an accepted update is still merged
+    assert _dispatch(middleware, "/balance") == (False, [])
+
+
+def test_repeated_fsm_input_is_not_merged():
+    middleware = ThrottlingMiddleware()
+    state = "DepositStates:waiting_for_amount_deposit"
+    assert _dispatch(middleware, "15", raw_state=state) == (True, [])
+    assert _dispatch(middleware, "15", raw_state=state) == (True, [])
@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from api.gifts import GiftsApi
+from api.token_pool import TokenPool
+from utils.fake_bot_api import FakeBotApi
+
+FIRST, SECOND = "111:AAA", "222:BBB"
+GIFT_ID = "6000000000000000000"
+PRICE = 15
+
+
+class Unreachable:
+    """Session wrapper refusing connections for some tokens, as if their route were down."""
+
+    def __init__(self, session: aiohttp.ClientSession, tokens: set):
+        self.session = session
+        self.tokens = tokens
+
+    def post(self, url: str, **kwargs):
+        if any(f"/bot{token}/" in url for token in self.tokens):
+            raise aiohttp.ClientConnectorError(
+                SimpleNamespace(host="127.0.0.1", port=1, ssl=True), OSError(111, "Connection refused"))
+        return self.session.post(url, **kwargs)
+
+
+class PartlyUnreachableGiftsApi(GiftsApi):
+    def __init__(self, unreachable: set, **kwargs):
+        super().__init__(**kwargs)
+        self.unreachable = unreachable
+
+    async def get_session(self):
+        return Unreachable(await super().get_session(), self.unreachable)
+
+
+async def send_once(fake: FakeBotApi, unreachable: set = frozenset()) -> tuple[bool, TokenPool]:
+    runner = web.AppRunner(fake.make_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    pool = TokenPool([FIRST, SECOND])
+    gifts_api = PartlyUnreachableGiftsApi(unreachable, pool=pool, api_url=f"http://127.0.0.1:{port}")
+    try:
+        sent = await gifts_api.send_gift(user_id=42, gift_id=GIFT_ID, price=PRICE)
+    finally:
+        await gifts_api.close()
+        await runner.cleanup()
+    return sent, pool
+
+
+@pytest.mark.parametrize("first_token_fails", [
+    dict(unreachable={FIRST}),
+    dict(flooded={FIRST}),
+    dict(failing={FIRST}),
+    dict(balance=PRICE - 1),
+], ids=["connection refused", "429", "5xx", "BALANCE_TOO_LOW"])
+def test_send_fails_over_to_the_next_token_exactly_once(first_token_fails):
+    fake = FakeBotApi(
+        {FIRST: first_token_fails.get("balance", 1000), SECOND: 1000},
+        failing=first_token_fails.get("failing"), flooded=first_token_fails.get("flooded"))
+
+    sent, pool = asyncio.run(send_once(fake, first_token_fails.get("unreachable", set())))
+
+    assert sent
+    assert fake.sent == {FIRST: 0, SECOND: 1}
+    assert fake.deliveries["42"] == 1
+    first, second = pool.members
+    assert (first.failed, first.sent, second.sent) == (1, 0, 1)
+    # The first token is skipped by the next pick instead of failing again
+    assert pool.pick(PRICE) is second
@@ -0,0 +1,49 @@
+from sqlalchemy import event
+
+from db.session import get_db_session
+from db.user_cache import get_watchlist_snapshot
+from db.watchlist import add_watch, remove_watch
+
+
+def test_watchlist_snapshot_is_cached_until_a_watchlist_write(database):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(database, "before_cursor_execute", count)
+
+    with get_db_session() as db:
+        assert get_watchlist_snapshot(db, 42) == ()
+        add_watch(db, 42, "🎁", 2)
+        db.commit()
+
+        assert [tuple(row) for row in get_watchlist_snapshot(db, 42)] == [("🎁", 2)]
+        queries = len(statements)
+        assert [tuple(row) for row in get_watchlist_snapshot(db, 42)] == [("🎁", 2)]
+        assert len(statements) == queries
+
+        remove_watch(db, 42, "🎁")
+        db.commit()
+        assert get_watchlist_snapshot(db, 42) == ()
+
+    event.remove(database, "before_cursor_execute", count)
+
+
+def test_bulk_update_is_invalidated_again_on_commit(database):
+    from sqlalchemy import update
+
+    from db.models import User
+    from db.user_cache import get_user_snapshot
+
+    with get_db_session() as db:
+        db.add(User(user_id="42", username="u42", balance=10))
+        db.commit()
+
+        db.execute(update(User).where(User.user_id == "42").values(balance=20))
+        # A concurrent reader fills the cache before the write commits
+        with get_db_session() as other:
+            assert get_user_snapshot(other, 42).balance == 10
+        db.commit()
+
+        assert get_user_snapshot(db, 42).balance == 20
@@ -0,0 +1,74 @@
+import argparse
+import json
+import time
+import tracemalloc
+
+from api import json_backend
+from api.json_backend import decode_gifts_response
+
+
+def make_catalog(size: int) -> bytes:
+    """Build a getAvailableGifts response body shaped like the real one."""
+    gifts = []
+    for i in range(size):
+        gifts.append({
+            "id": str(5170145012310081615 + i),
+            "sticker": {
+                "width": 512, "height": 512, "emoji": "🎁", "is_animated": True, "is_video": False,
+                "type": "custom_emoji", "custom_emoji_id": str(5170145012310081615 + i),
+                "thumbnail": {
+                    "file_id": f"AAMCAgADFQABZ{i:012d}thumb", "file_unique_id": f"AQAD{i:08d}",
+                    "file_size": 8364, "width": 128, "height": 128,
+                },
+                "file_id": f"CAACAgIAAxUAAWe{i:012d}sticker", "file_unique_id": f"AgAD{i:08d}",
+                "file_size": 29112,
+            },
+            "star_count": 50 + i % 500,
+            "upgrade_star_count": 25,
+            "total_count": 10000 if i % 3 else None,
+            "remaining_count": 5000 if i % 3 else None,
+        })
+    return json.dumps({"ok": True, "result": {"gifts": gifts}}).encode()
+
+
+def measure(name: str, decode, raw: bytes, rounds: int) -> None:
+    """Print mean decode time, peak allocations and memory retained by the result of one decoder."""
+    decode(raw)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        decode(raw)
+    elapsed = (time.perf_counter() - started) / rounds
+
+    tracemalloc.start()
+    result = decode(raw)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+
+    print(f"{name:<28} {elapsed * 1000:8.3f} ms/poll {peak / 1024:10.1f} KiB peak "
+          f"{retained / 1024:10.1f} KiB retained")
+
+
+def main():
+    """
+    Compare catalog decoding paths:
+
+        python -m utils.bench_json [--gifts N] [--rounds N]
+    """
+    parser = argparse.ArgumentParser(description="Benchmark getAvailableGifts decoding.")
+    parser.add_argument("--gifts", type=int, default=5000, help="catalog size")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    raw = make_catalog(args.gifts)
+    print(f"Catalog: {args.gifts} gifts, {len(raw) / 1024:.0f} KiB; "
+          f"loads backend: {json_backend.BACKEND}, gift records backend: {json_backend.GIFTS_BACKEND}")
+
+    measure("json.loads (dicts)", json.loads, raw, args.rounds)
+    if json_backend.orjson is not None:
+        measure("orjson.loads (dicts)", json_backend.orjson.loads, raw, args.rounds)
+    measure(f"gift records ({json_backend.GIFTS_BACKEND})", decode_gifts_response, raw, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import time
+
+from loguru import logger
+
+from utils.logger import log_limited, _rate_limiter
+
+
+def eager_poll(users: int, gifts: int) -> None:
+    """Per-decision f-string logging, as the watcher did before log_limited."""
+    for user in range(users):
+        for gift in range(gifts):
+            logger.debug(f"Conditions not met for purchasing gift {gift} for user {user}.")
+
+
+def lazy_poll(users: int, gifts: int) -> None:
+    """Per-decision logging with lazy loguru arguments but no rate limiting."""
+    for user in range(users):
+        for gift in range(gifts):
+            logger.debug("Conditions not met for purchasing gift {} for user {}.", gift, user)
+
+
+def limited_poll(users: int, gifts: int) -> None:
+    """Per-decision logging through log_limited, as the watcher does now."""
+    for user in range(users):
+        for gift in range(gifts):
+            log_limited(
+                "purchase.conditions_not_met", "DEBUG",
+                "Conditions not met for purchasing gift {} for user {}.", gift, user
+            )
+
+
+def measure(name: str, poll, users: int, gifts: int, rounds: int) -> None:
+    """Print the mean time one poll spends in logging calls."""
+    poll(users, gifts)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        poll(users, gifts)
+        logger.info("Poll: {} gifts, {} planned", gifts, users * gifts)
+    elapsed = (time.perf_counter() - started) / rounds
+    logger.complete()
+    print(f"{name:<24} {elapsed * 1000:9.3f} ms/poll {elapsed / (users * gifts) * 1e6:8.2f} us/message")
+
+
+def main():
+    """
+    Measure logging overhead per watcher poll for each sink format:
+
+        python -m utils.bench_logging [--users N] [--gifts N] [--rounds N]
+
+    Each poll logs one decision per user and gift plus the summary line, to
+    sinks configured like utils.logger's (enqueue=True, DEBUG) but writing to
+    os.devnull. Only the time spent in the calling loop is measured.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark hot-loop logging overhead.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--gifts", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    print(f"{args.users} users x {args.gifts} gifts = {args.users * args.gifts} decisions per poll")
+    for log_format in ("text", "json"):
+        logger.remove()
+        logger.add(devnull, level="DEBUG", serialize=log_format == "json", enqueue=True)
+        print(f"LOG_FORMAT={log_format}")
+        for name, poll in (("f-string", eager_poll), ("lazy", lazy_poll), ("log_limited", limited_poll)):
+            _rate_limiter._state.clear()
+            measure(name, poll, args.users, args.gifts, args.rounds)
+    logger.remove()
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
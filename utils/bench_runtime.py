@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import statistics
+import time
+
+from aiohttp import web
+
+from api.gifts import GiftsApi
+from api.token_pool import TokenPool
+from utils.fake_bot_api import FakeBotApi
+from config import load_config
+from utils.runtime import run, configure_loop, uvloop
+
+TOKENS = ["111:AAA", "222:BBB", "333:CCC"]
+
+
+async def bench_send_gift(api_url: str, sends: int) -> dict:
+    """Fan out sendGift calls over the token pool and time each one."""
+    pool = TokenPool(TOKENS, rate=10 ** 6)
+    gifts_api = GiftsApi(pool=pool, api_url=api_url)
+    latencies = []
+
+    async def send():
+        started = time.perf_counter()
+        await gifts_api.send_gift(1, "6000000000000000000", price=15)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send() for _ in range(sends)))
+    elapsed = time.perf_counter() - started
+    await gifts_api.close()
+
+    latencies.sort()
+    return {
+        "sends/s": sends / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def bench_updates(api_url: str, updates: int) -> dict:
+    """Feed message updates through aiogram with a handler that replies to each."""
+    from aiogram import Bot, Dispatcher, Router, types
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_url), limit=load_config()['http_pool_limit'])
+    bot = Bot(token=TOKENS[0], session=session)
+    dp = Dispatcher()
+    router = Router()
+
+    @router.message()
+    async def echo(message: types.Message):
+        await message.answer("ok")
+
+    dp.include_router(router)
+    now = datetime.datetime.now()
+    batch = [
+        types.Update(update_id=i, message=types.Message(
+            message_id=i, date=now, text="/balance",
+            chat=types.Chat(id=1000 + i % 50, type="private"),
+            from_user=types.User(id=1000 + i % 50, is_bot=False, first_name="bench"),
+        ))
+        for i in range(updates)
+    ]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(dp.feed_update(bot, update) for update in batch))
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return {"updates/s": updates / elapsed}
+
+
+def serve_fake_api(port: int) -> None:
+    """Run the fake Bot API in its own process, so it doesn't share the loop under test."""
+    fake = FakeBotApi({token: 10 ** 9 for token in TOKENS})
+    web.run_app(fake.make_app(), host="127.0.0.1", port=port, access_log=None, print=None)
+
+
+async def bench(api_url: str, sends: int, updates: int) -> dict:
+    configure_loop(asyncio.get_running_loop())
+    result = await bench_send_gift(api_url, sends)
+    result.update(await bench_updates(api_url, updates))
+    return result
+
+
+def main():
+    """
+    Compare event loops against the fake Bot API, in one process:
+
+        python -m utils.bench_runtime [--sends N] [--updates N]
+
+    The fake API runs in a separate process on the default loop, so only
+    the client side changes between modes.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark event loop modes against the fake Bot API.")
+    parser.add_argument("--sends", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8082)
+    args = parser.parse_args()
+
+    # Per-update dispatcher logging would dominate the measurement
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+    server = multiprocessing.Process(target=serve_fake_api, args=(args.port,), daemon=True)
+    server.start()
+    time.sleep(1)
+    try:
+        api_url = f"http://127.0.0.1:{args.port}"
+        modes = ["asyncio"] + (["uvloop"] if uvloop is not None else [])
+        for mode in modes:
+            result = run(bench(api_url, args.sends, args.updates), mode=mode)
+            print(f"{mode:<8} " + "  ".join(f"{key} {value:8.1f}" for key, value in result.items()))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+import aiohttp
+
+from utils.logger import log, log_limited
+from utils.rate_limit import TokenBucket
+from utils.gift_parser import purchases_idle
+from utils.shutdown import stopping, wait_or_stop
+from api.gifts import GiftsApi
+from db.broadcasts import next_broadcast_job, fetch_subscribers, set_notify
+from db.watcher_status import purchase_pass_running
+from db.session import get_db_session, get_read_session
+
+
+# Messages per second across all chats, kept under Telegram's ~30/s bulk limit
+BROADCAST_RATE = 25
+# Minimum seconds between two announcements to the same chat
+CHAT_INTERVAL = 1.0
+# Subscribers fetched per page
+BROADCAST_BATCH_SIZE = 200
+# Sends between cursor commits; at most this many users are messaged twice after a crash
+CURSOR_COMMIT_EVERY = 20
+# Seconds between checks for queued announcements
+BROADCAST_IDLE_INTERVAL = 5
+# Seconds between reads of the watcher's purchase pass flag
+PURCHASE_CHECK_INTERVAL = 1.0
+
+_global_bucket = TokenBucket(BROADCAST_RATE)
+# chat_id -> time.monotonic() of the last announcement, pruned as it grows
+_last_sent: dict[str, float] = {}
+# time.monotonic() of the last read that found no purchase pass running
+_purchases_checked = 0.0
+
+
+async def _wait_for_purchases() -> None:
+    """
+    Wait until no purchase pass runs, in this process or in a standalone watcher.
+
+    The watcher's flag is read from the primary at most every
+    PURCHASE_CHECK_INTERVAL seconds; in between only the in-process event is checked.
+    """
+    global _purchases_checked
+    while True:
+        await purchases_idle.wait()
+        if time.monotonic() - _purchases_checked < PURCHASE_CHECK_INTERVAL:
+            return
+        with get_db_session() as db:
+            running = purchase_pass_running(db)
+        if not running:
+            _purchases_checked = time.monotonic()
+            return
+        await asyncio.sleep(PURCHASE_CHECK_INTERVAL)
+
+
+async def _wait_for_slot(chat_id: str) -> None:
+    """Wait until purchases are idle and both the global and per-chat limits allow a send."""
+    await _wait_for_purchases()
+    last = _last_sent.get(chat_id)
+    if last is not None:
+        delay = CHAT_INTERVAL - (time.monotonic() - last)
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await _global_bucket.acquire()
+    # A purchase pass may have started while we slept
+    await _wait_for_purchases()
+
+
+def _mark_sent(chat_id: str) -> None:
+    now = time.monotonic()
+    _last_sent[chat_id] = now
+    if len(_last_sent) > 10 * BROADCAST_RATE:
+        for key in [key for key, ts in _last_sent.items() if now - ts >= CHAT_INTERVAL]:
+            del _last_sent[key]
+
+
+async def _send_announcement(bot, gifts_api, job, chat_id: str) -> bool:
+    """
+    Send one announcement, uploading the thumbnail only until a photo file_id is cached.
+
+    Returns:
+        bool: True if a message was delivered
+    """
+    if job.photo_file_id:
+        await bot.send_photo(chat_id, photo=job.photo_file_id, caption=job.caption)
+        return True
+    if job.thumb_file_id:
+        message = await gifts_api.send_thumbnail_photo(bot, chat_id, job.thumb_file_id, job.caption)
+        if message is not None and message.photo:
+            job.photo_file_id = message.photo[-1].file_id
+        return message is not None
+    await bot.send_message(chat_id, job.caption)
+    return True
+
+
+async def run_broadcast(db, bot, gifts_api, job) -> None:
+    """
+    Fan a queued announcement out to all subscribers.
+
+    Subscribers are walked in users.id order and the job cursor is committed
+    every few sends, and whenever the broadcast is interrupted, so a retry
+    resumes where it left off. A chat that cannot be reached is logged and
+    skipped. Sends pause while the watcher is purchasing.
+
+    Args:
+        db: Database session
+        bot: Initialized aiogram Bot instance
+        gifts_api: API client used to upload the thumbnail
+        job: BroadcastJob to run
+    """
+    from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramAPIError
+
+    log.info("Broadcasting gift {} from subscriber cursor {}.", job.gift_id, job.last_user_pk)
+    uncommitted = 0
+    try:
+        while not stopping.is_set():
+            # Subscriber pages tolerate replica lag; the job cursor stays on the primary
+            with get_read_session() as read_db:
+                subscribers = fetch_subscribers(read_db, job.last_user_pk, BROADCAST_BATCH_SIZE)
+            if not subscribers:
+                break
+
+            for user_pk, chat_id in subscribers:
+                if stopping.is_set():
+                    break
+                while True:
+                    await _wait_for_slot(chat_id)
+                    try:
+                        if await _send_announcement(bot, gifts_api, job, chat_id):
+                            job.sent += 1
+                        _mark_sent(chat_id)
+                    except TelegramRetryAfter as e:
+                        log_limited("broadcast.retry_after", "WARNING",
+                                    "Broadcast flood limited, retrying in {}s.", e.retry_after)
+                        await asyncio.sleep(e.retry_after)
+                        continue
+                    except TelegramForbiddenError:
+                        # The user blocked the bot, stop announcing to them
+                        set_notify(db, chat_id, False)
+                    except (TelegramAPIError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        # Skip the chat rather than retrying the whole job on it forever
+                        log_limited("broadcast.failed", "WARNING",
+                                    "Failed to announce gift {} to {}: {}", job.gift_id, chat_id, e)
+                    break
+
+                job.last_user_pk = user_pk
+                uncommitted += 1
+                if uncommitted >= CURSOR_COMMIT_EVERY:
+                    db.commit()
+                    uncommitted = 0
+    except BaseException:
+        # Keep the cursor, so a retry doesn't announce to the same users again;
+        # the current subscriber is retried
+        if db.is_active:
+            db.commit()
+        raise
+
+    if stopping.is_set():
+        db.commit()
+        log.info("Broadcast of gift {} paused for shutdown at cursor {}.", job.gift_id, job.last_user_pk)
+        return
+    job.status = "done"
+    db.commit()
+    log.info("Broadcast of gift {} finished: {} messages sent.", job.gift_id, job.sent)
+
+
+async def start_broadcast_loop(bot) -> None:
+    """
+    Run queued new gift announcements one at a time, oldest first.
+
+    Args:
+        bot: Initialized aiogram Bot instance
+    """
+    gifts_api = GiftsApi()
+    try:
+        while not stopping.is_set():
+            try:
+                with get_db_session() as db:
+                    job = next_broadcast_job(db)
+                    if job is not None:
+                        await run_broadcast(db, bot, gifts_api, job)
+                        continue
+                await wait_or_stop(BROADCAST_IDLE_INTERVAL)
+            except Exception as e:
+                log.error(f"Error in the broadcast loop: {e}")
+                await wait_or_stop(BROADCAST_IDLE_INTERVAL)
+    finally:
+        await gifts_api.close()
@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+from utils.fake_bot_api import FakeBotApi
+
+TOKEN = "111:AAA"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(users: int, balance: int) -> None:
+    """Create users with auto-purchase enabled for every gift."""
+    from db import init_db
+    from db.session import get_db_session
+    from db.models import User, AutoBuySettings
+
+    init_db()
+    with get_db_session() as db:
+        for i in range(users):
+            user_id = str(100000 + i)
+            db.add(User(user_id=user_id, username=f"drill{i}", balance=balance))
+            db.add(AutoBuySettings(user_id=user_id, status="enabled", cycles=1))
+        db.commit()
+
+
+def ledger_state() -> tuple[dict, dict]:
+    """Purchases recorded per user, and current balances."""
+    from sqlalchemy import func, select
+    from db.session import get_db_session
+    from db.models import User, Transaction
+    from db.ledger import PURCHASE
+
+    with get_db_session() as db:
+        purchases = dict(db.execute(
+            select(Transaction.user_id, func.count()).where(Transaction.kind == PURCHASE)
+            .group_by(Transaction.user_id)
+        ).all())
+        balances = dict(db.execute(select(User.user_id, User.balance)).all())
+    return purchases, balances
+
+
+async def run_watcher(env: dict, fake: FakeBotApi, stop_after_sends: int | None, timeout: float) -> float:
+    """
+    Start watcher.py, SIGTERM it once the fake API has delivered enough gifts.
+
+    Returns:
+        float: Seconds between SIGTERM and the process exiting
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "watcher.py", cwd=ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if stop_after_sends is not None and sum(fake.sent.values()) >= stop_after_sends:
+            break
+        await asyncio.sleep(0.05)
+    process.send_signal(signal.SIGTERM)
+    signalled = time.monotonic()
+    await process.wait()
+    return time.monotonic() - signalled
+
+
+async def drill(args) -> bool:
+    fake = FakeBotApi({TOKEN: 10 ** 9}, gifts=args.gifts, latency=args.latency)
+    runner = web.AppRunner(fake.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    env = dict(
+        os.environ,
+        BOT_TOKEN=TOKEN,
+        BOT_TOKENS="",
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.port}",
+        SHUTDOWN_PURCHASE_GRACE=str(args.purchase_grace),
+        LOOP_MONITOR="0",
+    )
+    planned = args.users * args.gifts
+    try:
+        took = await run_watcher(env, fake, int(planned * args.stop_at), timeout=60)
+        sent_first = sum(fake.sent.values())
+        print(f"SIGTERM during the drop: watcher exited in {took:.1f}s, "
+              f"{sent_first} of {planned} planned gifts sent.")
+
+        # A restart sends the deferred rest of the drop, and nothing it already bought
+        await run_watcher(env, fake, None, timeout=args.restart_seconds)
+        sent_total = sum(fake.sent.values())
+        print(f"After restart: {sent_total - sent_first} deferred gifts sent.")
+    finally:
+        await runner.cleanup()
+
+    purchases, balances = ledger_state()
+    ok = True
+    for user_id in balances:
+        delivered = fake.deliveries[user_id]
+        recorded = purchases.get(user_id, 0)
+        if delivered != recorded:
+            ok = False
+            kind = "lost" if delivered > recorded else "phantom"
+            print(f"User {user_id}: {delivered} delivered, {recorded} charged ({kind} charges).")
+    spent = args.users * args.balance - sum(balances.values())
+    print(f"Ledger: {sum(purchases.values())} purchases, {spent} stars charged; "
+          f"fake API: {sent_total} gifts sent, {10 ** 9 - fake.balances[TOKEN]} stars spent.")
+    ok = ok and spent == 10 ** 9 - fake.balances[TOKEN] and sent_total == planned
+    print("OK: no lost or duplicated charges." if ok else "FAILED")
+    return ok
+
+
+def main():
+    """
+    SIGTERM the standalone watcher in the middle of a synthetic drop and check
+    that every gift the fake Bot API delivered was charged exactly once:
+
+        python -m utils.drill_shutdown [--users N] [--gifts N] [--latency S]
+
+    Runs against a throwaway SQLite database; the watcher is started twice,
+    the second time to check the deferred rest of the drop is bought exactly once.
+    """
+    parser = argparse.ArgumentParser(description="Shutdown drill for the gift watcher.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--gifts", type=int, default=10)
+    parser.add_argument("--balance", type=int, default=10 ** 6)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per fake sendGift")
+    parser.add_argument("--stop-at", type=float, default=0.2, help="share of the drop sent before SIGTERM")
+    parser.add_argument("--purchase-grace", type=float, default=1.0)
+    parser.add_argument("--restart-seconds", type=float, default=8.0)
+    parser.add_argument("--port", type=int, default=8083)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Set before the db package reads its configuration
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'drill.db')}"
+        os.environ["DATABASE_REPLICA_URL"] = ""
+        seed(args.users, args.balance)
+        ok = asyncio.run(drill(args))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
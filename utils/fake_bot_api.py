@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import random
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeBotApi:
+    """
+    Minimal stand-in for the Bot API methods used by the gift watcher, plus sendMessage.
+
+    Each token has its own star balance; sendGift deducts the gift price from
+    the sending token and fails with BALANCE_TOO_LOW once it runs out.
+    """
+
+    def __init__(self, balances: dict, gifts: int = 20, failing: set | None = None,
+                 flood_rate: float = 0.0, latency: float = 0.0, flooded: set | None = None):
+        """
+        Args:
+            balances: Bot token -> star balance
+            gifts: Number of gifts in the catalog
+            failing: Tokens that answer every sendGift with a server error
+            flood_rate: Share of sendGift calls answered with 429 Too Many Requests
+            latency: Seconds each sendGift call takes
+            flooded: Tokens that answer every sendGift with 429 Too Many Requests
+        """
+        self.balances = dict(balances)
+        self.failing = failing or set()
+        self.flooded = flooded or set()
+        self.flood_rate = flood_rate
+        self.latency = latency
+        self.catalog = [
+            {
+                "id": str(6000000000000000000 + i),
+                "sticker": {"emoji": "🎁", "thumbnail": {"file_id": f"thumb{i}"}},
+                "star_count": 15 + 10 * i,
+                "total_count": 1000,
+                "remaining_count": 1000,
+            }
+            for i in range(gifts)
+        ]
+        self.sent = {token: 0 for token in balances}
+        # Gifts delivered per recipient user id
+        self.deliveries = Counter()
+
+    def _reply(self, result=None, error_code: int | None = None, description: str | None = None,
+               **parameters) -> web.Response:
+        if error_code is None:
+            return web.json_response({"ok": True, "result": result})
+        body = {"ok": False, "error_code": error_code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return web.json_response(body, status=error_code)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token = request.match_info["token"]
+        method = request.match_info["method"]
+        if token not in self.balances:
+            return self._reply(error_code=401, description="Unauthorized")
+
+        if method == "getAvailableGifts":
+            return self._reply({"gifts": self.catalog})
+        if method == "getMyStarBalance":
+            return self._reply({"amount": self.balances[token]})
+        if method == "sendGift":
+            data = await request.json()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if token in self.failing:
+                return self._reply(error_code=502, description="Bad Gateway")
+            if token in self.flooded or random.random() < self.flood_rate:
+                return self._reply(error_code=429, description="Too Many Requests: retry after 1",
+                                   retry_after=1)
+            gift = next((gift for gift in self.catalog if gift["id"] == data.get("gift_id")), None)
+            if gift is None:
+                return self._reply(error_code=400, description="Bad Request: STARGIFT_INVALID")
+            if self.balances[token] < gift["star_count"]:
+                return self._reply(error_code=400, description="Bad Request: BALANCE_TOO_LOW")
+            self.balances[token] -= gift["star_count"]
+            self.sent[token] += 1
+            self.deliveries[str(data.get("user_id"))] += 1
+            return self._reply(True)
+        if method == "sendMessage":
+            data = await request.post() if request.content_type != "application/json" else await request.json()
+            return self._reply({
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": int(data.get("chat_id", 0)), "type": "private"},
+                "text": data.get("text", ""),
+            })
+        return self._reply(error_code=404, description="Not Found: method not found")
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+
+def main():
+    """
+    Serve a fake Bot API with several tokens, for exercising the token pool:
+
+        python -m utils.fake_bot_api --token 111:AAA=500 --token 222:BBB=2000
+        TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=111:AAA BOT_TOKENS=222:BBB python watcher.py
+    """
+    parser = argparse.ArgumentParser(description="Fake Bot API for local gift purchase tests.")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--token", action="append", required=True, metavar="TOKEN=BALANCE")
+    parser.add_argument("--failing", action="append", default=[], metavar="TOKEN",
+                        help="token whose sendGift always fails with a server error")
+    parser.add_argument("--flooded", action="append", default=[], metavar="TOKEN",
+                        help="token whose sendGift is always flood limited")
+    parser.add_argument("--gifts", type=int, default=20)
+    parser.add_argument("--flood-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    balances = {}
+    for item in args.token:
+        token, _, balance = item.rpartition("=")
+        balances[token] = int(balance)
+
+    api = FakeBotApi(balances, gifts=args.gifts, failing=set(args.failing), flood_rate=args.flood_rate,
+                     flooded=set(args.flooded))
+    web.run_app(api.make_app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import time
+
+from sqlalchemy import select, delete, func, insert
+
+from db.models import Gift, GiftHistory
+
+
+# Keep every recorded change for this long, then downsample
+HISTORY_RAW_RETENTION = 7 * 24 * 3600
+# Resolution of downsampled history, seconds
+HISTORY_BUCKET = 300
+
+
+def record_snapshots(db, changed: dict, ts: int | None = None) -> None:
+    """
+    Append history rows for gifts whose state changed in this poll.
+
+    Only deltas are recorded: unchanged gifts produce no rows, so a gift's
+    state at any moment is the last row at or before that moment.
+
+    Args:
+        db: Database session
+        changed: Mapping gift_id -> (price, remaining_count, total_count)
+        ts: Snapshot time as Unix seconds (defaults to now)
+    """
+    if not changed:
+        return
+    ts = int(time.time()) if ts is None else ts
+    db.execute(insert(GiftHistory), [
+        {
+            "gift_id": gift_id,
+            "ts": ts,
+            "price": price,
+            "remaining_count": remaining_count,
+        }
+        for gift_id, (price, remaining_count, _total_count) in changed.items()
+    ])
+
+
+def downsample_history(db, older_than: int = HISTORY_RAW_RETENTION, bucket: int = HISTORY_BUCKET) -> int:
+    """
+    Thin out old history, keeping the last row per gift per time bucket.
+
+    Because rows are deltas, the last row of a bucket is the gift's state at
+    the end of that bucket, so sell-through over bucket boundaries is kept.
+
+    Args:
+        db: Database session
+        older_than: Only rows older than this many seconds are thinned
+        bucket: Bucket width in seconds
+
+    Returns:
+        int: Number of deleted rows
+    """
+    cutoff = int(time.time()) - older_than
+    bucket_start = GiftHistory.ts - GiftHistory.ts % bucket
+    keep = (
+        select(func.max(GiftHistory.id))
+        .where(GiftHistory.ts < cutoff)
+        .group_by(GiftHistory.gift_id, bucket_start)
+    )
+    result = db.execute(
+        delete(GiftHistory)
+        .where(GiftHistory.ts < cutoff, GiftHistory.id.not_in(keep))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def _state_at(db, gift_id: str, ts: int):
+    """Return the last history row of a gift at or before ts, if any."""
+    return db.execute(
+        select(GiftHistory.ts, GiftHistory.remaining_count)
+        .where(GiftHistory.gift_id == gift_id, GiftHistory.ts <= ts)
+        .order_by(GiftHistory.ts.desc())
+        .limit(1)
+    ).first()
+
+
+def sell_through_rate(db, gift_id: str, window: int = 24 * 3600) -> dict | None:
+    """
+    Compute how fast a gift sold over a recent window.
+
+    Uses at most three index seeks on (gift_id, ts), independent of how many
+    polls were recorded.
+
+    Args:
+        db: Database session
+        gift_id: Telegram gift identifier
+        window: Window length in seconds, ending now
+
+    Returns:
+        dict: gift_id, sold, seconds, per_minute and sold_out_at (Unix seconds or None)
+        None: If the gift has no limited-supply history in the window
+    """
+    now = int(time.time())
+    since = now - window
+
+    start = _state_at(db, gift_id, since)
+    if start is None:
+        start = db.execute(
+            select(GiftHistory.ts, GiftHistory.remaining_count)
+            .where(GiftHistory.gift_id == gift_id, GiftHistory.ts > since)
+            .order_by(GiftHistory.ts.asc())
+            .limit(1)
+        ).first()
+    end = _state_at(db, gift_id, now)
+    if start is None or end is None or start.remaining_count is None or end.remaining_count is None:
+        return None
+
+    sold_out_at = None
+    if end.remaining_count == 0:
+        sold_out_at = db.execute(
+            select(func.min(GiftHistory.ts))
+            .where(GiftHistory.gift_id == gift_id, GiftHistory.ts > max(start.ts, since),
+                   GiftHistory.remaining_count == 0)
+        ).scalar()
+
+    start_ts = max(start.ts, since)
+    end_ts = sold_out_at or now
+    seconds = max(end_ts - start_ts, 1)
+    sold = start.remaining_count - end.remaining_count
+    return {
+        "gift_id": gift_id,
+        "sold": sold,
+        "seconds": seconds,
+        "per_minute": sold * 60 / seconds,
+        "sold_out_at": sold_out_at,
+    }
+
+
+def sell_through_rates(db, window: int = 24 * 3600) -> list:
+    """
+    Compute sell-through rates for every known gift with history in the window.
+
+    Args:
+        db: Database session
+        window: Window length in seconds, ending now
+
+    Returns:
+        list: sell_through_rate dicts, fastest-selling first
+    """
+    gift_ids = db.execute(select(Gift.gift_id)).scalars().all()
+    rates = [rate for rate in (sell_through_rate(db, gift_id, window) for gift_id in gift_ids) if rate]
+    return sorted(rates, key=lambda rate: rate["per_minute"], reverse=True)
@@ -1,11 +1,354 @@
 import asyncio
+import time
+from collections import Counter, defaultdict
+
 import aiohttp
-from datetime import datetime
 
-from utils.logger import log
+from sqlalchemy import select, update
+
+from utils.logger import log, log_limited, flush_suppressed
 from api.gifts import GiftsApi
-from db.models import Gift, AutoBuySettings, User, Transaction
+from db.models import Gift, AutoBuySettings, User
+from db.ledger import record_transaction, PURCHASE
 from db.session import get_db_session
+from db.dialects import upsert_insert
+from db.orders import delete_expired_orders
+from db.broadcasts import enqueue_broadcasts
+from db.deferred_purchases import defer_purchases, load_deferred_purchases
+from db.watcher_status import mark_purchase_pass, PURCHASE_FLAG_TTL
+from db.watchlist import load_watchlists
+from db.watcher_status import watchlist_version
+from utils.gift_history import record_snapshots, downsample_history
+from utils.watcher_snapshot import save_snapshot, load_snapshot
+from utils.runtime import make_client_session, run_blocking
+from utils.shutdown import stopping, wait_or_stop, purchase_grace_expired
+from utils.health import watcher_health
+from utils.spend_budget import spend_budgets
+
+
+# gift_id -> (price, remaining_count, total_count) as last committed to the database
+_catalog_state: dict | None = None
+# Unix time of the snapshot we warm-started from, until the first poll is diffed
+_down_since: int | None = None
+# Set while gifts returned by upsert_gifts await mark_gifts_processed; still set on
+# the next poll means the previous one failed, and its new gifts are read again
+_unprocessed = False
+# (watchlist version, user_id -> watchlist entries) the matcher was last built from
+_matcher: tuple | None = None
+
+_PENDING_COLUMNS = (Gift.gift_id, Gift.price, Gift.remaining_count, Gift.total_count, Gift.is_new)
+
+# Seconds between maintenance passes (history downsampling, expired orders)
+MAINTENANCE_INTERVAL = 3600
+
+# Per-poll event counters, summarised in a single log line after each poll
+poll_stats = Counter()
+
+# Cleared while a purchase pass runs; lower priority senders wait on it. A bot
+# process without the watcher sees the pass through db.watcher_status instead
+purchases_idle = asyncio.Event()
+purchases_idle.set()
+
+
+def _load_catalog_state(db) -> list:
+    """
+    Seed the in-memory catalog state, preferring the saved watcher snapshot.
+
+    With a snapshot only gifts still flagged as new are read from the gifts
+    table, so the first poll after a restart is diffed right away, and the
+    saved watchlists are reused unless a watchlist changed while we were down.
+
+    Args:
+        db: Database session
+
+    Returns:
+        list: Rows of gifts left flagged as new by a previous run
+    """
+    global _catalog_state, _down_since, _matcher
+
+    snapshot = load_snapshot(db)
+    if snapshot is not None:
+        _catalog_state = snapshot["catalog"]
+        _down_since = snapshot["saved_at"]
+        _matcher = snapshot["matcher"]
+        log.info(
+            "Warm start from watcher snapshot saved {}s ago ({} gifts).",
+            int(time.time()) - _down_since, len(_catalog_state)
+        )
+        return db.execute(select(*_PENDING_COLUMNS).where(Gift.is_new == True)).all()
+
+    _catalog_state = {}
+    pending = []
+    for row in db.execute(select(*_PENDING_COLUMNS)):
+        _catalog_state[row.gift_id] = (
+            row.price, row.remaining_count, row.total_count)
+        if row.is_new:
+            pending.append(row)
+    return pending
+
+
+def save_catalog_snapshot(db, catalog: dict | None = None) -> None:
+    """
+    Persist the catalog and matcher state for the next warm start. The caller commits.
+
+    Args:
+        db: Database session
+        catalog: Catalog state to save, the in-memory one by default
+    """
+    catalog = _catalog_state if catalog is None else catalog
+    if catalog is not None:
+        size = save_snapshot(db, catalog, _matcher)
+        log.debug("Saved watcher snapshot ({} gifts, {} bytes).", len(catalog), size)
+
+
+def current_watchlists(db) -> dict:
+    """
+    Watchlists for planning a drop, reloaded only after a watchlist write.
+
+    Args:
+        db: Database session
+
+    Returns:
+        dict: user_id -> watchlist entries (target, max_count)
+    """
+    global _matcher
+    version = watchlist_version(db)
+    if _matcher is None or _matcher[0] != version:
+        _matcher = (version, load_watchlists(db))
+    return _matcher[1]
+
+
+def upsert_gifts(db, gifts: list) -> list:
+    """
+    Persist changed catalog entries with a single INSERT ... ON CONFLICT DO UPDATE.
+
+    The same changes are appended to the gift history, gifts not seen before
+    are queued for announcement, and the warm-start snapshot is saved, all in
+    the same commit, so the snapshot never lags behind the gifts table.
+
+    Args:
+        db: Database session
+        gifts: GiftRecord objects as returned by GiftsApi.aio_get_gift_records
+
+    Returns:
+        list: Rows (gift_id, price, remaining_count, total_count, is_new) of gifts
+        still flagged as new, i.e. inserted by this call or left unprocessed by
+        a previous run or a failed poll
+
+    Raises:
+        NotImplementedError: If the database dialect has no upsert support here
+    """
+    global _down_since, _unprocessed
+    if _catalog_state is None:
+        pending = _load_catalog_state(db)
+    elif _unprocessed:
+        # The last poll failed before marking its drop processed
+        pending = db.execute(select(*_PENDING_COLUMNS).where(Gift.is_new == True)).all()
+    else:
+        pending = []
+
+    changed = {}
+    for gift in gifts:
+        state = (gift.star_count, gift.remaining_count, gift.total_count)
+        if _catalog_state.get(gift.id) != state:
+            changed[gift.id] = state
+
+    if changed:
+        stmt = upsert_insert(db, Gift).values([
+            {
+                "gift_id": gift_id,
+                "price": price,
+                "remaining_count": remaining_count,
+                "total_count": total_count,
+                "is_new": True,
+            }
+            for gift_id, (price, remaining_count, total_count) in changed.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Gift.gift_id],
+            set_={
+                "price": stmt.excluded.price,
+                "remaining_count": stmt.excluded.remaining_count,
+                "total_count": stmt.excluded.total_count,
+            },
+        ).returning(*_PENDING_COLUMNS)
+        rows = db.execute(stmt).all()
+        record_snapshots(db, changed)
+        enqueue_broadcasts(db, [
+            gift for gift in gifts
+            if gift.id in changed and gift.id not in _catalog_state
+        ])
+        save_catalog_snapshot(db, {**_catalog_state, **changed})
+        db.commit()
+
+        for row in rows:
+            if row.gift_id in _catalog_state:
+                poll_stats["updated"] += 1
+                log_limited(
+                    "catalog.updated", "DEBUG",
+                    "Updated gift data {}: price={}, remaining={}, total={}.",
+                    row.gift_id, row.price, row.remaining_count, row.total_count
+                )
+            else:
+                poll_stats["added"] += 1
+                if _down_since is not None:
+                    log.info("Added new gift: {} (appeared while the watcher was down)", row.gift_id)
+                else:
+                    log.info("Added new gift: {}", row.gift_id)
+            if row.is_new:
+                pending.append(row)
+        _catalog_state.update(changed)
+
+    _down_since = None
+    pending = list({row.gift_id: row for row in pending}.values())
+    _unprocessed = bool(pending)
+    return pending
+
+
+def gift_matches_settings(gift, settings) -> bool:
+    """
+    Check a gift against a user's price and supply constraints.
+
+    Args:
+        gift: Gift object
+        settings: Auto-buy settings for the user
+
+    Returns:
+        bool: True if the gift may be purchased under these settings
+    """
+    return (
+        gift.price is not None and
+        gift.total_count is not None and
+        settings.price_limit_from <= gift.price <= settings.price_limit_to and
+        (settings.supply_limit is None or gift.total_count <= settings.supply_limit)
+    )
+
+
+def in_active_window(settings, minute: int) -> bool:
+    """
+    Check a user's daily auto-purchase window.
+
+    Args:
+        settings: Auto-buy settings for the user
+        minute: Minutes since midnight UTC
+
+    Returns:
+        bool: True when no window is set or the minute falls inside it;
+        windows whose end is before their start wrap past midnight
+    """
+    start, end = settings.active_from, settings.active_to
+    if start is None or end is None or start == end:
+        return True
+    if start < end:
+        return start <= minute < end
+    return minute >= start or minute < end
+
+
+def build_candidate_index(candidates, new_gifts, watchlists: dict, emojis: dict, minute: int) -> dict:
+    """
+    Precompute, for each new gift, the users who may buy it and how many copies.
+
+    Users with a watchlist are filed under its gift ids and emoji, so a gift
+    only meets the users watching it; users without one are checked against
+    their price and supply limits. Users outside their active window are left out.
+
+    Args:
+        candidates: List of (settings, user) pairs with auto-purchase enabled
+        new_gifts: Newly detected Gift rows
+        watchlists: user_id -> watchlist rows (target, max_count)
+        emojis: gift_id -> sticker emoji from the catalog
+        minute: Minutes since midnight UTC at planning time
+
+    Returns:
+        dict: gift_id -> list of (settings, user, cap); a cap of None leaves
+        only the user's cycles as a limit
+    """
+    by_target = defaultdict(list)
+    unrestricted = []
+    for settings, user in candidates:
+        if not in_active_window(settings, minute):
+            continue
+        entries = watchlists.get(settings.user_id)
+        if not entries:
+            unrestricted.append((settings, user, settings.max_per_gift))
+            continue
+        for entry in entries:
+            cap = entry.max_count if entry.max_count is not None else settings.max_per_gift
+            by_target[entry.target].append((settings, user, cap))
+
+    index = {}
+    for gift in new_gifts:
+        matched = {}
+        # An entry for the gift id takes precedence over one for its emoji
+        for target in (gift.gift_id, emojis.get(gift.gift_id)):
+            for settings, user, cap in by_target.get(target, ()):
+                matched.setdefault(user.user_id, (settings, user, cap))
+        eligible = [entry for entry in matched.values() if gift_matches_settings(gift, entry[0])]
+        eligible.extend(entry for entry in unrestricted if gift_matches_settings(gift, entry[0]))
+        index[gift.gift_id] = eligible
+    return index
+
+
+def plan_purchases(candidates, new_gifts, bot_balance, watchlists: dict | None = None,
+                   emojis: dict | None = None, minute: int | None = None, budgets=None):
+    """
+    Build the list of purchases to attempt for a detected drop.
+
+    User balances and the bot's star balance are simulated locally so that
+    no send is issued which could not be paid for.
+
+    Args:
+        candidates: List of (settings, user) pairs with auto-purchase enabled
+        new_gifts: Newly detected Gift objects
+        bot_balance: Cached star balance of the bot token pool
+        watchlists: user_id -> watchlist rows, see db.watchlist.load_watchlists
+        emojis: gift_id -> sticker emoji from the catalog
+        minute: Minutes since midnight UTC, the current time by default
+        budgets: SpendBudgets to plan against; a copy is used, nothing is reserved
+
+    Returns:
+        tuple: (list of (user, settings, gift) purchases, projected spend of the
+        planned purchases, total spend users asked for)
+    """
+    if minute is None:
+        now = time.gmtime()
+        minute = now.tm_hour * 60 + now.tm_min
+    index = build_candidate_index(candidates, new_gifts, watchlists or {}, emojis or {}, minute)
+
+    # Regroup by user, in catalog order, so each balance is simulated on its own
+    per_user = {}
+    for gift in new_gifts:
+        for settings, user, cap in index[gift.gift_id]:
+            per_user.setdefault(user.user_id, (settings, user, []))[2].append((gift, cap))
+
+    planned = []
+    projected_spend = 0
+    requested_spend = 0
+    bot_budget = bot_balance.amount
+    budgets = budgets.simulation() if budgets is not None else None
+
+    for settings, user, gifts in per_user.values():
+        user_balance = user.balance
+        bought = Counter()
+        for _ in range(settings.cycles):
+            for gift, cap in gifts:
+                if (cap is not None and bought[gift.gift_id] >= cap) or user_balance < gift.price:
+                    continue
+                if budgets is not None and not budgets.allows(settings, user.user_id, gift.gift_id, gift.price):
+                    continue
+                requested_spend += gift.price
+                if bot_budget is not None:
+                    if bot_budget < gift.price:
+                        continue
+                    bot_budget -= gift.price
+                if budgets is not None:
+                    budgets.reserve(settings, user.user_id, gift.gift_id, gift.price)
+                user_balance -= gift.price
+                projected_spend += gift.price
+                bought[gift.gift_id] += 1
+                planned.append((user, settings, gift))
+
+    return planned, projected_spend, requested_spend
 
 
 async def process_gift_purchase(db, gifts_api, user, settings, gift):
@@ -21,64 +364,223 @@ async def process_gift_purchase(db, gifts_api, user, settings, gift):
 
     Workflow:
         1. Validate price and supply constraints
-        2. Check user balance
+        2. Check user and bot balance, and reserve against the user's spend limits
         3. Attempt to send the gift via API
         4. Update database records if successful
     """
     gift_price = gift.price
-    total_count = gift.total_count
-    price_limit_from = settings.price_limit_from
-    price_limit_to = settings.price_limit_to
-    supply_limit = settings.supply_limit
-
-    if (
-        gift_price is not None and
-        total_count is not None and
-        price_limit_from <= gift_price <= price_limit_to and
-        (supply_limit is None or total_count <= supply_limit) and
-        user.balance >= gift_price
-    ):
-        success = await gifts_api.send_gift(
+
+    if not gifts_api.pool.can_afford(gift_price):
+        poll_stats["bot_balance_low"] += 1
+        log_limited(
+            "purchase.bot_balance_low", "WARNING",
+            "Bot star balance too low to send gift {} to user {}.", gift.gift_id, user.user_id
+        )
+        return False
+
+    if gift_matches_settings(gift, settings) and user.balance >= gift_price:
+        # Counted before the send, in the same step as the balance check
+        if not spend_budgets.reserve(settings, user.user_id, gift.gift_id, gift_price):
+            poll_stats["over_budget"] += 1
+            log_limited(
+                "purchase.over_budget", "DEBUG",
+                "Spend limit reached, skipping gift {} for user {}.", gift.gift_id, user.user_id
+            )
+            return False
+        # Shielded: once the request is out the gift may already be sent, so a
+        # cancelled watcher still waits for the outcome and records the charge
+        send = asyncio.ensure_future(gifts_api.send_gift(
             user_id=user.user_id,
             gift_id=gift.gift_id,
-            pay_for_upgrade=False
-        )
+            pay_for_upgrade=False,
+            price=gift_price
+        ))
+        cancelled = False
+        try:
+            success = await asyncio.shield(send)
+        except asyncio.CancelledError:
+            cancelled = True
+            success = await send
         if success:
-            log.info(
-                f"Gift {gift.gift_id} successfully sent to user {user.user_id}."
+            poll_stats["sent"] += 1
+            poll_stats["spent"] += gift_price
+            watcher_health.mark_purchase()
+            log_limited(
+                "purchase.sent", "INFO",
+                "Gift {} successfully sent to user {}.", gift.gift_id, user.user_id
             )
             user.balance -= gift_price  # Update user balance
-            new_transaction = Transaction(
+            record_transaction(
+                db,
                 user_id=user.user_id,
                 amount=-gift_price,  # Deduct balance
+                kind=PURCHASE,
                 telegram_payment_charge_id="buy_gift_transaction",
                 payload=f"Autobuy_of_gift_{gift.gift_id}",
-                status="completed",
-                time=datetime.utcnow().isoformat(),
+                auto_buy=True,
             )
-            db.add(new_transaction)
+            if cancelled:
+                db.commit()
+                raise asyncio.CancelledError()
             return True
         else:
-            log.warning(
-                f"Failed to send gift {gift.gift_id} to user {user.user_id}."
+            poll_stats["failed"] += 1
+            spend_budgets.release(user.user_id, gift.gift_id, gift_price)
+            log_limited(
+                "purchase.failed", "WARNING",
+                "Failed to send gift {} to user {}.", gift.gift_id, user.user_id
             )
+            if cancelled:
+                raise asyncio.CancelledError()
     else:
-        log.info(
-            f"Conditions not met for purchasing gift {gift.gift_id} for user {user.user_id}."
+        poll_stats["conditions_not_met"] += 1
+        log_limited(
+            "purchase.conditions_not_met", "DEBUG",
+            "Conditions not met for purchasing gift {} for user {}.", gift.gift_id, user.user_id
         )
     return False
 
 
+def _renew_purchase_flag(db, renewed: float) -> float:
+    """Renew the shared purchase pass flag before it expires under a long pass."""
+    if time.monotonic() - renewed < PURCHASE_FLAG_TTL / 2:
+        return renewed
+    mark_purchase_pass(db, True)
+    db.commit()
+    return time.monotonic()
+
+
+async def run_purchase_pass(db, gifts_api, planned: list) -> None:
+    """
+    Attempt planned purchases in order, committing each successful one.
+
+    Once the shutdown purchase grace runs out, or the pass is cancelled, the
+    purchases not yet attempted are deferred to the next start; the caller
+    commits them together with mark_gifts_processed.
+
+    Args:
+        db: Database session
+        gifts_api: API client for gift transactions
+        planned: (user, settings, gift) tuples as built by plan_purchases
+    """
+    renewed = time.monotonic()
+    for index, (user, settings, gift) in enumerate(planned):
+        renewed = _renew_purchase_flag(db, renewed)
+        if purchase_grace_expired():
+            log.warning(
+                "Shutdown: deferred {} of {} planned purchase(s) to the next start.",
+                len(planned) - index, len(planned)
+            )
+            defer_purchases(db, planned[index:])
+            return
+        try:
+            if await process_gift_purchase(db, gifts_api, user, settings, gift):
+                db.commit()  # Commit changes after a successful purchase
+        except asyncio.CancelledError:
+            defer_purchases(db, planned[index + 1:])
+            raise
+
+
+async def replay_deferred_purchases(db, gifts_api) -> None:
+    """
+    Attempt the purchases a previous run deferred on shutdown.
+
+    Each deferred row is deleted in the commit that records its purchase, so
+    a purchase is never attempted twice; rows left when the grace runs out
+    again wait for the next start.
+
+    Args:
+        db: Database session
+        gifts_api: API client for gift transactions
+    """
+    deferred = load_deferred_purchases(db)
+    if not deferred:
+        return
+    log.info("Replaying {} purchase(s) deferred by the last shutdown.", len(deferred))
+    mark_purchase_pass(db, True)
+    spend_budgets.start_drop(db, {gift.gift_id for row, user, settings, gift in deferred})
+    db.commit()
+    renewed = time.monotonic()
+    for row, user, settings, gift in deferred:
+        renewed = _renew_purchase_flag(db, renewed)
+        if purchase_grace_expired():
+            break
+        db.delete(row)
+        if user is not None and settings is not None:
+            await process_gift_purchase(db, gifts_api, user, settings, gift)
+        db.commit()
+    mark_purchase_pass(db, False)
+    db.commit()
+
+
+def mark_gifts_processed(db, gifts) -> None:
+    """Clear the is_new flag of gifts whose drop has been handled."""
+    global _unprocessed
+    db.execute(update(Gift).where(
+        Gift.gift_id.in_([gift.gift_id for gift in gifts])
+    ).values(is_new=False))
+    db.commit()
+    _unprocessed = False
+# (watchlist version, user_id -> watchlist entries) the matcher was last built from
+_matcher: tuple | None = None
+
+
+def run_maintenance() -> tuple[int, int]:
+    """
+    Downsample old gift history and delete expired orders in a session of its own.
+
+    Blocking; the watcher runs it in the default executor.
+
+    Returns:
+        tuple: (history rows removed, expired orders deleted)
+    """
+    with get_db_session() as db:
+        return downsample_history(db), delete_expired_orders(db)
+
+
+def log_poll_summary(poll_started: float) -> None:
+    """
+    Emit one aggregated line for the poll that just finished and reset the counters.
+
+    Quiet polls are logged at DEBUG, polls with catalog changes or purchase
+    activity at INFO. Rate-limited messages dropped by keys that went quiet
+    are reported here too.
+
+    Args:
+        poll_started: time.monotonic() at the start of the poll
+    """
+    level = "INFO" if poll_stats.keys() - {"gifts"} else "DEBUG"
+    log.log(
+        level,
+        "Poll: {} gifts, {} added, {} updated, {} planned, {} sent ({} stars), {} failed, "
+        "{} skipped, {} over budget, {} bot balance low in {:.0f} ms",
+        poll_stats["gifts"], poll_stats["added"], poll_stats["updated"], poll_stats["planned"],
+        poll_stats["sent"], poll_stats["spent"], poll_stats["failed"],
+        poll_stats["conditions_not_met"], poll_stats["over_budget"], poll_stats["bot_balance_low"],
+        (time.monotonic() - poll_started) * 1000,
+    )
+    poll_stats.clear()
+    flush_suppressed()
+
+
 async def start_gift_parsing_loop():
     """
     Continuously parse new gifts and automatically process purchases for eligible users.
 
     Workflow:
-        1. Retrieve the latest available gifts
-        2. Update or create gift records in the database
-        3. Fetch users with auto-purchase enabled
-        4. Process purchases based on user settings
-        5. Commit changes and reset new gift flags
+        1. On the first poll, replay purchases deferred by the last shutdown
+        2. Retrieve the latest available gifts
+        3. Upsert changed gift records with the warm-start snapshot, and collect
+           the newly inserted ones
+        4. Fetch users with auto-purchase enabled
+        5. Plan purchases against user and bot star balances
+        6. Process planned purchases
+        7. Commit changes and reset new gift flags
+        8. On shutdown, save the snapshot again with the latest watchlists
+
+    Returns once utils.shutdown.stopping is set, after the purchase pass in
+    progress has finished or SHUTDOWN_PURCHASE_GRACE has run out; purchases
+    it did not get to are deferred to the next start.
 
     Args:
         None
@@ -86,92 +588,101 @@ async def start_gift_parsing_loop():
     gifts_api = GiftsApi()
     # Use a single session with a timeout for the entire execution loop
     session_timeout = aiohttp.ClientTimeout(total=60)
-    async with aiohttp.ClientSession(timeout=session_timeout) as session:
-        while True:
-            try:
-                # Retrieve the list of available gifts via API
-                gifts = await gifts_api.aio_get_available_gifts(session)
-                if not gifts:
-                    log.warning(
-                        "Gift list is empty or an error occurred while retrieving data."
-                    )
-                    await asyncio.sleep(10)
-                    continue
+    last_maintenance = time.monotonic()
+    replay_pending = True
+    async with make_client_session(timeout=session_timeout) as session:
+        try:
+            while not stopping.is_set():
+                try:
+                    poll_started = time.monotonic()
+                    await gifts_api.pool.refresh(gifts_api, session)
 
-                with get_db_session() as db:
-                    # Update or create gift records in the database
-                    for gift in gifts:
-                        existing_gift = db.query(Gift).filter(
-                            Gift.gift_id == gift['id']).first()
-                        if existing_gift:
-                            updated = False
-                            if existing_gift.price != gift.get('star_count', 0):
-                                existing_gift.price = gift.get('star_count', 0)
-                                updated = True
-                            if existing_gift.remaining_count != gift.get('remaining_count'):
-                                existing_gift.remaining_count = gift.get(
-                                    'remaining_count')
-                                updated = True
-                            if existing_gift.total_count != gift.get('total_count'):
-                                existing_gift.total_count = gift.get(
-                                    'total_count')
-                                updated = True
-
-                            if updated:
-                                log.info(
-                                    f"Updated gift data {existing_gift.gift_id}: "
-                                    f"price={existing_gift.price}, remaining={existing_gift.remaining_count}, "
-                                    f"total={existing_gift.total_count}."
-                                )
-                        else:
-                            new_gift = Gift(
-                                gift_id=gift['id'],
-                                price=gift.get('star_count', 0),
-                                remaining_count=gift.get('remaining_count'),
-                                total_count=gift.get('total_count'),
-                                is_new=True
+                    if replay_pending:
+                        with get_db_session() as db:
+                            purchases_idle.clear()
+                            try:
+                                await replay_deferred_purchases(db, gifts_api)
+                            finally:
+                                purchases_idle.set()
+                        replay_pending = False
+
+                    # Retrieve the list of available gifts via API
+                    gifts = await gifts_api.aio_get_gift_records(session)
+                    if not gifts:
+                        log.warning(
+                            "Gift list is empty or an error occurred while retrieving data."
+                        )
+                        await wait_or_stop(10)
+                        continue
+
+                    with get_db_session() as db:
+                        # Write the changed part of the catalog in one statement
+                        poll_stats["gifts"] = len(gifts)
+                        new_gifts = upsert_gifts(db, gifts)
+
+                        # Retrieve users with auto-purchase enabled
+                        candidates = []
+                        if new_gifts:
+                            candidates = db.query(AutoBuySettings, User).join(
+                                User, User.user_id == AutoBuySettings.user_id
+                            ).filter(AutoBuySettings.status == "enabled").all()
+
+                        if new_gifts and candidates:
+                            purchases_idle.clear()
+                            # Committed before the first send, so the bot's broadcaster
+                            # pauses even when this watcher runs in its own process
+                            mark_purchase_pass(db, True)
+                            db.commit()
+                            spend_budgets.start_drop(db, {gift.gift_id for gift in new_gifts})
+                            planned, projected_spend, requested_spend = plan_purchases(
+                                candidates, new_gifts, gifts_api.pool,
+                                watchlists=current_watchlists(db),
+                                emojis={gift.id: gift.emoji for gift in gifts},
+                                budgets=spend_budgets,
                             )
-                            db.add(new_gift)
+                            poll_stats["planned"] += len(planned)
                             log.info(
-                                f"Added new gift: {new_gift.gift_id}")
-
-                    db.commit()
-                    log.info("Gift list successfully updated in the database.")
-
-                    # Retrieve users with auto-purchase enabled
-                    auto_buy_users = db.query(AutoBuySettings).filter(
-                        AutoBuySettings.status == "enabled"
-                    ).all()
-                    # Retrieve the list of newly added gifts for processing
-                    new_gifts = db.query(Gift).filter(Gift.is_new == True).all()
-
-                    for settings in auto_buy_users:
-                        user = db.query(User).filter(
-                            User.user_id == settings.user_id).first()
-                        if not user:
-                            continue
-
-                        for cycle in range(settings.cycles):
-                            log.debug(
-                                f"Cycle {cycle + 1}/{settings.cycles} for user {user.user_id}."
+                                "Projected spend for drop of {} gift(s): {} stars over {} purchase(s) "
+                                "(requested {}, bot balance {}).",
+                                len(new_gifts), projected_spend, len(planned),
+                                requested_spend, gifts_api.pool.amount
                             )
-                            for gift in new_gifts:
-                                if user.balance < gift.price:
-                                    log.info(
-                                        f"Insufficient funds for user {user.user_id} to purchase gift {gift.gift_id}."
-                                    )
-                                    continue
-
-                                purchase_success = await process_gift_purchase(db, gifts_api, user, settings, gift)
-                                if purchase_success:
-                                    db.commit()  # Commit changes after a successful purchase
-
-                    # Reset the 'is_new' flag after processing new gifts
-                    for gift in new_gifts:
-                        gift.is_new = False
-                    db.commit()
-
-                await asyncio.sleep(3)
-            except Exception as e:
-                log.error(f"Error in the gift parsing process: {e}")
-                await asyncio.sleep(3)
+
+                            try:
+                                # Unsent purchases are deferred, and the drop is still marked
+                                # processed below, so a restart cannot buy twice for users served
+                                await run_purchase_pass(db, gifts_api, planned)
+                            except asyncio.CancelledError:
+                                mark_purchase_pass(db, False)
+                                mark_gifts_processed(db, new_gifts)
+                                raise
+                            finally:
+                                purchases_idle.set()
+                            mark_purchase_pass(db, False)
+
+                        # Reset the 'is_new' flag after processing new gifts
+                        if new_gifts:
+                            mark_gifts_processed(db, new_gifts)
+
+                        if time.monotonic() - last_maintenance >= MAINTENANCE_INTERVAL:
+                            # Large deletes, kept off the event loop
+                            removed, expired = await run_blocking(run_maintenance)
+                            last_maintenance = time.monotonic()
+                            log.info(
+                                "Maintenance: removed {} history rows, {} expired orders.", removed, expired)
+
+                    log_poll_summary(poll_started)
+                    watcher_health.mark_poll()
+                    await wait_or_stop(3)
+                except Exception as e:
+                    log.error("Error in the gift parsing process: {}", e)
+                    purchases_idle.set()
+                    poll_stats.clear()
+                    await wait_or_stop(3)
+        finally:
+            # Runs on cancellation too, so a restart warm-starts from the latest state
+            purchases_idle.set()
+            await gifts_api.close()
+            with get_db_session() as db:
+                save_catalog_snapshot(db)
+                db.commit()
@@ -0,0 +1,149 @@
+import time
+
+from aiohttp import web
+
+from config import load_config
+from utils.logger import log
+from utils.shutdown import stopping
+
+config = load_config()
+
+
+class WatcherHealth:
+    """Progress of the gift watcher, judged by how fresh its last poll is."""
+
+    def __init__(self, stale_seconds: float | None = None, ready_seconds: float | None = None):
+        # Reported dead after this long without progress, not ready after this long without a poll;
+        # None follows health_stale_seconds and health_ready_seconds from the configuration
+        self._stale_seconds = stale_seconds
+        self._ready_seconds = ready_seconds
+        self.enabled = False
+        self.started = time.monotonic()
+        self.last_poll: float | None = None
+        self.last_purchase: float | None = None
+        self.last_purchase_at: float | None = None  # Unix time, for humans
+        self.polls = 0
+        self.purchases = 0
+        self.restarts = 0
+
+    def mark_poll(self) -> None:
+        """Record a poll that completed without errors."""
+        self.last_poll = time.monotonic()
+        self.polls += 1
+
+    def mark_purchase(self) -> None:
+        """Record a gift sent by the watcher."""
+        self.last_purchase = time.monotonic()
+        self.last_purchase_at = time.time()
+        self.purchases += 1
+
+    def mark_restart(self) -> None:
+        self.restarts += 1
+
+    @property
+    def stale_seconds(self) -> float:
+        return config['health_stale_seconds'] if self._stale_seconds is None else self._stale_seconds
+
+    @property
+    def ready_seconds(self) -> float:
+        return config['health_ready_seconds'] if self._ready_seconds is None else self._ready_seconds
+
+    def _age(self, since: float | None) -> float | None:
+        return None if since is None else time.monotonic() - since
+
+    def live(self) -> bool:
+        """False when the watcher made no progress for stale_seconds."""
+        if not self.enabled:
+            return True
+        # A long purchase pass polls nothing, but every send is progress
+        progress = max(self.last_poll or self.started, self.last_purchase or 0.0)
+        return time.monotonic() - progress < self.stale_seconds
+
+    def ready(self) -> bool:
+        """True once the watcher polled recently and shutdown hasn't started."""
+        if stopping.is_set():
+            return False
+        if not self.enabled:
+            return True
+        age = self._age(self.last_poll)
+        return age is not None and age < self.ready_seconds
+
+    def report(self) -> dict:
+        poll_age = self._age(self.last_poll)
+        purchase_age = self._age(self.last_purchase)
+        return {
+            "watcher": self.enabled,
+            "live": self.live(),
+            "ready": self.ready(),
+            "polls": self.polls,
+            "last_poll_age": round(poll_age, 1) if poll_age is not None else None,
+            "purchases": self.purchases,
+            "last_purchase_age": round(purchase_age, 1) if purchase_age is not None else None,
+            "last_purchase_at": self.last_purchase_at,
+            "restarts": self.restarts,
+        }
+
+    def render_metrics(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        poll_age = self._age(self.last_poll)
+        return "\n".join([
+            f"watcher_up {int(self.live())}",
+            f"watcher_ready {int(self.ready())}",
+            f"watcher_polls_total {self.polls}",
+            f"watcher_purchases_total {self.purchases}",
+            f"watcher_restarts_total {self.restarts}",
+            f"watcher_last_poll_age_seconds {poll_age if poll_age is not None else -1:.3f}",
+        ]) + "\n"
+
+
+watcher_health = WatcherHealth()
+
+
+async def _liveness(request: web.Request) -> web.Response:
+    report = watcher_health.report()
+    return web.json_response(report, status=200 if report["live"] else 503)
+
+
+async def _readiness(request: web.Request) -> web.Response:
+    report = watcher_health.report()
+    return web.json_response(report, status=200 if report["ready"] else 503)
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    from db.engine import pool_stats
+    from utils.loop_monitor import loop_monitor
+
+    body = watcher_health.render_metrics() + loop_monitor.render_metrics() + pool_stats.render_metrics()
+    return web.Response(text=body, content_type="text/plain")
+
+
+async def start_health_server(host: str | None = None, port: int | None = None) -> web.AppRunner | None:
+    """
+    Serve /healthz (liveness), /readyz (readiness) and /metrics.
+
+    Args:
+        host: Address to listen on, health_host from the configuration by default
+        port: Port to listen on, health_port by default; 0 disables the endpoint
+
+    Returns:
+        AppRunner: Runner to clean up on shutdown
+        None: If the endpoint is disabled or the port is taken
+    """
+    host = host if host is not None else config['health_host']
+    port = port if port is not None else config['health_port']
+    if not port:
+        return None
+    app = web.Application()
+    app.router.add_get("/healthz", _liveness)
+    app.router.add_get("/readyz", _readiness)
+    app.router.add_get("/metrics", _metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        log.warning(f"Health endpoint disabled, cannot listen on {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    log.info("Health endpoint listening on http://{}:{}/healthz", host, port)
+    return runner
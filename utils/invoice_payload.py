@@ -0,0 +1,86 @@
+import base64
+import hashlib
+import hmac
+import struct
+from typing import NamedTuple
+
+from config import load_config
+
+config = load_config()
+
+
+PAYLOAD_VERSION = 1
+
+KIND_DEPOSIT = 1
+KIND_GIFT = 2
+
+# version, kind, order id, user id, invoice amount
+_BODY = struct.Struct(">BBQQI")
+_TAG_SIZE = 10
+_RAW_SIZE = _BODY.size + _TAG_SIZE
+# base64url without padding, 43 characters, well below Telegram's 128-byte limit
+PAYLOAD_SIZE = (_RAW_SIZE * 4 + 2) // 3
+
+
+class InvoicePayload(NamedTuple):
+    kind: int
+    order_id: int
+    user_id: int
+    amount: int
+
+
+def _signing_key() -> bytes:
+    secret = config['payload_secret'] or config['bot_token'] or ""
+    return hashlib.sha256(b"invoice-payload:" + secret.encode()).digest()
+
+
+_KEY = _signing_key()
+
+
+def _tag(body: bytes) -> bytes:
+    return hmac.new(_KEY, body, hashlib.sha256).digest()[:_TAG_SIZE]
+
+
+def encode_payload(kind: int, order_id: int, user_id: int, amount: int) -> str:
+    """
+    Encode a signed invoice payload.
+
+    Args:
+        kind: KIND_DEPOSIT or KIND_GIFT
+        order_id: PendingOrder id the invoice belongs to
+        user_id: Telegram ID of the paying user
+        amount: Invoice amount in stars
+
+    Returns:
+        str: Fixed-size base64url payload
+    """
+    body = _BODY.pack(PAYLOAD_VERSION, kind, order_id, user_id, amount)
+    return base64.urlsafe_b64encode(body + _tag(body)).rstrip(b"=").decode()
+
+
+def decode_payload(payload: str) -> InvoicePayload | None:
+    """
+    Decode and verify an invoice payload.
+
+    Args:
+        payload: invoice_payload from a pre-checkout query or successful payment
+
+    Returns:
+        InvoicePayload: Decoded fields if the payload is well-formed and authentic
+        None: For legacy, foreign or tampered payloads
+    """
+    if len(payload) != PAYLOAD_SIZE:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+    except ValueError:
+        return None
+
+    body, tag = raw[:_BODY.size], raw[_BODY.size:]
+    if not hmac.compare_digest(tag, _tag(body)):
+        return None
+
+    version, kind, order_id, user_id, amount = _BODY.unpack(body)
+    if version != PAYLOAD_VERSION:
+        return None
+    return InvoicePayload(kind, order_id, user_id, amount)
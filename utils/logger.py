@@ -1,6 +1,11 @@
 from loguru import logger
 import logging
 import sys
+import time
+
+from config import load_config
+
+config = load_config()
 
 
 class InterceptHandler(logging.Handler):
@@ -13,25 +18,158 @@ class InterceptHandler(logging.Handler):
         logger.log(level, record.getMessage())
 
 
-def setup_logger():
+class RateLimiter:
+    """
+    Per-key log rate limiter with sampling.
+
+    Each key may log `limit` messages per `window` seconds. Past that,
+    every `sample_every`-th message is still let through, and the number
+    of dropped messages is reported once the window rolls over, or by
+    flush() for keys that went quiet.
+    """
+
+    def __init__(self, limit: int | None = None, window: float | None = None,
+                 sample_every: int | None = None):
+        # None follows log_rate_limit, log_rate_window and log_sample_every from the configuration
+        self._limit = limit
+        self._window = window
+        self._sample_every = sample_every
+        # key -> [window start, messages seen in window, messages suppressed in window, level]
+        self._state: dict[str, list] = {}
+
+    def allow(self, key: str, level: str = "INFO") -> tuple[bool, int]:
+        """
+        Decide whether a message for the key should be logged.
+
+        Args:
+            key: Rate limiting key
+            level: Level of the message, kept for the suppression summary
+
+        Returns:
+            tuple: (allowed, messages suppressed in the window that just ended)
+        """
+        now = time.monotonic()
+        state = self._state.get(key)
+        suppressed = 0
+        if state is None or now - state[0] >= self.window:
+            if state is not None:
+                suppressed = state[2]
+            state = self._state[key] = [now, 0, 0, level]
+
+        state[1] += 1
+        seen = state[1]
+        if seen <= self.limit or (self.sample_every and (seen - self.limit) % self.sample_every == 0):
+            return True, suppressed
+        state[2] += 1
+        return False, suppressed
+
+    def flush(self, force: bool = False) -> list:
+        """
+        Collect suppression counts that no later message would report.
+
+        Args:
+            force: Also collect counts of windows still open, e.g. on shutdown
+
+        Returns:
+            list: (key, level, messages suppressed) for each key with drops
+        """
+        now = time.monotonic()
+        flushed = []
+        for key, state in list(self._state.items()):
+            expired = now - state[0] >= self.window
+            if state[2] and (force or expired):
+                flushed.append((key, state[3], state[2]))
+                state[2] = 0
+            if expired:
+                # Nothing left to report; the next message opens a new window
+                del self._state[key]
+        return flushed
+
+    @property
+    def limit(self) -> int:
+        return config['log_rate_limit'] if self._limit is None else self._limit
+
+    @property
+    def window(self) -> float:
+        return config['log_rate_window'] if self._window is None else self._window
+
+    @property
+    def sample_every(self) -> int:
+        return config['log_sample_every'] if self._sample_every is None else self._sample_every
+
+
+_rate_limiter = RateLimiter()
+
+
+def log_limited(key: str, level: str, message: str, *args, **kwargs) -> None:
+    """
+    Log a hot-path message through the per-key rate limiter.
+
+    Formatting is lazy: pass values as loguru `{}` arguments rather than an
+    f-string, so suppressed messages cost a dict lookup and nothing more.
+
+    Args:
+        key: Rate limiting key, also attached to the record as extra["key"]
+        level: Loguru level name
+        message: Message template with `{}` placeholders
+        *args: Template arguments
+        **kwargs: Template keyword arguments
+    """
+    allowed, suppressed = _rate_limiter.allow(key, level)
+    if suppressed:
+        logger.bind(key=key).log(
+            level, "Suppressed {} '{}' messages in the last {:.0f}s", suppressed, key, _rate_limiter.window)
+    if allowed:
+        logger.bind(key=key).opt(depth=1).log(level, message, *args, **kwargs)
+
+
+def flush_suppressed(force: bool = False) -> None:
+    """
+    Report messages log_limited dropped for keys that have gone quiet.
+
+    Called after every watcher poll, and with force=True on shutdown so
+    counts of windows still open are not lost.
+
+    Args:
+        force: Also report windows that have not ended yet
+    """
+    for key, level, suppressed in _rate_limiter.flush(force):
+        logger.bind(key=key).log(
+            level, "Suppressed {} '{}' messages in the last {:.0f}s", suppressed, key, _rate_limiter.window)
+
+
+def setup_logger(log_format: str | None = None, log_level: str | None = None):
+    log_format = log_format or config['log_format']
+    log_level = log_level or config['log_level']
     logger.remove()
-    logger.add(
-        sys.stdout,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-               "<level>{level: <8}</level> | "
-               "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-               "<level>{message}</level>",
-        level="INFO",
-        enqueue=True,
-    )
-    logger.add(
-        "logs/bot_{time:YYYY-MM-DD}.log",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {module}:{function}:{line} - {message}",
-        level="DEBUG",
-        rotation="1 week",
-        compression="zip",
-        enqueue=True,
-    )
+    if log_format == "json":
+        logger.add(sys.stdout, serialize=True, level=log_level, enqueue=True)
+        logger.add(
+            "logs/bot_{time:YYYY-MM-DD}.jsonl",
+            serialize=True,
+            level="DEBUG",
+            rotation="1 week",
+            compression="zip",
+            enqueue=True,
+        )
+    else:
+        logger.add(
+            sys.stdout,
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+                   "<level>{level: <8}</level> | "
+                   "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+                   "<level>{message}</level>",
+            level=log_level,
+            enqueue=True,
+        )
+        logger.add(
+            "logs/bot_{time:YYYY-MM-DD}.log",
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {module}:{function}:{line} - {message}",
+            level="DEBUG",
+            rotation="1 week",
+            compression="zip",
+            enqueue=True,
+        )
 
     logging.basicConfig(handlers=[InterceptHandler()], level=logging.INFO)
     for logger_name in ("aiogram", "aiogram.dispatcher", "asyncio"):
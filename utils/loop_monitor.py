@@ -0,0 +1,181 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+from config import load_config
+from utils.logger import log, log_limited
+
+config = load_config()
+
+# Recent slow callbacks kept with their stack sample
+RECENT_SLOW_CALLBACKS = 20
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_EXCLUDED = (os.path.join(_ROOT, "utils", "loop_monitor"), os.path.join(_ROOT, "bot", "middlewares"))
+
+
+def _is_project_frame(filename: str) -> bool:
+    return filename.startswith(_ROOT) and "site-packages" not in filename
+
+
+def attribute_stack(stack: traceback.StackSummary) -> tuple[str, str]:
+    """
+    Attribute a stack sample of the loop thread to project code.
+
+    Only frames below the event loop's callback dispatch are considered, and
+    middlewares are skipped, so the outermost frame left is the handler or
+    the background loop that owns the callback.
+
+    Returns:
+        tuple: (outermost project function, e.g. the handler or loop stage,
+        innermost project line, where the time was spent)
+    """
+    start = 0
+    for index, frame in enumerate(stack):
+        if frame.name == "_run" and frame.filename.endswith(os.path.join("asyncio", "events.py")):
+            start = index + 1
+    frames = [frame for frame in stack[start:] if _is_project_frame(frame.filename)]
+    if not frames:
+        return "<external>", "<external>"
+    owners = [frame for frame in frames if not frame.filename.startswith(_EXCLUDED)] or frames
+    outer, inner = owners[0], frames[-1]
+    return (
+        f"{os.path.relpath(outer.filename, _ROOT)}:{outer.name}",
+        f"{os.path.relpath(inner.filename, _ROOT)}:{inner.lineno} ({inner.name})",
+    )
+
+
+class LoopMonitor:
+    """
+    Event loop lag watchdog.
+
+    A probe coroutine sleeps for a fixed interval and records how late it
+    wakes up. A watchdog thread notices when the probe is overdue, which
+    means a callback is holding the loop, and samples the loop thread's
+    stack while it is still blocked so the slow callback can be attributed.
+    """
+
+    def __init__(self, interval: float | None = None, threshold: float | None = None):
+        # None follows loop_monitor_interval and loop_slow_threshold from the configuration
+        self._interval = interval
+        self._threshold = threshold
+        self.enabled = False
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat = time.monotonic()
+        self._sample: traceback.StackSummary | None = None
+        self.reset()
+
+    @property
+    def interval(self) -> float:
+        return config['loop_monitor_interval'] if self._interval is None else self._interval
+
+    @property
+    def threshold(self) -> float:
+        return config['loop_slow_threshold'] if self._threshold is None else self._threshold
+
+    def reset(self) -> None:
+        """Clear collected metrics."""
+        self.probes = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.slow_callbacks = 0
+        self.slow_by_handler = Counter()
+        self.slow_by_site = Counter()
+        self.recent = deque(maxlen=RECENT_SLOW_CALLBACKS)
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+            self._thread.start()
+        log.info("Event loop monitor started (interval {}s, threshold {}s).", self.interval, self.threshold)
+
+    def stop(self) -> None:
+        """Stop monitoring; collected metrics are kept."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        log.info("Event loop monitor stopped.")
+
+    async def _probe(self) -> None:
+        while self.enabled:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self._record(max(now - expected, 0.0))
+
+    def _record(self, lag: float) -> None:
+        self.probes += 1
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+        if lag < self.threshold:
+            self._sample = None
+            return
+
+        sample, self._sample = self._sample, None
+        handler, site = attribute_stack(sample) if sample is not None else ("<unsampled>", "<unsampled>")
+        self.slow_callbacks += 1
+        self.slow_by_handler[handler] += 1
+        self.slow_by_site[site] += 1
+        self.recent.append((time.time(), lag, handler, site, "".join(sample.format()) if sample else ""))
+        log_limited(
+            "loop.slow_callback", "WARNING",
+            "Event loop blocked for {:.0f} ms in {} at {}", lag * 1000, handler, site
+        )
+
+    def _watch(self) -> None:
+        # Runs in its own thread: the loop thread is the one being blocked
+        while self.enabled:
+            time.sleep(self.threshold / 2)
+            overdue = time.monotonic() - self._heartbeat - self.interval
+            if overdue >= self.threshold and self._sample is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._sample = traceback.extract_stack(frame)
+
+    def metrics(self) -> dict:
+        """Current metrics as a flat dict."""
+        return {
+            "enabled": self.enabled,
+            "probes": self.probes,
+            "lag_avg_ms": self.lag_total / self.probes * 1000 if self.probes else 0.0,
+            "lag_max_ms": self.lag_max * 1000,
+            "slow_callbacks": self.slow_callbacks,
+            "top_handlers": self.slow_by_handler.most_common(5),
+            "top_sites": self.slow_by_site.most_common(5),
+        }
+
+    def render_metrics(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            f"loop_monitor_enabled {int(self.enabled)}",
+            f"loop_lag_probes_total {self.probes}",
+            f"loop_lag_seconds_sum {self.lag_total:.6f}",
+            f"loop_lag_seconds_max {self.lag_max:.6f}",
+            f"loop_slow_callbacks_total {self.slow_callbacks}",
+        ]
+        for handler, count in self.slow_by_handler.items():
+            label = handler.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'loop_slow_callbacks_by_handler_total{{handler="{label}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,203 @@
+import argparse
+from datetime import datetime
+
+from sqlalchemy import select, delete, update
+
+from utils.logger import log
+from db.models import Transaction, User, LedgerBalance, ReconcileCheckpoint
+from db.ledger import balance_effect
+
+
+CHECKPOINT_NAME = "balances"
+DEFAULT_CHUNK_SIZE = 5000
+# Drifted users listed individually in the report
+REPORT_SAMPLE_SIZE = 50
+
+
+def _get_checkpoint(db) -> ReconcileCheckpoint:
+    checkpoint = db.get(ReconcileCheckpoint, CHECKPOINT_NAME)
+    if checkpoint is None:
+        checkpoint = ReconcileCheckpoint(name=CHECKPOINT_NAME, last_transaction_id=0)
+        db.add(checkpoint)
+        db.commit()
+    return checkpoint
+
+
+def _apply_deltas(db, deltas: dict) -> None:
+    """Add per-user balance deltas of one chunk to ledger_balances."""
+    existing = {
+        row.user_id: row
+        for row in db.query(LedgerBalance).filter(LedgerBalance.user_id.in_(list(deltas)))
+    }
+    for user_id, delta in deltas.items():
+        row = existing.get(user_id)
+        if row is None:
+            db.add(LedgerBalance(user_id=user_id, balance=delta))
+        else:
+            row.balance += delta
+
+
+def fold_ledger(db, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Fold ledger rows written since the last checkpoint into ledger_balances.
+
+    The ledger is read in keyset-ordered chunks, each streamed through a
+    server-side cursor where the driver supports one, and every chunk is
+    committed together with the checkpoint. Memory stays bounded by the chunk
+    size and an interrupted run resumes from the last committed chunk.
+
+    Args:
+        db: Database session
+        chunk_size: Ledger rows per chunk
+
+    Returns:
+        int: Number of ledger rows folded
+    """
+    checkpoint = _get_checkpoint(db)
+    folded = 0
+
+    while True:
+        rows = db.execute(
+            select(Transaction.id, Transaction.user_id, Transaction.amount, Transaction.kind,
+                   Transaction.status, Transaction.payload, Transaction.telegram_payment_charge_id)
+            .where(Transaction.id > checkpoint.last_transaction_id)
+            .order_by(Transaction.id)
+            .limit(chunk_size)
+            .execution_options(stream_results=True, yield_per=chunk_size)
+        )
+
+        deltas = {}
+        last_id = None
+        count = 0
+        for row in rows:
+            effect = balance_effect(row.kind, row.amount, row.status,
+                                    row.payload, row.telegram_payment_charge_id)
+            user_id = str(row.user_id)
+            deltas[user_id] = deltas.get(user_id, 0) + effect
+            last_id = row.id
+            count += 1
+
+        if last_id is None:
+            break
+
+        _apply_deltas(db, deltas)
+        checkpoint.last_transaction_id = last_id
+        checkpoint.updated = datetime.now().isoformat()
+        db.commit()
+        folded += count
+
+        if count < chunk_size:
+            break
+
+    return folded
+
+
+def find_drift(db, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Compare stored user balances with ledger balances, one chunk of users at a time.
+
+    Args:
+        db: Database session
+        chunk_size: Users per chunk
+
+    Yields:
+        tuple: (user_id, stored balance, ledger balance) for every drifted user
+    """
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(User.id, User.user_id, User.balance, LedgerBalance.balance.label("ledger_balance"))
+            .outerjoin(LedgerBalance, LedgerBalance.user_id == User.user_id)
+            .where(User.id > last_id)
+            .order_by(User.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+
+        for row in rows:
+            stored = row.balance or 0
+            expected = row.ledger_balance or 0
+            if stored != expected:
+                yield row.user_id, stored, expected
+        last_id = rows[-1].id
+
+
+def reconcile_balances(db, repair: bool = False, full: bool = False,
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Recompute balances from the ledger, report drift and optionally repair it.
+
+    Args:
+        db: Database session
+        repair: Overwrite drifted User.balance values with the ledger balance
+        full: Discard the checkpoint and refold the whole ledger
+        chunk_size: Rows per chunk for both the ledger and the user scan
+
+    Returns:
+        dict: folded, drifted, total_drift, repaired and a sample of drifted users
+    """
+    if full:
+        db.execute(delete(LedgerBalance))
+        _get_checkpoint(db).last_transaction_id = 0
+        db.commit()
+
+    folded = fold_ledger(db, chunk_size)
+    candidates = list(find_drift(db, chunk_size))
+
+    # Purchases may have landed while users were scanned: catch up and recheck
+    if candidates and fold_ledger(db, chunk_size):
+        candidate_ids = {user_id for user_id, _, _ in candidates}
+        candidates = [item for item in find_drift(db, chunk_size) if item[0] in candidate_ids]
+
+    report = {
+        "folded": folded,
+        "drifted": len(candidates),
+        "total_drift": sum(stored - expected for _, stored, expected in candidates),
+        "repaired": 0,
+        "sample": candidates[:REPORT_SAMPLE_SIZE],
+    }
+
+    for user_id, stored, expected in candidates:
+        log.warning(f"Balance drift for user {user_id}: stored={stored}, ledger={expected}.")
+        if repair:
+            # Only overwrite the balance we compared against, never a concurrent update
+            result = db.execute(
+                update(User)
+                .where(User.user_id == user_id, User.balance == stored)
+                .values(balance=expected)
+            )
+            report["repaired"] += result.rowcount
+    if repair:
+        db.commit()
+
+    log.info(
+        f"Reconciliation finished: folded {report['folded']} ledger rows, "
+        f"{report['drifted']} drifted users (net {report['total_drift']}), "
+        f"{report['repaired']} repaired."
+    )
+    return report
+
+
+def main():
+    """
+    Command line entry point, meant to run nightly:
+
+        python -m utils.reconcile [--repair] [--full] [--chunk-size N]
+    """
+    parser = argparse.ArgumentParser(description="Reconcile user balances against the transaction ledger.")
+    parser.add_argument("--repair", action="store_true", help="overwrite drifted balances with the ledger balance")
+    parser.add_argument("--full", action="store_true", help="ignore the checkpoint and refold the whole ledger")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from db import init_db
+    from db.session import get_db_session
+
+    init_db()
+    with get_db_session() as db:
+        reconcile_balances(db, repair=args.repair, full=args.full, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from config import load_config
+from utils.logger import log
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
+config = load_config()
+
+
+def loop_factory(mode: str | None = None):
+    """
+    Pick the event loop implementation.
+
+    Args:
+        mode: "auto", "uvloop" or "asyncio", event_loop from the configuration by default
+
+    Returns:
+        callable: Loop factory for asyncio.Runner, None for the default loop
+    """
+    mode = mode or config['event_loop']
+    if mode == "asyncio":
+        return None
+    if uvloop is None:
+        if mode == "uvloop":
+            log.warning("EVENT_LOOP=uvloop but uvloop is not installed, using the default loop.")
+        return None
+    return uvloop.new_event_loop
+
+
+def run(coro, mode: str | None = None):
+    """Run a coroutine to completion on the configured event loop."""
+    with asyncio.Runner(loop_factory=loop_factory(mode)) as runner:
+        return runner.run(coro)
+
+
+def configure_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Install the default executor used by run_blocking and asyncio.to_thread."""
+    workers = config['blocking_workers']
+    loop.set_default_executor(
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blocking"))
+    log.info(
+        "Event loop: {}, blocking workers: {}, DNS resolver: {}",
+        type(loop).__module__.split(".")[0], workers, "aiodns" if aiodns else "threaded",
+    )
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the default executor without holding the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(func, *args, **kwargs))
+
+
+def make_connector() -> aiohttp.TCPConnector:
+    """TCP connector tuned for many concurrent calls to a single API host."""
+    return aiohttp.TCPConnector(
+        limit=config['http_pool_limit'],
+        limit_per_host=config['http_pool_limit'],
+        ttl_dns_cache=config['http_dns_ttl'],
+        keepalive_timeout=config['http_keepalive'],
+        resolver=aiohttp.AsyncResolver() if aiodns else aiohttp.ThreadedResolver(),
+    )
+
+
+def make_client_session(**kwargs) -> aiohttp.ClientSession:
+    """Create an aiohttp session using the tuned connector."""
+    return aiohttp.ClientSession(connector=make_connector(), **kwargs)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Longest profile an admin may request, seconds
+MAX_PROFILE_SECONDS = 120
+# Seconds between stack samples
+PROFILE_INTERVAL = 0.01
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_lock = asyncio.Lock()
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT) and "site-packages" not in filename:
+        path = os.path.relpath(filename, _ROOT)
+    else:
+        path = os.path.basename(filename)
+    return f"{code.co_qualname} ({path})".replace(";", ":")
+
+
+def _collapse(frame) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _task_label(task) -> str:
+    coro = task.get_coro()
+    name = getattr(coro, "__qualname__", type(coro).__name__)
+    return f"task {task.get_name()} [{name}]".replace(";", ":")
+
+
+def _sample(loop, loop_thread_id: int, seconds: float, interval: float, per_task: bool) -> tuple[Counter, int]:
+    # Runs in a worker thread so the sampled loop keeps running normally
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(loop_thread_id)
+        if frame is not None:
+            stack = _collapse(frame)
+            if per_task:
+                task = asyncio.current_task(loop)
+                stack.insert(0, _task_label(task) if task is not None else "idle")
+            stacks[";".join(stack)] += 1
+            samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+async def profile(seconds: float, per_task: bool = False, interval: float = PROFILE_INTERVAL) -> tuple[bytes, dict]:
+    """
+    Sample the event loop thread's stack for a while.
+
+    The result is in the collapsed stack format read by flamegraph.pl and
+    speedscope: one line per distinct stack, frames joined by ';', followed
+    by the number of samples.
+
+    Args:
+        seconds: Profile duration, capped at MAX_PROFILE_SECONDS
+        per_task: Prefix every stack with the asyncio task that was running
+        interval: Seconds between samples
+
+    Returns:
+        tuple: (collapsed stacks as bytes, summary with samples, seconds and
+        the most sampled leaf frames)
+
+    Raises:
+        RuntimeError: If another profile is already running
+    """
+    if _lock.locked():
+        raise RuntimeError("A profile is already running.")
+    seconds = max(1.0, min(float(seconds), MAX_PROFILE_SECONDS))
+
+    async with _lock:
+        loop = asyncio.get_running_loop()
+        stacks, samples = await asyncio.to_thread(
+            _sample, loop, threading.get_ident(), seconds, interval, per_task)
+
+    leaves = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    body = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    summary = {
+        "samples": samples,
+        "seconds": seconds,
+        "stacks": len(stacks),
+        "top_leaves": leaves.most_common(5),
+    }
+    return body.encode(), summary
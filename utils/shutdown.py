@@ -0,0 +1,82 @@
+import asyncio
+import signal
+import time
+
+from config import load_config
+from utils.logger import log
+
+config = load_config()
+
+# Set once shutdown starts; background loops finish their current step and return
+stopping = asyncio.Event()
+_stop_requested_at: float | None = None
+
+
+def request_stop(reason: str = "shutdown") -> None:
+    """Ask the background loops to wind down."""
+    global _stop_requested_at
+    if stopping.is_set():
+        return
+    _stop_requested_at = time.monotonic()
+    stopping.set()
+    log.info("Stopping ({}), draining in-flight work for up to {:.0f}s.", reason, config['shutdown_grace'])
+
+
+def purchase_grace_expired() -> bool:
+    """True once a stop was requested more than shutdown_purchase_grace seconds ago."""
+    return (
+        _stop_requested_at is not None
+        and time.monotonic() - _stop_requested_at >= config['shutdown_purchase_grace']
+    )
+
+
+def grace_remaining() -> float:
+    """Seconds left of shutdown_grace since the stop was requested."""
+    grace = config['shutdown_grace']
+    if _stop_requested_at is None:
+        return grace
+    return max(grace - (time.monotonic() - _stop_requested_at), 0.0)
+
+
+async def wait_or_stop(seconds: float) -> bool:
+    """
+    Sleep, waking up early when a stop is requested.
+
+    Returns:
+        bool: True if the loop should stop
+    """
+    try:
+        await asyncio.wait_for(stopping.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+    return stopping.is_set()
+
+
+def install_signal_handlers() -> None:
+    """Turn SIGTERM and SIGINT into request_stop for processes without aiogram polling."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_stop, sig.name)
+
+
+async def drain(tasks, timeout: float, name: str) -> None:
+    """
+    Wait for tasks to finish on their own, cancelling whatever is left after the timeout.
+
+    Args:
+        tasks: Tasks to wait for
+        timeout: Seconds to wait before cancelling
+        name: What the tasks are, for logs
+    """
+    tasks = [task for task in tasks if task is not None and not task.done()]
+    if not tasks:
+        return
+    started = time.monotonic()
+    done, pending = await asyncio.wait(tasks, timeout=max(timeout, 0))
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+        log.warning("Cancelled {} {} still running after {:.0f}s.", len(pending), name, timeout)
+    else:
+        log.info("Drained {} {} in {:.1f}s.", len(done), name, time.monotonic() - started)
@@ -0,0 +1,98 @@
+import copy
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from db.models import UserLedgerSummary
+
+
+def utc_day() -> str:
+    """Current UTC date, the day daily budgets are counted in."""
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class SpendBudgets:
+    """
+    In-memory auto-buy spend counters for the daily, per-drop and per-gift caps.
+
+    Daily spend is persisted on the ledger summary in the same commit as each
+    purchase, and reloaded from there once per drop; within a drop the
+    counters are only touched in memory, so checking a budget costs no query.
+    A drop is identified by its gift ids, so passes that retry the same
+    gifts keep counting against the same drop and gift caps.
+    """
+
+    def __init__(self):
+        self.day = utc_day()
+        self.daily = Counter()  # user_id -> stars spent today
+        self.drop = Counter()  # user_id -> stars spent in the current drop
+        self.gift = Counter()  # (user_id, gift_id) -> stars spent in the current drop
+        self.drop_gifts: set = set()  # gift ids of the current drop
+
+    def start_drop(self, db, gift_ids) -> None:
+        """
+        Start or continue a drop, and reconcile daily spend with the database.
+
+        The per-drop counters are reset only when none of the gifts belongs to
+        the current drop; a pass over gifts already seen, such as the retry of
+        a failed poll, adds to the current drop instead.
+
+        Args:
+            db: Database session
+            gift_ids: Gift ids the purchase pass is planned for
+        """
+        gift_ids = set(gift_ids)
+        if gift_ids.isdisjoint(self.drop_gifts):
+            self.drop.clear()
+            self.gift.clear()
+            self.drop_gifts = gift_ids
+        else:
+            self.drop_gifts |= gift_ids
+        self.day = utc_day()
+        rows = db.execute(
+            select(UserLedgerSummary.user_id, UserLedgerSummary.spent_today)
+            .where(UserLedgerSummary.spent_day == self.day)
+        )
+        self.daily = Counter({row.user_id: row.spent_today or 0 for row in rows})
+
+    def simulation(self) -> "SpendBudgets":
+        """Copy of the counters for planning, so planned purchases don't count as spent."""
+        return copy.deepcopy(self)
+
+    def allows(self, settings, user_id: str, gift_id: str, price: int) -> bool:
+        """Check whether a purchase fits all of the user's spend caps."""
+        if self.day != utc_day():
+            self.day = utc_day()
+            self.daily.clear()
+        return (
+            (not settings.daily_budget or self.daily[user_id] + price <= settings.daily_budget)
+            and (not settings.drop_budget or self.drop[user_id] + price <= settings.drop_budget)
+            and (not settings.gift_budget or self.gift[user_id, gift_id] + price <= settings.gift_budget)
+        )
+
+    def reserve(self, settings, user_id: str, gift_id: str, price: int) -> bool:
+        """
+        Count a purchase against the caps before it is sent.
+
+        Check and update happen without yielding to the event loop, so two
+        purchases for the same user can never both pass on the last stars.
+
+        Returns:
+            bool: False if the purchase would exceed a cap, nothing is counted then
+        """
+        if not self.allows(settings, user_id, gift_id, price):
+            return False
+        self.daily[user_id] += price
+        self.drop[user_id] += price
+        self.gift[user_id, gift_id] += price
+        return True
+
+    def release(self, user_id: str, gift_id: str, price: int) -> None:
+        """Undo a reservation whose send failed."""
+        self.daily[user_id] -= price
+        self.drop[user_id] -= price
+        self.gift[user_id, gift_id] -= price
+
+
+spend_budgets = SpendBudgets()
@@ -0,0 +1,73 @@
+import time
+
+import aiohttp
+
+from utils.logger import log
+
+
+class StarBalance:
+    """
+    Cached view of the bot's own Telegram Star balance.
+
+    The balance is fetched from the Bot API periodically and decremented
+    locally after each successful sendGift, so purchase planning never has
+    to wait on a network round trip.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0):
+        """
+        Args:
+            refresh_interval: Seconds after which the cached value is refetched
+        """
+        self.refresh_interval = refresh_interval
+        self.amount: int | None = None
+        self.updated_at: float = 0.0
+
+    @property
+    def is_stale(self) -> bool:
+        return self.amount is None or time.monotonic() - self.updated_at >= self.refresh_interval
+
+    async def refresh(self, gifts_api, session: aiohttp.ClientSession, force: bool = False,
+                      token: str | None = None) -> int | None:
+        """
+        Refetch the balance from the API if the cached value is stale.
+
+        Args:
+            gifts_api: API client used for the request
+            session: An active aiohttp ClientSession
+            force: Refetch even if the cached value is still fresh
+            token: Bot token whose balance to fetch, the main bot by default
+
+        Returns:
+            int: Current cached balance
+            None: If the balance has never been fetched successfully
+        """
+        if not force and not self.is_stale:
+            return self.amount
+
+        amount = await gifts_api.aio_get_star_balance(session, token=token)
+        if amount is not None:
+            if self.amount is not None and amount != self.amount:
+                log.info(f"Bot star balance refreshed: {self.amount} -> {amount}.")
+            self.amount = amount
+            self.updated_at = time.monotonic()
+        return self.amount
+
+    def can_afford(self, price: int) -> bool:
+        """
+        Check whether the bot can pay for a gift of the given price.
+
+        An unknown balance is treated as affordable so that a failing
+        getMyStarBalance call never blocks purchases on its own.
+        """
+        return self.amount is None or self.amount >= price
+
+    def spend(self, price: int) -> None:
+        """Decrement the cached balance after a successful send."""
+        if self.amount is not None:
+            self.amount = max(self.amount - price, 0)
+
+    def mark_exhausted(self) -> None:
+        """Force a refetch on the next refresh after a send was rejected."""
+        self.updated_at = 0.0
+
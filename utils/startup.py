@@ -0,0 +1,43 @@
+import sys
+import time
+from contextlib import contextmanager
+
+from utils.logger import log
+
+
+class StartupProfile:
+    """Wall time and newly imported modules per startup stage."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: list[tuple[str, float, int]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a startup stage, counting the modules it imported.
+
+        Args:
+            name: Stage name shown in the report
+        """
+        modules_before = len(sys.modules)
+        stage_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append(
+                (name, time.perf_counter() - stage_started, len(sys.modules) - modules_before))
+
+    def report(self) -> None:
+        """Log the total startup time followed by a per-stage breakdown."""
+        total = time.perf_counter() - self.started
+        log.info(
+            "Startup took {:.0f} ms ({} modules loaded): {}",
+            total * 1000,
+            len(sys.modules),
+            ", ".join(f"{name} {duration * 1000:.0f} ms/{modules} modules"
+                      for name, duration, modules in self.stages),
+        )
+
+
+startup_profile = StartupProfile()
@@ -0,0 +1,44 @@
+import time
+
+from utils.logger import log
+from utils.shutdown import stopping, wait_or_stop
+
+
+# Restart delays double from the first to the last value
+RESTART_BACKOFF_MIN = 1.0
+RESTART_BACKOFF_MAX = 60.0
+# A run lasting this many seconds counts as healthy and resets the backoff
+HEALTHY_RUN_SECONDS = 60.0
+
+
+async def supervise(name: str, factory, on_restart=None) -> None:
+    """
+    Run a long-lived coroutine, restarting it with exponential backoff when it dies.
+
+    A crash or an unexpected return both count as a failure. Cancellation is
+    passed through unchanged, and the loop ends once shutdown is requested.
+
+    Args:
+        name: Task name, for logs
+        factory: Zero-argument callable returning a fresh coroutine
+        on_restart: Optional callback invoked before each restart
+    """
+    backoff = RESTART_BACKOFF_MIN
+    while not stopping.is_set():
+        started = time.monotonic()
+        try:
+            await factory()
+            if stopping.is_set():
+                return
+            log.error("{} exited unexpectedly.", name)
+        except Exception as e:
+            log.exception(f"{name} crashed: {e}")
+
+        if time.monotonic() - started >= HEALTHY_RUN_SECONDS:
+            backoff = RESTART_BACKOFF_MIN
+        log.warning("Restarting {} in {:.0f}s.", name, backoff)
+        if on_restart is not None:
+            on_restart()
+        if await wait_or_stop(backoff):
+            return
+        backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
@@ -0,0 +1,80 @@
+import json
+import time
+import zlib
+from collections import namedtuple
+
+from db.dialects import upsert_insert
+from db.models import WatcherSnapshot
+
+
+SNAPSHOT_NAME = "gift_watcher"
+SNAPSHOT_VERSION = 2
+
+# Watchlist entry as restored from a snapshot, shaped like the rows of db.watchlist.load_watchlists
+WatchEntry = namedtuple("WatchEntry", ["target", "max_count"])
+
+
+def save_snapshot(db, catalog: dict, matcher: tuple | None = None) -> int:
+    """
+    Save the watcher's catalog and matcher state as a single compressed row. The caller commits.
+
+    Args:
+        db: Database session
+        catalog: Mapping gift_id -> (price, remaining_count, total_count)
+        matcher: (watchlist version, user_id -> watchlist entries), None if not loaded yet
+
+    Returns:
+        int: Size of the stored blob in bytes
+    """
+    saved_at = int(time.time())
+    snapshot = {"version": SNAPSHOT_VERSION, "saved_at": saved_at, "catalog": catalog}
+    if matcher is not None:
+        version, watchlists = matcher
+        snapshot["matcher"] = {
+            "watchlist_version": version,
+            "watchlists": {
+                user_id: [[entry.target, entry.max_count] for entry in entries]
+                for user_id, entries in watchlists.items()
+            },
+        }
+    data = zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode())
+
+    stmt = upsert_insert(db, WatcherSnapshot).values(
+        name=SNAPSHOT_NAME, data=data, saved_at=saved_at)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[WatcherSnapshot.name],
+        set_={"data": stmt.excluded.data, "saved_at": stmt.excluded.saved_at},
+    ))
+    return len(data)
+
+
+def load_snapshot(db) -> dict | None:
+    """
+    Load the last saved watcher snapshot.
+
+    Args:
+        db: Database session
+
+    Returns:
+        dict: saved_at, catalog (gift_id -> (price, remaining_count, total_count)) and
+        matcher ((watchlist version, user_id -> WatchEntry list), or None)
+        None: If there is no usable snapshot
+    """
+    row = db.get(WatcherSnapshot, SNAPSHOT_NAME)
+    if row is None:
+        return None
+    try:
+        snapshot = json.loads(zlib.decompress(row.data))
+    except (zlib.error, ValueError):
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    snapshot["catalog"] = {
+        gift_id: tuple(state) for gift_id, state in snapshot["catalog"].items()
+    }
+    matcher = snapshot.get("matcher")
+    snapshot["matcher"] = None if matcher is None else (matcher["watchlist_version"], {
+        user_id: [WatchEntry(*entry) for entry in entries]
+        for user_id, entries in matcher["watchlists"].items()
+    })
+    return snapshot
@@ -0,0 +1,64 @@
+import asyncio
+
+from utils.startup import startup_profile
+from config import load_config
+from utils.logger import log, flush_suppressed
+from utils.runtime import run, configure_loop
+
+config = load_config()
+
+
+async def main():
+    """
+    Standalone entry point for the gift watcher.
+
+    Runs only the catalog poller and auto-buy engine, without aiogram or the
+    handler routers, so it restarts as fast as possible during a drop. Run the
+    bot itself with RUN_WATCHER=0 to avoid two watchers buying the same drop.
+    """
+    configure_loop(asyncio.get_running_loop())
+
+    with startup_profile.stage("database"):
+        from db import init_db
+        init_db()
+
+    with startup_profile.stage("watcher"):
+        from utils.gift_parser import start_gift_parsing_loop
+        from utils.loop_monitor import loop_monitor
+        from utils.shutdown import install_signal_handlers, stopping, request_stop, drain, grace_remaining
+        from utils.supervisor import supervise
+        from utils.health import watcher_health, start_health_server
+        from db import dispose_engines
+
+    if config["loop_monitor"]:
+        loop_monitor.start()
+
+    startup_profile.report()
+    # SIGTERM asks the loop to finish its purchase pass and return
+    install_signal_handlers()
+    watcher_health.enabled = True
+    health_runner = await start_health_server()
+    # Restarted with backoff if the loop dies; /healthz goes red if it stalls
+    watcher_task = asyncio.create_task(supervise(
+        "Gift watcher", start_gift_parsing_loop, on_restart=watcher_health.mark_restart))
+    stop_requested = asyncio.create_task(stopping.wait())
+    try:
+        await asyncio.wait({watcher_task, stop_requested}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop_requested.cancel()
+        request_stop("watcher exiting")
+        await drain([watcher_task], grace_remaining(), "watcher task")
+        if health_runner is not None:
+            await health_runner.cleanup()
+        dispose_engines()
+        flush_suppressed(force=True)
+        log.info("Watcher stopped.")
+    if not watcher_task.cancelled():
+        watcher_task.result()
+
+
+if __name__ == "__main__":
+    try:
+        run(main())
+    except Exception as e:
+        log.exception(f"Watcher stopped due to an error: {e}")